@@ -0,0 +1,108 @@
+"""initial schema
+
+Базовая схема по app.models.models. Для баз, созданных ранее через
+scripts/seed_rag.sql, выполните `alembic stamp 0001_initial_schema`.
+
+Revision ID: 0001_initial_schema
+Revises: 
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+    op.create_table(
+        "organizations",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("inn", sa.String(12), nullable=False, unique=True),
+        sa.Column("address", sa.Text()),
+        sa.Column("phone", sa.String(20)),
+        sa.Column("email", sa.String(255)),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("role", sa.Enum("admin", "employee", "viewer", name="userrole"), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("totp_secret", sa.String(32)),
+        sa.Column("organization_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("organizations.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("last_active", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_email", "users", ["email"])
+
+    op.create_table(
+        "requests",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("organization_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("organizations.id"), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("original_text", sa.Text(), nullable=False),
+        sa.Column("masked_text", sa.Text()),
+        sa.Column("response_text", sa.Text()),
+        sa.Column("risk_level", sa.String(10)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+    )
+
+    op.create_table(
+        "documents",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("organization_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("organizations.id"), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("file_type", sa.String(10)),
+        sa.Column("file_size", sa.Float()),
+        sa.Column("storage_path", sa.Text()),
+        sa.Column("analysis_result", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+
+    op.create_table(
+        "document_chunks",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("document_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("chunk_index", sa.Integer()),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("embedding", Vector(settings.EMBEDDING_DIM)),
+        sa.Column("meta_info", sa.Text()),
+    )
+    op.create_index(
+        "ix_document_chunks_document_id_chunk_index",
+        "document_chunks",
+        ["document_id", "chunk_index"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("document_chunks")
+    op.drop_table("documents")
+    op.drop_table("requests")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
+    op.drop_table("organizations")
+    op.execute("DROP TYPE IF EXISTS userrole")
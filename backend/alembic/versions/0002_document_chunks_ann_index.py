@@ -0,0 +1,50 @@
+"""ANN index on document_chunks.embedding
+
+Индекс строится CONCURRENTLY (без блокировки записи), поэтому миграция
+выполняется вне транзакции. Тип индекса — VECTOR_INDEX_TYPE (hnsw | ivfflat).
+IVFFlat стоит строить после загрузки корпуса: центроиды считаются по
+имеющимся данным.
+
+Revision ID: 0002_document_chunks_ann_index
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_document_chunks_ann_index"
+down_revision: Union[str, Sequence[str], None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        statement = (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_ivfflat "
+            "ON document_chunks USING ivfflat (embedding vector_cosine_ops) "
+            f"WITH (lists = {int(settings.VECTOR_IVFFLAT_LISTS)})"
+        )
+    else:
+        statement = (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_hnsw "
+            "ON document_chunks USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+
+    with op.get_context().autocommit_block():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_hnsw")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_ivfflat")
@@ -0,0 +1,47 @@
+"""full-text search on document_chunks.content
+
+Генерируемая колонка content_tsv (to_tsvector('russian', content)) и GIN-индекс
+для гибридного поиска. ADD COLUMN ... STORED переписывает таблицу под
+эксклюзивной блокировкой — на большом корпусе выполняйте в окно обслуживания.
+Индекс строится CONCURRENTLY.
+
+Revision ID: 0003_document_chunks_fts
+Revises: 0002_document_chunks_ann_index
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_document_chunks_fts"
+down_revision: Union[str, Sequence[str], None] = "0002_document_chunks_ann_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "document_chunks",
+        sa.Column(
+            "content_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('russian', content)", persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_content_tsv "
+            "ON document_chunks USING gin (content_tsv)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_content_tsv")
+    op.drop_column("document_chunks", "content_tsv")
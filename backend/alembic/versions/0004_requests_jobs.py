@@ -0,0 +1,40 @@
+"""background generation jobs on requests
+
+Колонки attempts и started_at для фоновой генерации и индекс
+(status, created_at) — по нему воркеры находят задания в очереди и
+зависшие после падения процесса. Индекс строится CONCURRENTLY.
+
+Revision ID: 0004_requests_jobs
+Revises: 0003_document_chunks_fts
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_requests_jobs"
+down_revision: Union[str, Sequence[str], None] = "0003_document_chunks_fts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("requests", sa.Column("attempts", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("requests", sa.Column("started_at", sa.DateTime(timezone=True), nullable=True))
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_status_created_at "
+            "ON requests (status, created_at)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_requests_status_created_at")
+    op.drop_column("requests", "started_at")
+    op.drop_column("requests", "attempts")
@@ -0,0 +1,62 @@
+"""dashboard daily rollups
+
+Таблица dashboard_daily_stats (организация, день, метрика → счётчик),
+заполненная по существующим обращениям, и индекс
+requests (organization_id, created_at) — он же ускоряет заполнение.
+Индекс строится CONCURRENTLY.
+
+Revision ID: 0005_dashboard_daily_stats
+Revises: 0004_requests_jobs
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_dashboard_daily_stats"
+down_revision: Union[str, Sequence[str], None] = "0004_requests_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_organization_id_created_at "
+            "ON requests (organization_id, created_at)"
+        )
+
+    op.create_table(
+        "dashboard_daily_stats",
+        sa.Column("organization_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("organizations.id"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("metric", sa.String(length=32), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("organization_id", "day", "metric"),
+    )
+
+    # Начальное заполнение по уже накопленной истории
+    op.execute(
+        sa.text(
+            "INSERT INTO dashboard_daily_stats (organization_id, day, metric, count) "
+            "SELECT organization_id, (created_at AT TIME ZONE :tz)::date, 'requests_created', count(*) "
+            "FROM requests GROUP BY 1, 2 "
+            "UNION ALL "
+            "SELECT organization_id, (completed_at AT TIME ZONE :tz)::date, 'responses_generated', count(*) "
+            "FROM requests WHERE status = 'completed' AND completed_at IS NOT NULL GROUP BY 1, 2"
+        ).bindparams(tz=settings.DASHBOARD_TIMEZONE)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("dashboard_daily_stats")
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_requests_organization_id_created_at")
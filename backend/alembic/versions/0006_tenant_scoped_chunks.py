@@ -0,0 +1,96 @@
+"""tenant-scoped document chunks
+
+document_chunks.organization_id — копия documents.organization_id
+(NULL для общего корпуса, documents.is_public). Поиск арендатора
+затрагивает только его фрагменты и общий корпус:
+- общий корпус — частичный ANN-индекс WHERE organization_id IS NULL;
+- фрагменты УК — btree по organization_id и точная сортировка по
+  расстоянию (срез одной УК мал); для крупных УК отдельный частичный
+  ANN-индекс строит scripts/tenant_ann_index.py.
+Глобальный ANN-индекс из 0002 удаляется: с фильтром по арендатору он
+отдавал бы меньше строк, чем запрошено, или вёл к полному перебору.
+
+UPDATE заполнения переписывает всю таблицу — на большом корпусе
+выполняйте в окно обслуживания. Индексы строятся CONCURRENTLY.
+
+Revision ID: 0006_tenant_scoped_chunks
+Revises: 0005_dashboard_daily_stats
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_tenant_scoped_chunks"
+down_revision: Union[str, Sequence[str], None] = "0005_dashboard_daily_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _ann_index(name: str, where: str) -> str:
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        method = f"ivfflat (embedding vector_cosine_ops) WITH (lists = {int(settings.VECTOR_IVFFLAT_LISTS)})"
+    else:
+        method = (
+            "hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+    return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON document_chunks USING {method} WHERE {where}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "documents",
+        sa.Column("is_public", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+    op.add_column(
+        "document_chunks",
+        sa.Column(
+            "organization_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("organizations.id"),
+            nullable=True,
+        ),
+    )
+    op.execute(
+        "UPDATE document_chunks AS c SET organization_id = d.organization_id "
+        "FROM documents AS d WHERE c.document_id = d.id AND NOT d.is_public"
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_organization_id "
+            "ON document_chunks (organization_id)"
+        )
+        op.execute(_ann_index("ix_document_chunks_embedding_public", "organization_id IS NULL"))
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_hnsw")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_ivfflat")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        if settings.VECTOR_INDEX_TYPE == "ivfflat":
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_ivfflat "
+                "ON document_chunks USING ivfflat (embedding vector_cosine_ops) "
+                f"WITH (lists = {int(settings.VECTOR_IVFFLAT_LISTS)})"
+            )
+        else:
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_hnsw "
+                "ON document_chunks USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+            )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_public")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_organization_id")
+    # Частичные индексы крупных УК (scripts/tenant_ann_index.py) зависят от колонки
+    op.drop_column("document_chunks", "organization_id")
+    op.drop_column("documents", "is_public")
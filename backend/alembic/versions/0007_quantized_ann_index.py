@@ -0,0 +1,68 @@
+"""quantized ANN index for the public corpus
+
+При VECTOR_QUANTIZATION=halfvec|bit ANN-индекс общего корпуса строится
+по компактному выражению над embedding (halfvec — вдвое меньше, bit —
+в 32 раза меньше полного vector), полный индекс удаляется. Колонка
+embedding не меняется: по ней кандидаты пересчитываются точно
+(services/quantization.py). При VECTOR_QUANTIZATION=none миграция
+ничего не меняет.
+
+Нужен pgvector ≥ 0.7 (halfvec, binary_quantize). Переключение режима
+на работающей базе без миграций — scripts/vector_quantization.py;
+частичные индексы крупных УК перестраивает scripts/tenant_ann_index.py.
+
+Revision ID: 0007_quantized_ann_index
+Revises: 0006_tenant_scoped_chunks
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_quantized_ann_index"
+down_revision: Union[str, Sequence[str], None] = "0006_tenant_scoped_chunks"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_PUBLIC = "ix_document_chunks_embedding_public"
+_COMPACT = {
+    "halfvec": ("ix_document_chunks_embedding_half_public", "(embedding::halfvec({dim})) halfvec_cosine_ops"),
+    "bit": ("ix_document_chunks_embedding_bit_public", "(binary_quantize(embedding)::bit({dim})) bit_hamming_ops"),
+}
+
+
+def _ann_index(name: str, target: str) -> str:
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        method = f"ivfflat ({target}) WITH (lists = {int(settings.VECTOR_IVFFLAT_LISTS)})"
+    else:
+        method = (
+            f"hnsw ({target}) "
+            f"WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON document_chunks USING {method} "
+        "WHERE organization_id IS NULL"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if settings.VECTOR_QUANTIZATION not in _COMPACT:
+        return
+    name, target = _COMPACT[settings.VECTOR_QUANTIZATION]
+    with op.get_context().autocommit_block():
+        # Сначала новый индекс, потом удаление старого — поиск не остаётся без индекса
+        op.execute(_ann_index(name, target.format(dim=int(settings.EMBEDDING_DIM))))
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_PUBLIC}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(_ann_index(_PUBLIC, "embedding vector_cosine_ops"))
+        for name, _ in _COMPACT.values():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,97 @@
+"""retrieval versions for the search result cache
+
+Таблица retrieval_versions (область поиска → версия): organization_id
+или нулевой UUID для общего корпуса. Версия растёт триггерами
+уровня оператора на document_chunks (INSERT — в том числе COPY при
+загрузке, UPDATE, DELETE, TRUNCATE) и рассылается pg_notify в канал
+retrieval_versions после фиксации транзакции. Кэш результатов поиска
+(services/retrieval_cache.py) включает версии в ключ — записи,
+посчитанные до изменения фрагментов, больше не читаются.
+
+Revision ID: 0008_retrieval_versions
+Revises: 0007_quantized_ann_index
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_retrieval_versions"
+down_revision: Union[str, Sequence[str], None] = "0007_quantized_ann_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_PUBLIC_SCOPE = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+_BUMP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION bump_retrieval_versions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    scopes uuid[];
+    bumped RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT coalesce(organization_id, {_PUBLIC_SCOPE})) INTO scopes FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT coalesce(organization_id, {_PUBLIC_SCOPE})) INTO scopes FROM old_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT scope) INTO scopes FROM (
+            SELECT coalesce(organization_id, {_PUBLIC_SCOPE}) AS scope FROM old_rows
+            UNION ALL
+            SELECT coalesce(organization_id, {_PUBLIC_SCOPE}) FROM new_rows
+        ) AS changed;
+    ELSE
+        SELECT array_agg(scope) INTO scopes FROM retrieval_versions;
+    END IF;
+
+    FOR bumped IN
+        INSERT INTO retrieval_versions AS v (scope, version)
+        SELECT unnest(scopes), 1
+        ON CONFLICT (scope) DO UPDATE SET version = v.version + 1
+        RETURNING v.scope, v.version
+    LOOP
+        PERFORM pg_notify('retrieval_versions', bumped.scope || ':' || bumped.version);
+    END LOOP;
+    RETURN NULL;
+END
+$$
+"""
+
+_TRIGGERS = {
+    "document_chunks_retrieval_version_insert": "AFTER INSERT ON document_chunks REFERENCING NEW TABLE AS new_rows",
+    "document_chunks_retrieval_version_update": (
+        "AFTER UPDATE ON document_chunks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"
+    ),
+    "document_chunks_retrieval_version_delete": "AFTER DELETE ON document_chunks REFERENCING OLD TABLE AS old_rows",
+    "document_chunks_retrieval_version_truncate": "AFTER TRUNCATE ON document_chunks",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "retrieval_versions",
+        sa.Column("scope", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    # Уже загруженные области — с версией 1, общий корпус — всегда
+    op.execute(
+        f"INSERT INTO retrieval_versions (scope, version) "
+        f"SELECT DISTINCT coalesce(organization_id, {_PUBLIC_SCOPE}), 1 FROM document_chunks "
+        f"UNION SELECT {_PUBLIC_SCOPE}, 1"
+    )
+    op.execute(_BUMP_FUNCTION)
+    for name, event in _TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {event} FOR EACH STATEMENT EXECUTE FUNCTION bump_retrieval_versions()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in _TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON document_chunks")
+    op.execute("DROP FUNCTION IF EXISTS bump_retrieval_versions()")
+    op.drop_table("retrieval_versions")
@@ -0,0 +1,75 @@
+"""retrieval versions follow document scope changes
+
+Результат поиска зависит не только от document_chunks: фрагмент
+показывается с именем документа, а область документа задают
+documents.is_public и documents.organization_id. Триггер уровня
+оператора на UPDATE documents повышает версии старой и новой области
+каждого документа, у которого изменилось одно из этих полей, — так же,
+как триггеры 0008 для фрагментов. Список колонок (UPDATE OF) с
+таблицами переходов несовместим, поэтому изменения отбираются в функции.
+
+Revision ID: 0009_document_retrieval_versions
+Revises: 0008_retrieval_versions
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_document_retrieval_versions"
+down_revision: Union[str, Sequence[str], None] = "0008_retrieval_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_PUBLIC_SCOPE = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+_TRIGGER = "documents_retrieval_version_update"
+
+_BUMP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION bump_document_retrieval_versions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    scopes uuid[];
+    bumped RECORD;
+BEGIN
+    SELECT array_agg(DISTINCT s.scope) INTO scopes FROM (
+        SELECT CASE WHEN o.is_public THEN {_PUBLIC_SCOPE} ELSE o.organization_id END AS old_scope,
+               CASE WHEN n.is_public THEN {_PUBLIC_SCOPE} ELSE n.organization_id END AS new_scope
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE (o.is_public, o.organization_id, o.filename) IS DISTINCT FROM (n.is_public, n.organization_id, n.filename)
+    ) AS changed, LATERAL (VALUES (changed.old_scope), (changed.new_scope)) AS s(scope);
+    IF scopes IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    FOR bumped IN
+        INSERT INTO retrieval_versions AS v (scope, version)
+        SELECT unnest(scopes), 1
+        ON CONFLICT (scope) DO UPDATE SET version = v.version + 1
+        RETURNING v.scope, v.version
+    LOOP
+        PERFORM pg_notify('retrieval_versions', bumped.scope || ':' || bumped.version);
+    END LOOP;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(_BUMP_FUNCTION)
+    op.execute(
+        f"CREATE TRIGGER {_TRIGGER} AFTER UPDATE ON documents "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_document_retrieval_versions()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"DROP TRIGGER IF EXISTS {_TRIGGER} ON documents")
+    op.execute("DROP FUNCTION IF EXISTS bump_document_retrieval_versions()")
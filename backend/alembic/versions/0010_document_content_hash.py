@@ -0,0 +1,33 @@
+"""document content hash
+
+documents.content_hash — sha256 загруженного текста. Повторная загрузка
+файла с тем же именем, но другим содержимым удаляет старые фрагменты
+и индексирует документ заново (services/ingestion.py). У документов,
+загруженных до миграции, хэша нет: первая повторная загрузка их
+переиндексирует.
+
+Revision ID: 0010_document_content_hash
+Revises: 0009_document_retrieval_versions
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0010_document_content_hash"
+down_revision: Union[str, Sequence[str], None] = "0009_document_retrieval_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("documents", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("documents", "content_hash")
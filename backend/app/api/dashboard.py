@@ -0,0 +1,31 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import get_db
+from ..schemas.schemas import DashboardStatsResponse
+from ..security import get_current_user, resolve_organization
+from ..services.dashboard import dashboard_service
+
+router = APIRouter()
+
+@router.get("/stats", response_model=DashboardStatsResponse)
+async def get_dashboard_stats(
+    organization_id: Optional[uuid.UUID] = None,
+    days: int = Query(settings.DASHBOARD_DEFAULT_PERIOD_DAYS, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Статистика панели управления организации пользователя за последние
+    `days` дней и изменение к предыдущему такому же периоду (по дневным
+    счётчикам). organization_id, если передан, должен совпадать с токеном.
+    """
+    organization_id = resolve_organization(organization_id, current_user)
+    if organization_id is None:
+        raise HTTPException(status_code=403, detail="Пользователь не привязан к организации")
+    try:
+        return await dashboard_service.get_stats(db, organization_id, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
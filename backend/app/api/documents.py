@@ -0,0 +1,56 @@
+import os
+import uuid
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.models import UserRole
+from ..services.ingestion import ingestion_service, iter_upload, upload_sha256
+from ..database import get_db
+from ..security import get_current_user
+
+router = APIRouter()
+
+class IngestResponse(BaseModel):
+    document_id: uuid.UUID
+    chunks_written: int
+    chunks_skipped: int
+    seconds: float
+
+@router.post("/ingest", response_model=IngestResponse)
+async def ingest_document(
+    label: str = Form(""),
+    is_public: bool = Form(False),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Загрузка текстового документа (UTF-8) в базу знаний RAG организации
+    пользователя. Повторная загрузка файла с тем же именем продолжает
+    прерванную индексацию, изменённый файл индексируется заново.
+    is_public — документ общего нормативного корпуса (только admin; также
+    scripts/ingest.py --public), иначе виден только организации.
+    """
+    if not current_user.get("organization_id"):
+        raise HTTPException(status_code=403, detail="Пользователь не привязан к организации")
+    if is_public and current_user.get("role") != UserRole.admin.value:
+        raise HTTPException(status_code=403, detail="Общий корпус пополняет только администратор")
+    organization_id = uuid.UUID(str(current_user["organization_id"]))
+    try:
+        document = await ingestion_service.get_or_create_document(
+            db,
+            organization_id=organization_id,
+            filename=os.path.basename(file.filename or "document.txt"),
+            file_size=file.size,
+            is_public=is_public,
+            content_hash=await upload_sha256(file),
+        )
+        result = await ingestion_service.ingest(document.id, iter_upload(file), source_label=label)
+        return IngestResponse(
+            document_id=result.document_id,
+            chunks_written=result.chunks_written,
+            chunks_skipped=result.chunks_skipped,
+            seconds=result.seconds
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
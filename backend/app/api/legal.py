@@ -1,16 +1,27 @@
+import uuid
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from .llm import llm_service
+from .sse import sse_event, sse_response
+from ..config import settings
+from ..schemas.schemas import LLMSettingsSchema
+from ..services.context import context_builder
+from ..services.dashboard import LEGAL_CONSULTATIONS, dashboard_service
 from ..services.rag import rag_service
-from ..database import get_db
+from ..database import async_session, get_db
+from ..security import get_optional_user, resolve_organization
 
 router = APIRouter()
 
 class SearchRequest(BaseModel):
     query: str
     provider: str = "deepseek" # По умолчанию DeepSeek
+    bypass_cache: bool = False
+    # документы УК и статистика панели — только при входе, организация из токена
+    organization_id: Optional[uuid.UUID] = None
+    llm: Optional[LLMSettingsSchema] = None  # temperature / max_tokens ответа
 
 class LegalSource(BaseModel):
     id: int
@@ -25,62 +36,123 @@ class SearchResponse(BaseModel):
     sources: List[dict]
     risks: List[dict]
 
+
+async def _find_sources(db: AsyncSession, query: str, organization_id: Optional[uuid.UUID] = None) -> List[dict]:
+    """Поиск в векторной базе знаний (реальный RAG): общий корпус и документы организации."""
+    relevant_chunks = await rag_service.find_relevant_chunks(
+        db, query, limit=settings.RAG_CONTEXT_CANDIDATES, organization_id=organization_id
+    )
+
+    if not relevant_chunks:
+        # Если в базе ничего нет, используем моковые данные для обратной совместимости
+        return [
+            {
+                "id": 1,
+                "title": "Жилищный кодекс РФ (Пример)",
+                "type": "law",
+                "content": "Собственники помещений в многоквартирном доме обязаны выбрать один из способов управления...",
+                "relevance": 0.95,
+                "citation": "Ст. 161 ЖК РФ"
+            }
+        ]
+
+    return [
+        {
+            "id": i + 1,
+            "title": chunk.filename,
+            "type": "law",
+            "content": chunk.content,
+            "relevance": round(chunk.similarity, 4),
+            "citation": str(chunk.meta_info) if chunk.meta_info else "Не указано"
+        }
+        for i, chunk in enumerate(relevant_chunks)
+    ]
+
+
+def _build_prompt(query: str, sources: List[dict]) -> tuple[str, List[dict]]:
+    """
+    Промпт с контекстом в пределах RAG_CONTEXT_MAX_TOKENS и источники,
+    которые в него вошли (их и видит пользователь).
+    """
+    items = context_builder.pack(sources)
+    context = context_builder.render(items)
+    prompt = f"Контекст из законов:\n{context}\n\nВопрос пользователя: {query}\nОтветь максимально подробно, ссылаясь на статьи."
+    return prompt, [{**item.source, "id": i + 1} for i, item in enumerate(items)]
+
+
+def _assess_risks() -> List[dict]:
+    # Мокаем риски (пока)
+    return [
+        {
+            "category": "Административный риск",
+            "level": "medium",
+            "description": "Риск нарушения порядка выбора способа управления.",
+            "recommendation": "Проверьте протокол общего собрания на наличие кворума."
+        }
+    ]
+
+
 @router.post("/ask", response_model=SearchResponse)
-async def ask_legal(request: SearchRequest, db: AsyncSession = Depends(get_db)):
+async def ask_legal(
+    request: SearchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
     """
     Эндпоинт для юридической консультации (RAG).
     Находит релевантные законы и генерирует на их основе ответ.
     """
+    organization_id = resolve_organization(request.organization_id, current_user)
     try:
-        # 1. Поиск в векторной базе знаний (реальный RAG)
-        relevant_chunks = await rag_service.find_relevant_chunks(db, request.query)
-        
-        if not relevant_chunks:
-            # Если в базе ничего нет, используем моковые данные для обратной совместимости
-            sources = [
-                {
-                    "id": 1,
-                    "title": "Жилищный кодекс РФ (Пример)",
-                    "type": "law",
-                    "content": "Собственники помещений в многоквартирном доме обязаны выбрать один из способов управления...",
-                    "relevance": 0.95,
-                    "citation": "Ст. 161 ЖК РФ"
-                }
-            ]
-        else:
-            sources = [
-                {
-                    "id": i + 1,
-                    "title": chunk.document.filename if hasattr(chunk, 'document') else "Документ",
-                    "type": "law",
-                    "content": chunk.content,
-                    "relevance": 0.9, # В будущем считать на основе cosine similarity
-                    "citation": str(chunk.meta_info) if chunk.meta_info else "Не указано"
-                }
-                for i, chunk in enumerate(relevant_chunks)
-            ]
-
-        # 2. Формируем расширенный промпт для ИИ
-        context = "\n".join([str(s["content"]) for s in sources])
-        prompt = f"Контекст из законов:\n{context}\n\nВопрос пользователя: {request.query}\nОтветь максимально подробно, ссылаясь на статьи."
+        # 1. Поиск в векторной базе знаний
+        sources = await _find_sources(db, request.query, organization_id)
 
-        # 3. Генерация ответа через LLM (DeepSeek)
-        answer = await llm_service.generate_response(prompt, provider=request.provider)
+        # 2. Формируем расширенный промпт для ИИ (контекст в пределах бюджета токенов)
+        prompt, sources = _build_prompt(request.query, sources)
 
-        # 4. Мокаем риски (пока)
-        risks = [
-            {
-                "category": "Административный риск",
-                "level": "medium",
-                "description": "Риск нарушения порядка выбора способа управления.",
-                "recommendation": "Проверьте протокол общего собрания на наличие кворума."
-            }
-        ]
+        # 3. Генерация ответа через LLM (DeepSeek)
+        answer = await llm_service.generate_response(
+            prompt, provider=request.provider, use_cache=not request.bypass_cache, llm_settings=request.llm
+        )
+        if organization_id:
+            await dashboard_service.record(db, organization_id, LEGAL_CONSULTATIONS)
 
         return SearchResponse(
             answer=answer,
             sources=sources,
-            risks=risks
+            risks=_assess_risks()
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ask/stream")
+async def ask_legal_stream(request: SearchRequest, current_user: Optional[dict] = Depends(get_optional_user)):
+    """
+    Потоковая юридическая консультация (SSE).
+    Сначала отправляются найденные источники (событие `sources`),
+    затем фрагменты ответа (`data: {"content": ...}`), в конце — риски и `done`.
+    """
+    organization_id = resolve_organization(request.organization_id, current_user)
+    try:
+        # Своя короткая сессия вместо Depends(get_db): зависимость закрылась бы
+        # только после окончания потока, и соединение из пула простаивало бы
+        # в транзакции всё время генерации ответа.
+        async with async_session() as db:
+            sources = await _find_sources(db, request.query, organization_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    prompt, sources = _build_prompt(request.query, sources)
+
+    async def events():
+        yield sse_event({"sources": sources}, event="sources")
+        async for token in llm_service.stream_response(prompt, provider=request.provider, llm_settings=request.llm):
+            yield sse_event({"content": token})
+        # Консультация засчитывается, только если ответ доставлен целиком
+        if organization_id:
+            await dashboard_service.record_now(organization_id, LEGAL_CONSULTATIONS)
+        yield sse_event({"risks": _assess_risks()}, event="risks")
+        yield sse_event({}, event="done")
+
+    return sse_response(events())
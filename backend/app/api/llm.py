@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
+from ..schemas.schemas import LLMSettingsSchema
 from ..services.llm import llm_service
+from .sse import sse_event, sse_response
 
 router = APIRouter()
 
@@ -9,6 +11,8 @@ class GenerateRequest(BaseModel):
     prompt: str
     provider: str = "deepseek"
     deepseek_key: Optional[str] = None
+    bypass_cache: bool = False
+    llm: Optional[LLMSettingsSchema] = None  # temperature / max_tokens
 
 class GenerateResponse(BaseModel):
     content: str
@@ -24,8 +28,30 @@ async def generate_text(request: GenerateRequest):
         result = await llm_service.generate_response(
             prompt=request.prompt, 
             provider=request.provider,
-            deepseek_key=request.deepseek_key
+            deepseek_key=request.deepseek_key,
+            use_cache=not request.bypass_cache,
+            llm_settings=request.llm
         )
         return GenerateResponse(content=result, provider=request.provider)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_text_stream(request: GenerateRequest):
+    """
+    Потоковая генерация текста (SSE).
+    Каждый фрагмент ответа приходит событием `data: {"content": ...}`,
+    в конце отправляется событие `done`.
+    """
+    async def events():
+        async for token in llm_service.stream_response(
+            prompt=request.prompt,
+            provider=request.provider,
+            deepseek_key=request.deepseek_key,
+            llm_settings=request.llm
+        ):
+            yield sse_event({"content": token})
+        yield sse_event({"provider": request.provider}, event="done")
+
+    return sse_response(events())
@@ -0,0 +1,176 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import async_session, get_db
+from ..models.models import Request
+from ..security import get_current_user, get_optional_user, resolve_organization
+from ..schemas.schemas import GenerateRequest, GenerateResponse, MaskPIIRequest, MaskPIIResponse, PIIMapping
+from ..services.dashboard import REQUESTS_CREATED, RESPONSES_GENERATED, dashboard_service
+from ..services.jobs import JobQueueFull, job_service
+from ..services.pii import pii_engine
+from ..services.responses import VariantGenerationFailed, response_service, select_styles
+from .sse import sse_event, sse_response
+
+router = APIRouter()
+
+class JobSubmitRequest(BaseModel):
+    # Организация и автор обращения — из токена
+    text: str = Field(min_length=1, max_length=50000)
+
+class JobResponse(BaseModel):
+    id: uuid.UUID
+    status: str
+    masked_text: Optional[str] = None
+    response_text: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+def _job_response(request: Request) -> JobResponse:
+    return JobResponse(
+        id=request.id,
+        status=request.status,
+        masked_text=request.masked_text,
+        response_text=request.response_text,
+        attempts=request.attempts or 0,
+        created_at=request.created_at,
+        completed_at=request.completed_at
+    )
+
+def _principal_organization(current_user: dict) -> uuid.UUID:
+    organization_id = current_user.get("organization_id")
+    if not organization_id:
+        raise HTTPException(status_code=403, detail="Пользователь не привязан к организации")
+    return uuid.UUID(str(organization_id))
+
+@router.post("/mask-pii", response_model=MaskPIIResponse)
+async def mask_pii(request: MaskPIIRequest):
+    """
+    Маскирование персональных данных (ФЗ-152).
+    Возвращает текст с токенами и таблицу соответствий для демаскирования.
+    """
+    result = pii_engine.mask(request.text)
+    return MaskPIIResponse(
+        masked_text=result.masked_text,
+        mappings=[PIIMapping(original=original, masked=masked) for original, masked in result.as_pairs()]
+    )
+
+@router.post("/generate", response_model=GenerateResponse)
+async def generate_responses(
+    request: GenerateRequest,
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Варианты ответа на обращение (разный тон и уровень риска).
+    Маскирование и поиск в базе знаний выполняются один раз, варианты
+    генерируются параллельно.
+    """
+    organization_id = resolve_organization(request.organization_id, current_user)
+    try:
+        # Соединение с БД нужно только для поиска — не держим его, пока идёт генерация
+        async with async_session() as db:
+            prepared = await response_service.prepare(db, request.text, organization_id)
+        if organization_id:
+            await dashboard_service.record_now(organization_id, REQUESTS_CREATED)
+        variants = await response_service.generate(
+            prepared, select_styles(request.tone, request.max_variants), llm_settings=request.llm
+        )
+        # Единица RESPONSES_GENERATED — обращение с ответом (как в заданиях и миграции 0005)
+        if organization_id:
+            await dashboard_service.record_now(organization_id, RESPONSES_GENERATED)
+        return GenerateResponse(
+            responses=variants,
+            rag_results=prepared.rag_results,
+            pii_mappings=prepared.pii_mappings
+        )
+    except VariantGenerationFailed as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate/stream")
+async def generate_responses_stream(
+    request: GenerateRequest,
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Варианты ответа по мере готовности (SSE).
+    Сначала отправляются результаты поиска и таблица маскирования (событие
+    `context`), затем каждый вариант (`variant`), в конце — `done`.
+    """
+    organization_id = resolve_organization(request.organization_id, current_user)
+    try:
+        # Сессия закрывается до начала потока (см. /legal/ask/stream)
+        async with async_session() as db:
+            prepared = await response_service.prepare(db, request.text, organization_id)
+        if organization_id:
+            await dashboard_service.record_now(organization_id, REQUESTS_CREATED)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    styles = select_styles(request.tone, request.max_variants)
+
+    async def events():
+        yield sse_event(
+            {
+                "rag_results": [r.model_dump() for r in prepared.rag_results],
+                "pii_mappings": [m.model_dump() for m in prepared.pii_mappings],
+            },
+            event="context",
+        )
+        generated = 0
+        try:
+            async for variant in response_service.iter_generate(prepared, styles, llm_settings=request.llm):
+                generated += 1
+                yield sse_event(variant.model_dump(), event="variant")
+        except VariantGenerationFailed as e:
+            yield sse_event({"detail": str(e)}, event="error")
+        # Обращение засчитывается, если удался хотя бы один вариант
+        if generated and organization_id:
+            await dashboard_service.record_now(organization_id, RESPONSES_GENERATED)
+        yield sse_event({}, event="done")
+
+    return sse_response(events())
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(
+    request: JobSubmitRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Фоновая генерация ответа: обращение сохраняется и сразу возвращается id,
+    результат — через GET /requests/jobs/{id}.
+    """
+    organization_id = _principal_organization(current_user)
+    try:
+        job = await job_service.submit(
+            db,
+            organization_id=organization_id,
+            user_id=uuid.UUID(str(current_user["sub"])),
+            text=request.text
+        )
+        return _job_response(job)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Очередь заданий переполнена", headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: uuid.UUID,
+    wait: float = Query(0, ge=0, le=settings.JOBS_WAIT_MAX_SECONDS, description="long polling, секунд"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Статус и результат задания организации пользователя. С wait > 0 ответ
+    ждёт завершения задания (long polling) не дольше wait секунд.
+    """
+    job = await job_service.get(job_id, wait=wait, organization_id=_principal_organization(current_user))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return _job_response(job)
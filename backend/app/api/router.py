@@ -2,11 +2,19 @@ from fastapi import APIRouter
 
 from .llm import router as llm_router
 from .legal import router as legal_router
+from .documents import router as documents_router
+from .requests import router as requests_router
+from .dashboard import router as dashboard_router
+from .supervision import router as supervision_router
 
 api_router = APIRouter()
 
 api_router.include_router(llm_router, prefix="/llm", tags=["llm"])
 api_router.include_router(legal_router, prefix="/legal", tags=["legal"])
+api_router.include_router(documents_router, prefix="/documents", tags=["documents"])
+api_router.include_router(requests_router, prefix="/requests", tags=["requests"])
+api_router.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(supervision_router, prefix="/supervision", tags=["supervision"])
 
 @api_router.get("/status")
 async def get_status():
@@ -0,0 +1,28 @@
+# ============================================================
+# Server-Sent Events — общие хелперы для потоковых эндпоинтов
+# ============================================================
+
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Форматирует одно SSE-событие."""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Nginx не должен буферизовать поток — иначе токены придут пачкой
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,73 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import get_db
+from ..security import get_optional_user, resolve_organization
+from ..schemas.schemas import SupervisionAnalysisResponse
+from ..services.extraction import UnsupportedDocument
+from ..services.supervision import AnalysisFailed, supervision_service
+from ..services.uploads import InvalidUpload, UploadTooLarge, receive_upload
+
+router = APIRouter()
+
+# Тело разбирается вручную (потоком), поэтому форма описана явно для OpenAPI
+_UPLOAD_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "organization_id": {"type": "string", "format": "uuid"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+@router.post("/analyze", response_model=SupervisionAnalysisResponse, openapi_extra=_UPLOAD_SCHEMA)
+async def analyze_document(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Анализ предписания надзорного органа (PDF, DOCX, TXT).
+    Файл пишется в хранилище потоком, загрузка больше MAX_UPLOAD_SIZE_MB
+    прерывается с 413 без чтения остатка. Для вошедшего пользователя
+    результат сохраняется в его организации и учитывается в панели
+    управления; поле organization_id, если передано, должно совпадать.
+    """
+    try:
+        upload = await receive_upload(request, settings.UPLOAD_DIR, settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Файл больше {settings.MAX_UPLOAD_SIZE_MB} МБ")
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        raw_organization_id = upload.fields.get("organization_id")
+        organization_id = resolve_organization(
+            uuid.UUID(raw_organization_id) if raw_organization_id else None, current_user
+        )
+    except ValueError:
+        upload.discard()
+        raise HTTPException(status_code=422, detail="organization_id должен быть UUID")
+    except HTTPException:
+        upload.discard()
+        raise
+
+    try:
+        return await supervision_service.analyze(db, upload, organization_id)
+    except UnsupportedDocument as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except AnalysisFailed as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -6,9 +6,21 @@
 #   DEEPSEEK_API_KEY=sk-...
 # ============================================================
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
 
+# Размерности моделей sentence-transformers, для которых EMBEDDING_DIM
+# можно не задавать; для остальных моделей размерность указывается явно.
+KNOWN_EMBEDDING_DIMS = {
+    "intfloat/multilingual-e5-small": 384,
+    "intfloat/multilingual-e5-base": 768,
+    "intfloat/multilingual-e5-large": 1024,
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2": 384,
+    "sentence-transformers/paraphrase-multilingual-mpnet-base-v2": 768,
+}
+HASHING_EMBEDDING_DIM = 1536
+
 
 class Settings(BaseSettings):
     """
@@ -27,17 +39,136 @@ class Settings(BaseSettings):
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # --- Auth caches ---
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # задержка применения смены роли в других воркерах
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_LAST_ACTIVE_FLUSH_SECONDS: float = 5.0
+
+    # --- Passwords ---
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # при изменении хэши пересчитываются при входе
+    PASSWORD_HASH_WORKERS: int = 4  # потоков для bcrypt (не больше числа ядер)
+
 
     # --- DeepSeek ---
     DEEPSEEK_API_KEY: Optional[str] = None
     DEEPSEEK_API_BASE: str = "https://api.deepseek.com"
     DEEPSEEK_MODEL: str = "deepseek-chat"
+    DEEPSEEK_TIMEOUT_SECONDS: float = 30.0
+    DEEPSEEK_HTTP2: bool = True
+    DEEPSEEK_MAX_CONNECTIONS: int = 50
+    DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    DEEPSEEK_KEEPALIVE_EXPIRY: float = 30.0
+    DEEPSEEK_MAX_IN_FLIGHT: int = 32  # верхняя граница адаптивного лимита
+    DEEPSEEK_MIN_IN_FLIGHT: int = 1
+    DEEPSEEK_AIMD_DECREASE_FACTOR: float = 0.5  # во сколько раз сжимать лимит на 429/5xx
+    DEEPSEEK_MAX_RETRIES: int = 2  # повторы на 429/5xx с учётом Retry-After
+    DEEPSEEK_RETRY_AFTER_MAX_SECONDS: float = 10.0  # дольше — сразу отдаём ошибку
+
+    # --- LLM response cache ---
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_REDIS_ENABLED: bool = False  # общий кэш для всех воркеров на REDIS_URL
+    # Одинаковые одновременные запросы к DeepSeek и поиску выполняются один раз
+    COALESCING_ENABLED: bool = True
+
+
+    # --- Embeddings (RAG) ---
+    EMBEDDING_BACKEND: str = "hashing"  # hashing | sentence_transformers
+    EMBEDDING_MODEL: str = "intfloat/multilingual-e5-small"
+    # Пусто — берётся из бэкенда: 1536 для hashing, размерность модели из
+    # KNOWN_EMBEDDING_DIMS для sentence_transformers. При загрузке модели
+    # размерность сверяется с фактической.
+    EMBEDDING_DIM: Optional[int] = None
+    EMBEDDING_QUERY_PREFIX: str = "query: "
+    EMBEDDING_PASSAGE_PREFIX: str = "passage: "
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_WORKERS: int = 2
+    EMBEDDING_CACHE_SIZE: int = 2048
+
+    # --- Vector index (pgvector) ---
+    VECTOR_INDEX_TYPE: str = "hnsw"  # hnsw | ivfflat
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_IVFFLAT_LISTS: int = 100
+    RAG_HNSW_EF_SEARCH: int = 40  # больше — выше recall, медленнее запрос
+    RAG_IVFFLAT_PROBES: int = 10
+    # Компактный ANN-индекс (pgvector ≥ 0.7) + точный пересчёт кандидатов по полному вектору
+    VECTOR_QUANTIZATION: str = "none"  # none | halfvec | bit
+    RAG_HALFVEC_OVERSAMPLE: int = 2  # кандидатов с halfvec-индекса = limit * N
+    RAG_BIT_OVERSAMPLE: int = 8  # бинарный индекс грубее — кандидатов нужно больше
+
+    # --- Vector store ---
+    VECTOR_STORE: str = "pgvector"  # pgvector | numpy (матрица в памяти процесса, без БД; пакет numpy)
+    VECTOR_STORE_DIR: str = "storage/vectors"  # файлы numpy-хранилища
+    VECTOR_STORE_DTYPE: str = "float32"  # float32 | float16 (вдвое меньше памяти)
+
+    # --- Retrieval ---
+    RAG_SEARCH_MODE: str = "hybrid"  # vector | hybrid
+    RAG_HYBRID_CANDIDATES: int = 50  # кандидатов из каждого поиска до слияния
+    RAG_RRF_K: int = 60
+
+    # --- Retrieval cache ---
+    # Ключ — эмбеддинг запроса и параметры поиска плюс версии областей поиска
+    # (retrieval_versions, LISTEN/NOTIFY) — после загрузки документов старые записи не читаются
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 2048  # LRU в памяти процесса
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 3600
+    RETRIEVAL_CACHE_REDIS_ENABLED: bool = False  # общий кэш результатов для всех воркеров на REDIS_URL
+
+    # --- RAG prompt context ---
+    RAG_CONTEXT_CANDIDATES: int = 6  # фрагментов из поиска до упаковки в бюджет
+    RAG_CONTEXT_MAX_TOKENS: int = 1500  # бюджет контекста в промпте
+    RAG_CONTEXT_SOURCE_MAX_TOKENS: int = 600  # один фрагмент не вытесняет остальные
+    RAG_CHARS_PER_TOKEN: float = 2.5  # оценка токенов без токенизатора (с запасом для кириллицы)
+
+    # --- Supervision documents ---
+    UPLOAD_DIR: str = "storage/uploads"  # загруженные предписания (имя файла — sha256 содержимого)
+    SUPERVISION_EXTRACT_WORKERS: int = 2  # процессов разбора PDF/DOCX
+    SUPERVISION_EXTRACT_TIMEOUT_SECONDS: float = 120.0
+    SUPERVISION_TEXT_CACHE_SIZE: int = 64  # извлечённых текстов в памяти
+    SUPERVISION_TEXT_CACHE_TTL_SECONDS: int = 86400
+    SUPERVISION_TEXT_CACHE_REDIS_ENABLED: bool = False  # общий кэш текстов на REDIS_URL
+    SUPERVISION_PROMPT_MAX_TOKENS: int = 4000  # текст предписания в промпте анализа
+
+    # --- Startup warm-up ---
+    WARMUP_ENABLED: bool = True  # /ready отвечает 200 только после прогрева
+    WARMUP_DB_CONNECTIONS: int = 5  # соединений пула, открываемых заранее
+    WARMUP_RETRY_SECONDS: float = 5.0  # повтор прогрева, если БД ещё недоступна
+
+    # --- Response variants ---
+    RESPONSE_VARIANTS_DEFAULT: int = 3  # вариантов ответа на обращение по умолчанию
+    RESPONSE_VARIANTS_CONCURRENCY: int = 3  # одновременных запросов к DeepSeek на одно обращение
+
+    # --- Ingestion ---
+    INGEST_CHUNK_CHARS: int = 1500
+    INGEST_CHUNK_OVERLAP: int = 200
+    INGEST_BATCH_SIZE: int = 256
+    INGEST_READ_BLOCK_BYTES: int = 65536
+
+    # --- Background generation jobs ---
+    JOBS_BACKEND: str = "local"  # local (очередь в процессе) | redis (общая очередь на REDIS_URL)
+    JOBS_WORKERS: int = 4
+    JOBS_QUEUE_MAX: int = 1000  # при переполнении приём заданий отвечает 503
+    JOBS_LEASE_SECONDS: int = 300  # задание в processing дольше этого считается упавшим
+    JOBS_MAX_ATTEMPTS: int = 3
+    JOBS_RECOVERY_INTERVAL_SECONDS: int = 60
+    JOBS_WAIT_MAX_SECONDS: int = 30  # предел long polling на GET /requests/jobs/{id}
+
+
+    # --- Dashboard ---
+    DASHBOARD_TIMEZONE: str = "Europe/Moscow"  # граница суток для дневных счётчиков
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    DASHBOARD_DEFAULT_PERIOD_DAYS: int = 30
 
 
     # --- Security ---
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173"]
     PII_MASKING_ENABLED: bool = True
-    RATE_LIMIT_PER_MINUTE: int = 100
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 100  # на пользователя (или IP без токена)
+    RATE_LIMIT_ORG_PER_MINUTE: int = 1000  # на организацию (УК/ТСЖ) суммарно
+    RATE_LIMIT_BACKEND: str = "local"  # local | redis (общие счётчики на REDIS_URL)
     MAX_UPLOAD_SIZE_MB: int = 10
 
     # --- App ---
@@ -51,5 +182,20 @@ class Settings(BaseSettings):
         "case_sensitive": True,
     }
 
+    @model_validator(mode="after")
+    def _resolve_embedding_dim(self) -> "Settings":
+        # Размерность нужна уже при импорте моделей (колонка vector(N)),
+        # поэтому выводится из настроек, а не из загруженной модели
+        if self.EMBEDDING_DIM is None:
+            if self.EMBEDDING_BACKEND == "sentence_transformers":
+                if self.EMBEDDING_MODEL not in KNOWN_EMBEDDING_DIMS:
+                    raise ValueError(
+                        f"Размерность модели {self.EMBEDDING_MODEL} неизвестна — задайте EMBEDDING_DIM"
+                    )
+                self.EMBEDDING_DIM = KNOWN_EMBEDDING_DIMS[self.EMBEDDING_MODEL]
+            else:
+                self.EMBEDDING_DIM = HASHING_EMBEDDING_DIM
+        return self
+
 
 settings = Settings()
@@ -2,8 +2,13 @@
 # SQLAlchemy async database engine & session
 # ============================================================
 
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.services.metrics import DB_POOL_CHECKOUT_SECONDS, record_stage
 
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -19,6 +24,34 @@ async_session = async_sessionmaker(
 )
 
 
+# --- Ожидание соединения из пула ---
+# Сессия остаётся ленивой: соединение берётся при первом запросе к БД.
+# Время от начала транзакции до выдачи соединения пулом и есть ожидание
+# checkout (плюс подключение, если пул создаёт новое соединение).
+
+_CHECKOUT_STARTED = "_checkout_started"
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_checkout_start(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info[_CHECKOUT_STARTED] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _observe_checkout(session, transaction, connection) -> None:
+    started = session.info.pop(_CHECKOUT_STARTED, None)
+    if started is not None:
+        waited = time.perf_counter() - started
+        DB_POOL_CHECKOUT_SECONDS.observe(waited)
+        record_stage("db_checkout", waited)
+
+
+def raw_dsn() -> str:
+    """DSN для прямого подключения asyncpg (без диалекта SQLAlchemy)."""
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
 async def get_db() -> AsyncSession:  # type: ignore[misc]
     """Dependency — yields an async DB session."""
     async with async_session() as session:
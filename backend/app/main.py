@@ -3,21 +3,52 @@
 # ============================================================
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
 from app.api.router import api_router
 from app.database import engine
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.timing import ServerTimingMiddleware
+from app.services.auth import last_active_buffer, principal_cache
+from app.services.cache import llm_response_cache
+from app.services.coalescing import coalescing_stats
+from app.services.deepseek_client import deepseek_client
+from app.services.embeddings import embedding_service
+from app.services.extraction import text_extractor
+from app.services.jobs import job_service
+from app.services.metrics import update_pool_gauges
+from app.services.rag import rag_service
+from app.services.retrieval_cache import retrieval_cache
+from app.services.rate_limit import rate_limiter
+from app.services.warmup import warmup_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup / shutdown lifecycle."""
     # startup
+    await deepseek_client.start()
+    await job_service.start()
+    await last_active_buffer.start()
+    # Прогрев в фоне: liveness (/health) отвечает сразу, /ready — после прогрева
+    await warmup_service.start()
+    await retrieval_cache.start()
     yield
     # shutdown
+    await warmup_service.stop()
+    await retrieval_cache.stop()
+    await job_service.stop()
+    await last_active_buffer.stop()
+    await deepseek_client.aclose()
+    await llm_response_cache.aclose()
+    await text_extractor.aclose()
+    await rate_limiter.aclose()
+    embedding_service.shutdown()
     await engine.dispose()
 
 
@@ -31,6 +62,11 @@ app = FastAPI(
 )
 
 # --- Middleware ---
+# add_middleware оборачивает уже добавленные: первый — внутренний слой.
+# Rate limit внутри CORS — ответы 429 получают CORS-заголовки, а
+# preflight-запросы CORS отвечает сам, не расходуя квоту.
+
+app.add_middleware(RateLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +79,9 @@ app.add_middleware(
 if not settings.DEBUG:
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
+# Добавлен последним — внешний слой, учитывает и отклонённые запросы
+app.add_middleware(ServerTimingMiddleware)
+
 # --- Routes ---
 
 app.include_router(api_router, prefix="/api/v1")
@@ -55,4 +94,27 @@ async def health():
         "version": settings.APP_VERSION,
         "pii_masking": settings.PII_MASKING_ENABLED,
         "deepseek_configured": settings.DEEPSEEK_API_KEY is not None,
+        "deepseek_pool": deepseek_client.stats(),
+        "llm_cache": llm_response_cache.stats(),
+        "coalescing": coalescing_stats(),
+        "jobs": job_service.stats(),
+        "text_extraction": text_extractor.stats(),
+        "vector_store": rag_service.store.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "auth": {"principals": principal_cache.stats(), "last_active": last_active_buffer.stats()},
     }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503, пока не завершён прогрев (БД, эмбеддинги, поиск)."""
+    if not warmup_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "warmup": warmup_service.stats()})
+    return {"status": "ready", "warmup": warmup_service.stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus."""
+    update_pool_gauges(engine.sync_engine.pool)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
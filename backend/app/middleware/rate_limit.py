@@ -0,0 +1,100 @@
+# ============================================================
+# Rate limiting входящих запросов по пользователю и организации
+# ============================================================
+# Ключи берутся только из проверенного JWT (sub, organization_id):
+# заголовки, которые клиент может подделать, не используются. Запросы
+# без валидного токена лимитируются по IP. Превышение — 429 с
+# Retry-After; у пропущенных запросов — заголовки X-RateLimit-*.
+# ============================================================
+
+import math
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.auth import principal_cache
+from app.services.rate_limit import SlidingWindowLimiter, rate_limiter
+
+
+def _token_claims(headers: Headers) -> Optional[dict]:
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    # В кэше только access-токены, прошедшие get_current_user
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal.as_dict()
+    try:
+        # jose подгружается только при наличии токена
+        from app.security import decode_token
+
+        claims = decode_token(token)
+    except Exception:
+        return None
+    # Refresh-токен не даёт доступа к API — такой запрос лимитируется по IP
+    return claims if claims.get("type") == "access" else None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter: Optional[SlidingWindowLimiter] = None, path_prefix: str = "/api/"):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.path_prefix = path_prefix
+
+    def _identify(self, scope: Scope) -> Tuple[str, Optional[str]]:
+        claims = _token_claims(Headers(scope=scope))
+        if claims and claims.get("sub"):
+            organization_id = claims.get("organization_id")
+            return f"user:{claims['sub']}", f"org:{organization_id}" if organization_id else None
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}", None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"  # preflight CORS не расходует квоту
+            or not settings.RATE_LIMIT_ENABLED
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        user_key, org_key = self._identify(scope)
+        # Сначала личный лимит: запросы, отклонённые по нему, не расходуют
+        # общую квоту организации — один пользователь не выбирает её за всех
+        decision = await self.limiter.hit(user_key, settings.RATE_LIMIT_PER_MINUTE)
+        if not decision.allowed:
+            await self._reject(decision, "пользователя", scope, receive, send)
+            return
+        if org_key is not None:
+            org_decision = await self.limiter.hit(org_key, settings.RATE_LIMIT_ORG_PER_MINUTE)
+            if not org_decision.allowed:
+                await self._reject(org_decision, "организации", scope, receive, send)
+                return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-ratelimit-limit", str(decision.limit).encode()))
+                headers.append((b"x-ratelimit-remaining", str(decision.remaining).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    async def _reject(decision, subject: str, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(
+            {"detail": f"Превышен лимит запросов {subject}: {decision.limit} в минуту"},
+            status_code=429,
+            headers={
+                "Retry-After": str(max(1, math.ceil(decision.retry_after))),
+                "X-RateLimit-Limit": str(decision.limit),
+                "X-RateLimit-Remaining": "0",
+            },
+        )
+        await response(scope, receive, send)
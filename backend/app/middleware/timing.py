@@ -0,0 +1,46 @@
+# ============================================================
+# Server-Timing и метрики длительности HTTP-запросов
+# ============================================================
+# Чистый ASGI-middleware (без BaseHTTPMiddleware), чтобы не ломать
+# потоковые ответы: заголовок добавляется в момент отправки
+# http.response.start и содержит этапы, завершённые к этому моменту.
+# ============================================================
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import HTTP_REQUEST_SECONDS, start_request_timings
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = start_request_timings()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                entries = [f"{name};dur={ms:.1f}" for name, ms in timings]
+                entries.append(f"total;dur={elapsed * 1000:.1f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message["headers"] = headers
+
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.labels(
+                    method=scope["method"],
+                    # Шаблон маршрута, а не путь — иначе метки разрастаются
+                    route=getattr(route, "path", "unmatched"),
+                    status=str(message["status"]),
+                ).observe(elapsed)
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -4,13 +4,15 @@
 
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Float, Enum as SAEnum
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy import BigInteger, Column, String, Boolean, Date, DateTime, Text, ForeignKey, Float, Integer, Index, Computed, Enum as SAEnum
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import DeclarativeBase, relationship, deferred
 import enum
 
 from pgvector.sqlalchemy import Vector
 
+from app.config import settings
+
 class Base(DeclarativeBase):
     pass
 
@@ -62,10 +64,27 @@ class Request(Base):
     masked_text = Column(Text)
     response_text = Column(Text)
     risk_level = Column(String(10), default="low")
-    status = Column(String(20), default="draft")  # draft | processing | completed
+    status = Column(String(20), default="draft")  # draft | queued | processing | completed | failed
+    attempts = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)  # взято воркером (для восстановления)
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
+    __table_args__ = (
+        Index("ix_requests_status_created_at", "status", "created_at"),
+        Index("ix_requests_organization_id_created_at", "organization_id", "created_at"),
+    )
+
+
+class DashboardDailyStat(Base):
+    """Дневные счётчики панели управления — обновляются инкрементально, без COUNT(*) по requests."""
+    __tablename__ = "dashboard_daily_stats"
+
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # дата в DASHBOARD_TIMEZONE
+    metric = Column(String(32), primary_key=True)  # requests_created | responses_generated | legal_consultations | supervision_responses
+    count = Column(Integer, nullable=False, default=0)
+
 
 class Document(Base):
     __tablename__ = "documents"
@@ -77,6 +96,8 @@ class Document(Base):
     file_size = Column(Float)
     storage_path = Column(Text)
     analysis_result = Column(Text)  # JSON строка
+    is_public = Column(Boolean, default=False, nullable=False)  # общий нормативный корпус для всех УК
+    content_hash = Column(String(64))  # sha256 загруженного текста: смена содержимого — повторная загрузка
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     chunks = relationship("DocumentChunk", back_populates="document")
@@ -87,8 +108,27 @@ class DocumentChunk(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False)
+    # Копия documents.organization_id для поиска в пределах арендатора; NULL — общий корпус
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=True)
+    chunk_index = Column(Integer)  # порядковый номер фрагмента в документе (для возобновления загрузки)
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(1536))  # 1536 — размерность для OpenAI/DeepSeek или 1024 для Yandex
+    embedding = Column(Vector(settings.EMBEDDING_DIM))  # размерность задаётся EMBEDDING_DIM
     meta_info = Column(Text)  # JSON с доп. инфо (статья, пункт)
+    # Полнотекстовый индекс (русская морфология) для гибридного поиска
+    content_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('russian', content)", persisted=True)))
 
     document = relationship("Document", back_populates="chunks")
+
+    __table_args__ = (
+        Index("ix_document_chunks_document_id_chunk_index", "document_id", "chunk_index", unique=True),
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        Index("ix_document_chunks_organization_id", "organization_id"),
+    )
+
+
+class RetrievalVersion(Base):
+    """Версия области поиска: растёт триггером при любом изменении document_chunks (0008)."""
+    __tablename__ = "retrieval_versions"
+
+    scope = Column(UUID(as_uuid=True), primary_key=True)  # organization_id; нулевой UUID — общий корпус
+    version = Column(BigInteger, nullable=False, default=0)
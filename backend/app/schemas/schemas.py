@@ -3,6 +3,7 @@
 # ============================================================
 
 from pydantic import BaseModel, EmailStr, Field
+import uuid
 from typing import Optional
 from datetime import datetime
 
@@ -45,6 +46,9 @@ class MaskPIIResponse(BaseModel):
 class GenerateRequest(BaseModel):
     text: str = Field(min_length=1, max_length=50000)
     tone: Optional[str] = None
+    max_variants: Optional[int] = Field(default=None, ge=1, le=3)
+    organization_id: Optional[uuid.UUID] = None  # только при входе и равный организации из токена
+    llm: Optional["LLMSettingsSchema"] = None
 
 
 class ResponseVariant(BaseModel):
@@ -98,6 +102,34 @@ class LegalSearchResponse(BaseModel):
 
 # --- Supervision ---
 
+class DocumentRequirement(BaseModel):
+    id: str
+    requirement: str
+    legal_basis: str = ""
+    status: str = "violation"  # complied | partial | violation
+    documents: list[str] = []
+
+
+class AuditCheck(BaseModel):
+    id: int
+    check: str
+    status: str  # passed | warning | failed
+
+
+class SupervisionDocumentInfo(BaseModel):
+    sender: str = ""
+    number: str = ""
+    date: str = ""
+    deadline: str = ""
+
+
+class SupervisionAnalysisResponse(BaseModel):
+    analysis_id: str
+    requirements: list[DocumentRequirement]
+    audit_checks: list[AuditCheck]
+    document_info: SupervisionDocumentInfo
+
+
 class SupervisionGenerateRequest(BaseModel):
     analysis_id: str
 
@@ -2,27 +2,86 @@
 # JWT Security, Password hashing, RBAC
 # ============================================================
 
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
+
+from functools import lru_cache
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from app.config import settings
+from app.services.auth import last_active_buffer, load_principal, principal_cache
+
+# passlib и jose (с cryptography) импортируются при первом использовании:
+# холодный старт реплики не платит за них, пока нет входов и токенов.
 
 # --- Password hashing ---
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+
+@lru_cache(maxsize=1)
+def pwd_context():
+    """
+    CryptContext bcrypt. min/max_rounds = rounds: хэш с другим числом
+    раундов считается устаревшим и пересчитывается при следующем входе
+    (verify_and_update_password).
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    )
+
+# bcrypt — ~250 мс чистого CPU на вызов; C-расширение отпускает GIL,
+# поэтому хватает пула потоков. Размер пула ограничивает и число
+# одновременных хэширований (очередь входов не съедает все ядра).
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return pwd_context().verify(plain, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password вне event loop — для async-обработчиков."""
+    return await asyncio.get_running_loop().run_in_executor(_executor(), hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """verify_password вне event loop — для async-обработчиков."""
+    return await asyncio.get_running_loop().run_in_executor(_executor(), verify_password, plain, hashed)
+
+
+async def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверка пароля при входе. Второй элемент — новый хэш, если сохранённый
+    посчитан с другими параметрами (PASSWORD_BCRYPT_ROUNDS): его нужно
+    записать в users.hashed_password. Пароль в открытом виде есть только
+    при входе, поэтому пересчёт возможен только здесь.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor(), pwd_context().verify_and_update, plain, hashed
+    )
 
 
 def validate_password_strength(password: str) -> None:
@@ -48,6 +107,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expires_delta or timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire, "type": "access"})
+    from jose import jwt
+
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
@@ -55,10 +116,14 @@ def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
+    from jose import jwt
+
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
 def decode_token(token: str) -> dict:
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
@@ -77,11 +142,58 @@ bearer_scheme = HTTPBearer()
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ) -> dict:
-    """Extract and validate JWT from Authorization header."""
-    payload = decode_token(credentials.credentials)
-    if payload.get("type") != "access":
-        raise HTTPException(status_code=401, detail="Неверный тип токена")
-    return payload
+    """
+    Extract and validate JWT from Authorization header.
+    Проверенный токен и статус пользователя кэшируются (principal_cache),
+    last_active пишется пакетно в фоне — без обращений к БД на каждый запрос.
+    """
+    token = credentials.credentials
+    principal = principal_cache.get(token)
+    if principal is None:
+        payload = decode_token(token)
+        if payload.get("type") != "access":
+            raise HTTPException(status_code=401, detail="Неверный тип токена")
+        principal = await load_principal(payload)
+        if principal is None:
+            raise HTTPException(status_code=401, detail="Пользователь не найден или заблокирован")
+        principal_cache.put(token, principal)
+    last_active_buffer.touch(principal.user_id)
+    return principal.as_dict()
+
+
+optional_bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer_scheme),
+) -> Optional[dict]:
+    """
+    get_current_user для эндпоинтов, доступных и без входа: без заголовка
+    Authorization — None, невалидный токен — 401, как и в get_current_user.
+    """
+    if credentials is None:
+        return None
+    return await get_current_user(credentials)
+
+
+def resolve_organization(
+    requested: Optional[uuid.UUID], current_user: Optional[dict]
+) -> Optional[uuid.UUID]:
+    """
+    Организация (арендатор) запроса — только из токена: organization_id
+    от клиента допускается, лишь если совпадает с ней, иначе 403. Без
+    входа — None: поиск только по общему корпусу, без статистики панели.
+    """
+    if current_user is None:
+        return None
+    raw = current_user.get("organization_id")
+    organization_id = uuid.UUID(str(raw)) if raw else None
+    if requested is not None and requested != organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к данным другой организации",
+        )
+    return organization_id
 
 
 def require_role(*roles: str):
@@ -0,0 +1,193 @@
+# ============================================================
+# Аутентификация без работы с БД на каждый запрос
+# ============================================================
+# PrincipalCache — проверенные JWT + статус пользователя из БД, ключ —
+# sha256 токена (сам токен в памяти не хранится). Запись живёт не
+# дольше AUTH_PRINCIPAL_CACHE_TTL_SECONDS и не дольше exp токена.
+# Блокировка пользователя сбрасывает его записи (invalidate_user);
+# в других воркерах uvicorn записи истекают сами по короткому TTL.
+# LastActiveBuffer — users.last_active копится в памяти и пишется
+# одним UPDATE для всех пользователей раз в несколько секунд.
+# ============================================================
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, TIMESTAMP, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session
+from ..models.models import User
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Пользователь запроса: проверенные claims токена + актуальные роль и организация."""
+    user_id: str
+    organization_id: Optional[str]
+    role: str
+    expires_at: float  # exp токена, unix time
+    claims: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            **self.claims,
+            "sub": self.user_id,
+            "organization_id": self.organization_id,
+            "role": self.role,
+        }
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._cache = TTLCache(max_entries, ttl_seconds)
+        # user_id → ключи его токенов, для invalidate_user
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = token_key(token)
+        principal = self._cache.get(key)
+        if principal is not None and principal.expires_at <= time.time():
+            self._cache.delete(key)
+            return None
+        return principal
+
+    def put(self, token: str, principal: Principal) -> None:
+        ttl = min(self.ttl_seconds, principal.expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = token_key(token)
+        self._cache.set(key, principal, ttl_seconds=ttl)
+        # Ключи, вытесненные из LRU, не копятся в индексе
+        keys = {k for k in self._keys_by_user.get(principal.user_id, ()) if k in self._cache}
+        keys.add(key)
+        self._keys_by_user[principal.user_id] = keys
+
+    def invalidate_user(self, user_id) -> None:
+        for key in self._keys_by_user.pop(str(user_id), ()):
+            self._cache.delete(key)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "invalidations": self.invalidations}
+
+
+class LastActiveBuffer:
+    """Write-behind для users.last_active: одна запись на пользователя за интервал."""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    def touch(self, user_id) -> None:
+        self._pending[str(user_id)] = datetime.now(timezone.utc)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось записать last_active при остановке")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось записать last_active")
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        stmt = text(
+            "UPDATE users AS u SET last_active = v.ts "
+            "FROM unnest(CAST(:ids AS uuid[]), CAST(:ts AS timestamptz[])) AS v(id, ts) "
+            "WHERE u.id = v.id AND (u.last_active IS NULL OR u.last_active < v.ts)"
+        ).bindparams(
+            bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+            bindparam("ts", type_=ARRAY(TIMESTAMP(timezone=True))),
+        )
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    stmt, {"ids": [uuid.UUID(u) for u in pending], "ts": list(pending.values())}
+                )
+                await db.commit()
+        except Exception:
+            # Вернуть несохранённое, не затирая более свежие отметки
+            for user_id, ts in pending.items():
+                self._pending.setdefault(user_id, ts)
+            raise
+        self.flushes += 1
+        self.flushed_rows += len(pending)
+        return len(pending)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushes": self.flushes, "flushed_rows": self.flushed_rows}
+
+
+async def load_principal(claims: dict) -> Optional[Principal]:
+    """Роль, организация и is_active из БД; None — пользователя нет или он заблокирован."""
+    try:
+        user_id = uuid.UUID(str(claims.get("sub")))
+    except ValueError:
+        return None
+    async with async_session() as db:
+        row = (await db.execute(
+            select(User.role, User.organization_id, User.is_active).where(User.id == user_id)
+        )).first()
+    if row is None or not row.is_active:
+        return None
+    return Principal(
+        user_id=str(user_id),
+        organization_id=str(row.organization_id),
+        role=row.role.value if hasattr(row.role, "value") else str(row.role),
+        expires_at=float(claims.get("exp", 0)),
+        claims=claims,
+    )
+
+
+async def set_user_active(db: AsyncSession, user_id: uuid.UUID, is_active: bool) -> None:
+    """
+    Блокировка/разблокировка: кэш сбрасывается сразу, а не по TTL.
+    Сброс после коммита — иначе параллельный запрос успел бы закэшировать
+    ещё не изменённый статус.
+    """
+    await db.execute(update(User).where(User.id == user_id).values(is_active=is_active))
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+
+
+principal_cache = PrincipalCache(
+    settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES, settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
+last_active_buffer = LastActiveBuffer(settings.AUTH_LAST_ACTIVE_FLUSH_SECONDS)
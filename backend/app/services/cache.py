@@ -0,0 +1,191 @@
+# ============================================================
+# Кэширование — in-process LRU с TTL и опциональный Redis-уровень
+# ============================================================
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ..config import settings
+
+
+class TTLCache:
+    """
+    LRU-кэш в памяти процесса с ограничением числа записей и временем жизни.
+    None не хранится — get() возвращает None при промахе.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Any) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Any) -> bool:
+        """Наличие записи без учёта TTL и без влияния на статистику."""
+        return key in self._data
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+    """
+    Общий для всех воркеров uvicorn уровень кэша на settings.REDIS_URL.
+    Пакет redis необязателен: без него и при недоступном сервере уровень
+    просто отключается, ошибки Redis никогда не ломают основной запрос.
+    """
+
+    def __init__(self, url: str, prefix: str):
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self._disabled = False
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _get_client(self):
+        if self._client is None and not self._disabled:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                self._disabled = True
+                return None
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def get(self, key: str) -> Optional[str]:
+        client = self._get_client()
+        if client is None:
+            return None
+        try:
+            value = await client.get(self.prefix + key)
+        except Exception:
+            self.errors += 1
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: Optional[int] = None) -> None:
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            await client.set(self.prefix + key, value, ex=ttl_seconds or None)
+        except Exception:
+            self.errors += 1
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": not self._disabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+class LLMResponseCache:
+    """
+    Кэш ответов LLM. Ключ — маскированный промпт + провайдер, модель и параметры
+    генерации, поэтому персональные данные в ключ не попадают.
+    """
+
+    def __init__(self):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self.ttl_seconds = settings.LLM_CACHE_TTL_SECONDS
+        self.local = TTLCache(settings.LLM_CACHE_MAX_ENTRIES, self.ttl_seconds)
+        self.shared = (
+            RedisCache(settings.REDIS_URL, prefix="llm:response:")
+            if settings.LLM_CACHE_REDIS_ENABLED
+            else None
+        )
+        self.bypassed = 0
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, params: Optional[dict] = None) -> str:
+        raw = json.dumps(
+            {"provider": provider, "model": model, "prompt": prompt, "params": params or {}},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        value = await self.shared.get(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            await self.shared.set(key, value, self.ttl_seconds)
+
+    async def aclose(self) -> None:
+        if self.shared is not None:
+            await self.shared.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "bypassed": self.bypassed,
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,193 @@
+# ============================================================
+# Объединение одинаковых одновременных запросов (single-flight)
+# ============================================================
+# После рассылки уведомления десятки операторов задают один и тот же
+# вопрос за несколько секунд. Пока первый запрос (ведущий) выполняется,
+# одинаковые запросы с тем же ключом не идут в DeepSeek / pgvector, а
+# ждут его результат. Объединяются только запросы «в полёте»: после
+# завершения повторный запрос выполняется заново (или берётся из кэша).
+#
+# SingleFlight — для обычных вызовов: ведущий выполняет функцию в своём
+# контексте (со своей сессией БД), остальные ждут future. Если ведущего
+# отменили (клиент отключился), ожидающие не получают ошибку — один из
+# них становится новым ведущим.
+#
+# StreamFanout — для потоков: один upstream-поток читается фоновой
+# задачей и раздаётся всем подписчикам; подключившийся позже получает
+# уже пришедшие фрагменты, затем продолжение. Когда уходит последний
+# подписчик, upstream-поток закрывается.
+# ============================================================
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from ..config import settings
+from .metrics import COALESCED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class _LeaderCancelled(Exception):
+    """Ведущий вызов отменён — ожидающий повторяет попытку сам."""
+
+
+class SingleFlight:
+    def __init__(self, kind: str, enabled: bool = True):
+        self.kind = kind
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Результат fn() для key; одновременные вызовы с тем же ключом
+        получают один и тот же объект результата (или исключение).
+        """
+        if not self.enabled:
+            return await fn()
+
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.followers += 1
+            COALESCED_TOTAL.labels(kind=self.kind, role="follower").inc()
+            try:
+                # shield: отмена ожидающего не должна отменять общий future
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # Исключение считается полученным, даже если ожидающих не было
+        future.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = future
+        self.leaders += 1
+        COALESCED_TOTAL.labels(kind=self.kind, role="leader").inc()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+class _Broadcast:
+    """Один upstream-поток: накопленные фрагменты и подписчики."""
+
+    def __init__(self):
+        self.items: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        # Новое событие на каждый фрагмент: ожидающие уже держат старое
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StreamFanout:
+    def __init__(self, kind: str, enabled: bool = True):
+        self.kind = kind
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Фрагменты потока factory() для key; upstream открывается один раз на ключ."""
+        if not self.enabled:
+            async for item in factory():
+                yield item
+            return
+
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._inflight[key] = broadcast
+            broadcast.task = asyncio.create_task(self._pump(key, broadcast, factory))
+            self.leaders += 1
+            COALESCED_TOTAL.labels(kind=self.kind, role="leader").inc()
+        else:
+            self.followers += 1
+            COALESCED_TOTAL.labels(kind=self.kind, role="follower").inc()
+
+        broadcast.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(broadcast.items):
+                    yield broadcast.items[position]
+                    position += 1
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await broadcast.changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Слушать больше некому — upstream закрывается, ключ освобождается
+                self._release(key, broadcast)
+                broadcast.task.cancel()
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for item in factory():
+                broadcast.items.append(item)
+                broadcast.notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Ошибка upstream-потока %s", self.kind)
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            self._release(key, broadcast)
+            broadcast.notify()
+
+    def _release(self, key: Hashable, broadcast: _Broadcast) -> None:
+        if self._inflight.get(key) is broadcast:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+def coalescing_stats() -> dict:
+    return {
+        "llm": llm_flight.stats(),
+        "llm_stream": llm_stream_fanout.stats(),
+        "retrieval": retrieval_flight.stats(),
+    }
+
+
+llm_flight = SingleFlight("llm", settings.COALESCING_ENABLED)
+llm_stream_fanout = StreamFanout("llm_stream", settings.COALESCING_ENABLED)
+retrieval_flight = SingleFlight("retrieval", settings.COALESCING_ENABLED)
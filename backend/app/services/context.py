@@ -0,0 +1,108 @@
+# ============================================================
+# Сборка контекста RAG-промпта в пределах бюджета токенов
+# ============================================================
+# Найденные фрагменты идут в промпт в порядке ранжирования, пока не
+# исчерпан бюджет RAG_CONTEXT_MAX_TOKENS: дубликаты и перекрытия
+# соседних фрагментов (INGEST_CHUNK_OVERLAP) выбрасываются, длинный
+# фрагмент обрезается по границе предложения. Токены оцениваются
+# локально по числу символов — без запроса к токенизатору модели.
+# ============================================================
+
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from ..config import settings
+from .embeddings import normalize_text
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+")
+# Перекрытие ищется по началу фрагмента такой длины
+_OVERLAP_PROBE_CHARS = 64
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка сверху: для русского текста BPE-токен — около 2.5–3.5 символов."""
+    return math.ceil(len(text) / settings.RAG_CHARS_PER_TOKEN) if text else 0
+
+
+def trim_to_sentences(text: str, max_tokens: int) -> str:
+    """Начало текста из целых предложений в пределах max_tokens ("" — не влезло ни одно)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        candidate = f"{kept} {sentence}" if kept else sentence
+        if estimate_tokens(candidate) > max_tokens:
+            break
+        kept = candidate
+    return kept
+
+
+def _strip_overlap(text: str, previous: str) -> str:
+    """Убирает из начала text хвост previous, повторённый нарезчиком."""
+    probe = text[:_OVERLAP_PROBE_CHARS]
+    if len(probe) < _OVERLAP_PROBE_CHARS:
+        return text
+    # Самое длинное перекрытие: первое вхождение, с которого хвост previous совпадает с началом text
+    position = previous.find(probe, max(0, len(previous) - len(text)))
+    while position != -1:
+        if text.startswith(previous[position:]):
+            return text[len(previous) - position:].lstrip()
+        position = previous.find(probe, position + 1)
+    return text
+
+
+@dataclass
+class ContextItem:
+    """Источник в промпте: исходные данные + вошедший в бюджет текст."""
+    source: dict
+    text: str
+    tokens: int
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens: Optional[int] = None, source_max_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens or settings.RAG_CONTEXT_MAX_TOKENS
+        self.source_max_tokens = source_max_tokens or settings.RAG_CONTEXT_SOURCE_MAX_TOKENS
+
+    @staticmethod
+    def _header(number: int, source: dict) -> str:
+        return f"[{number}] {source['title']}, {source['citation']}:"
+
+    def pack(self, sources: List[dict], max_tokens: Optional[int] = None) -> List[ContextItem]:
+        """
+        sources — в порядке убывания релевантности (как их вернул поиск).
+        Возвращает вошедшие в бюджет источники в том же порядке.
+        """
+        budget = max_tokens or self.max_tokens
+        packed: List[ContextItem] = []
+        seen: List[str] = []
+        for source in sources:
+            text = str(source["content"]).strip()
+            for item in packed:
+                if item.source.get("title") == source.get("title"):
+                    # Сравнение с полным текстом: item.text мог быть обрезан
+                    text = _strip_overlap(text, str(item.source["content"]).strip())
+            normalized = normalize_text(text)
+            if not normalized or any(normalized in s for s in seen):
+                continue
+
+            header_tokens = estimate_tokens(self._header(len(packed) + 1, source)) + 1
+            allowed = min(self.source_max_tokens, budget - header_tokens)
+            if allowed <= 0:
+                break
+            text = trim_to_sentences(text, allowed)
+            if not text:
+                continue
+            tokens = header_tokens + estimate_tokens(text)
+            packed.append(ContextItem(source=source, text=text, tokens=tokens))
+            seen.append(normalized)
+            budget -= tokens
+        return packed
+
+    def render(self, items: List[ContextItem]) -> str:
+        return "\n\n".join(f"{self._header(i + 1, item.source)}\n{item.text}" for i, item in enumerate(items))
+
+
+context_builder = ContextBuilder()
@@ -0,0 +1,131 @@
+# ============================================================
+# Панель управления — дневные счётчики по организациям
+# ============================================================
+# Вместо COUNT(*) по requests за период счётчики обновляются в момент
+# события (UPSERT в той же транзакции, что и смена статуса обращения),
+# а панель суммирует не больше 2 × period строк на метрику — время
+# ответа не зависит от объёма истории. Готовая статистика кэшируется
+# на DASHBOARD_CACHE_TTL_SECONDS.
+# ============================================================
+
+import logging
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session
+from ..models.models import DashboardDailyStat
+from ..schemas.schemas import DashboardStatsResponse
+from .cache import TTLCache
+
+REQUESTS_CREATED = "requests_created"
+RESPONSES_GENERATED = "responses_generated"
+LEGAL_CONSULTATIONS = "legal_consultations"
+SUPERVISION_RESPONSES = "supervision_responses"
+
+logger = logging.getLogger(__name__)
+
+_TZ = ZoneInfo(settings.DASHBOARD_TIMEZONE)
+
+
+def local_day(moment: Optional[datetime] = None) -> date:
+    return (moment or datetime.now(timezone.utc)).astimezone(_TZ).date()
+
+
+def format_change(current: int, previous: int) -> str:
+    """Изменение к предыдущему периоду в формате панели: «+12%», «-5%», «0%»."""
+    if previous == 0:
+        return "+100%" if current else "0%"
+    percent = round((current - previous) * 100 / previous)
+    return f"{percent:+d}%" if percent else "0%"
+
+
+class DashboardService:
+    def __init__(self):
+        self.cache = TTLCache(max_entries=4096, ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+    async def record(
+        self,
+        db: AsyncSession,
+        organization_id: uuid.UUID,
+        metric: str,
+        amount: int = 1,
+        moment: Optional[datetime] = None,
+    ) -> None:
+        """
+        Инкремент дневного счётчика. Коммитит вызывающий — вместе с
+        изменением обращения, поэтому счётчики не расходятся с данными.
+        """
+        stmt = insert(DashboardDailyStat).values(
+            organization_id=organization_id, day=local_day(moment), metric=metric, count=amount
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    DashboardDailyStat.organization_id, DashboardDailyStat.day, DashboardDailyStat.metric
+                ],
+                set_={"count": DashboardDailyStat.count + stmt.excluded.count},
+            )
+        )
+
+    async def record_now(self, organization_id: uuid.UUID, metric: str, amount: int = 1) -> None:
+        """
+        Инкремент в собственной короткой транзакции — для потоковых ответов,
+        где сессия запроса живёт до конца потока: блокировка строки счётчика
+        не должна удерживаться, пока идёт генерация. Ошибка записи
+        статистики не прерывает ответ пользователю.
+        """
+        try:
+            async with async_session() as db:
+                await self.record(db, organization_id, metric, amount)
+                await db.commit()
+        except Exception:
+            logger.exception("Не удалось записать статистику %s", metric)
+
+    async def get_stats(self, db: AsyncSession, organization_id: uuid.UUID, days: int) -> DashboardStatsResponse:
+        key = (organization_id, days)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        today = local_day()
+        start = today - timedelta(days=days - 1)
+        previous_start = start - timedelta(days=days)
+        current = func.coalesce(func.sum(DashboardDailyStat.count).filter(DashboardDailyStat.day >= start), 0)
+        previous = func.coalesce(func.sum(DashboardDailyStat.count).filter(DashboardDailyStat.day < start), 0)
+        # Диапазон по первичному ключу (organization_id, day, metric)
+        rows = await db.execute(
+            select(DashboardDailyStat.metric, current.label("current"), previous.label("previous"))
+            .where(
+                DashboardDailyStat.organization_id == organization_id,
+                DashboardDailyStat.day >= previous_start,
+                DashboardDailyStat.day <= today,
+            )
+            .group_by(DashboardDailyStat.metric)
+        )
+        totals: Dict[str, tuple] = {row.metric: (int(row.current), int(row.previous)) for row in rows}
+
+        def pick(metric: str) -> tuple:
+            return totals.get(metric, (0, 0))
+
+        stats = DashboardStatsResponse(
+            processed_requests=pick(REQUESTS_CREATED)[0],
+            generated_responses=pick(RESPONSES_GENERATED)[0],
+            legal_consultations=pick(LEGAL_CONSULTATIONS)[0],
+            supervision_responses=pick(SUPERVISION_RESPONSES)[0],
+            requests_change=format_change(*pick(REQUESTS_CREATED)),
+            responses_change=format_change(*pick(RESPONSES_GENERATED)),
+            legal_change=format_change(*pick(LEGAL_CONSULTATIONS)),
+            supervision_change=format_change(*pick(SUPERVISION_RESPONSES)),
+        )
+        self.cache.set(key, stats)
+        return stats
+
+
+dashboard_service = DashboardService()
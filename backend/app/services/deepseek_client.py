@@ -0,0 +1,183 @@
+# ============================================================
+# Общий HTTP-клиент DeepSeek (пул соединений, keep-alive, HTTP/2)
+# ============================================================
+# Клиент создаётся один раз в app.main.lifespan и переиспользуется
+# всеми запросами к LLM. Это убирает TCP+TLS handshake на каждый
+# вызов /llm/generate и /legal/ask.
+# ============================================================
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from ..config import settings
+from .metrics import DEEPSEEK_RESPONSES
+from .rate_limit import AIMDLimiter, parse_retry_after
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class DeepSeekClient:
+    """
+    Долгоживущий httpx.AsyncClient с адаптивным ограничением числа
+    одновременных запросов: при 429/5xx лимит уменьшается, Retry-After
+    приостанавливает новые запросы всех пользователей.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.base_url = base_url or settings.DEEPSEEK_API_BASE
+        self.timeout = timeout or settings.DEEPSEEK_TIMEOUT_SECONDS
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=(
+                max_keepalive_connections or settings.DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=keepalive_expiry or settings.DEEPSEEK_KEEPALIVE_EXPIRY,
+        )
+        requested_http2 = settings.DEEPSEEK_HTTP2 if http2 is None else http2
+        # HTTP/2 требует пакет h2 — без него работаем по HTTP/1.1 с keep-alive
+        self.http2 = requested_http2 and _http2_available()
+        self.max_in_flight = max_in_flight or settings.DEEPSEEK_MAX_IN_FLIGHT
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limiter = AIMDLimiter(
+            max_limit=self.max_in_flight,
+            min_limit=settings.DEEPSEEK_MIN_IN_FLIGHT,
+            decrease_factor=settings.DEEPSEEK_AIMD_DECREASE_FACTOR,
+        )
+        self._total_requests = 0
+        self._in_flight = 0
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        _ = self.client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Клиент создаётся лениво, если lifespan не запускался (скрипты, тесты)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._client
+
+    # --- Requests ---
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator["_Outcome"]:
+        """Слот адаптивного лимита; результат запроса подстраивает лимит."""
+        await self.limiter.acquire()
+        self._total_requests += 1
+        self._in_flight += 1
+        outcome = _Outcome()
+        try:
+            yield outcome
+        finally:
+            self._in_flight -= 1
+            self.limiter.release(outcome.status, outcome.retry_after)
+
+    async def post(self, path: str, **kwargs: Any) -> httpx.Response:
+        async with self._slot() as outcome:
+            try:
+                response = await self.client.post(path, **kwargs)
+            except httpx.HTTPError:
+                DEEPSEEK_RESPONSES.labels(status="exception").inc()
+                raise
+            outcome.record(response)
+        return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """Потоковый запрос; слот занят, пока читается тело ответа."""
+        async with self._slot() as outcome:
+            opened = False
+            try:
+                async with self.client.stream(method, path, **kwargs) as response:
+                    opened = True
+                    outcome.record(response)
+                    yield response
+            except httpx.HTTPError:
+                if not opened:
+                    DEEPSEEK_RESPONSES.labels(status="exception").inc()
+                raise
+
+    async def warmup(self, api_key: Optional[str]) -> int:
+        """
+        TCP + TLS (+ HTTP/2) соединение с DeepSeek до первого запроса
+        пользователя: лёгкий GET /models остаётся в пуле keep-alive.
+        Мимо AIMD-лимита — ответ не характеризует нагрузку.
+        """
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        response = await self.client.get("/models", headers=headers)
+        return response.status_code
+
+    # --- Stats ---
+
+    def stats(self) -> dict:
+        connections = self._pool_connections()
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "max_in_flight": self.max_in_flight,
+            "limiter": self.limiter.stats(),
+            "total_requests": self._total_requests,
+            "in_flight": self._in_flight,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+        }
+
+    def _pool_connections(self) -> list:
+        # httpx не публикует статистику пула — берём её у транспорта httpcore,
+        # если внутренности доступны; после обновления httpx/httpcore они
+        # могут пропасть — тогда статистика пула пустая, а число запросов
+        # в полёте (in_flight) считаем сами.
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        try:
+            return [c for c in getattr(pool, "connections", None) or [] if callable(getattr(c, "is_idle", None))]
+        except TypeError:
+            return []
+
+
+class _Outcome:
+    """Код ответа и Retry-After для AIMD-лимита (None — ответа не было)."""
+
+    __slots__ = ("status", "retry_after")
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def record(self, response: httpx.Response) -> None:
+        self.status = response.status_code
+        self.retry_after = parse_retry_after(response.headers.get("retry-after"))
+        DEEPSEEK_RESPONSES.labels(status=str(response.status_code)).inc()
+
+
+deepseek_client = DeepSeekClient()
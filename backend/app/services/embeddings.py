@@ -0,0 +1,212 @@
+# ============================================================
+# Эмбеддинги — подключаемые бэкенды, батчинг, кэш запросов
+# ============================================================
+# Бэкенд выбирается через EMBEDDING_BACKEND:
+#   hashing               — детерминированный лексический (без зависимостей)
+#   sentence_transformers — локальная CPU-модель (пакет sentence-transformers)
+# Вычисления идут в пуле потоков и не блокируют event loop.
+# ============================================================
+
+import asyncio
+import hashlib
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from ..config import settings
+from .cache import TTLCache
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Ключ кэша эмбеддингов запросов: регистр и лишние пробелы не различаются."""
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+
+class EmbeddingBackend:
+    """Базовый класс бэкенда. Методы синхронные и выполняются в пуле потоков."""
+
+    dimension: int
+
+    def load(self) -> None:
+        """Загрузка модели (вызывается один раз, до первого embed)."""
+
+    def check_dimension(self, actual: int, source: str) -> None:
+        """Размерность векторов должна совпадать с колонкой embedding (EMBEDDING_DIM)."""
+        if actual != settings.EMBEDDING_DIM:
+            raise ValueError(
+                f"Размерность {source} ({actual}) не совпадает с EMBEDDING_DIM ({settings.EMBEDDING_DIM})"
+            )
+
+    def embed(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Feature hashing по словам и символьным триграммам с L2-нормировкой.
+    Не требует модели, устойчив к словоформам за счёт триграмм —
+    годится для разработки и небольших инсталляций.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[str]:
+        features: List[str] = []
+        for word in _WORD_RE.findall(text.lower()):
+            features.append(word)
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for feature in self._features(text):
+            digest = int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimension] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def embed(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
+        return [self._embed_one(t) for t in texts]
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Локальная модель sentence-transformers на CPU."""
+
+    def __init__(self, model_name: str, dimension: int, query_prefix: str = "", passage_prefix: str = ""):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.query_prefix = query_prefix
+        self.passage_prefix = passage_prefix
+        self._model = None
+
+    def load(self) -> None:
+        if self._model is not None:
+            return
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        self.check_dimension(model.get_sentence_embedding_dimension(), f"модели {self.model_name}")
+        self._model = model
+
+    def embed(self, texts: List[str], is_query: bool = False) -> List[List[float]]:
+        self.load()
+        prefix = self.query_prefix if is_query else self.passage_prefix
+        vectors = self._model.encode(
+            [prefix + t for t in texts],
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.tolist()
+
+
+def create_backend() -> EmbeddingBackend:
+    if settings.EMBEDDING_BACKEND == "hashing":
+        return HashingEmbeddingBackend(settings.EMBEDDING_DIM)
+    if settings.EMBEDDING_BACKEND == "sentence_transformers":
+        return SentenceTransformerBackend(
+            settings.EMBEDDING_MODEL,
+            settings.EMBEDDING_DIM,
+            query_prefix=settings.EMBEDDING_QUERY_PREFIX,
+            passage_prefix=settings.EMBEDDING_PASSAGE_PREFIX,
+        )
+    raise ValueError(f"Неизвестный EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND}")
+
+
+class EmbeddingService:
+    """
+    Асинхронный фасад над бэкендом: батчи в пуле потоков + LRU-кэш эмбеддингов запросов.
+    """
+
+    def __init__(self, backend: Optional[EmbeddingBackend] = None):
+        self._backend = backend
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self.query_cache = TTLCache(settings.EMBEDDING_CACHE_SIZE)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    @property
+    def dimension(self) -> int:
+        return self.backend.dimension
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.EMBEDDING_WORKERS, thread_name_prefix="embeddings"
+            )
+        return self._executor
+
+    async def _run(self, texts: List[str], is_query: bool) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.backend.embed, texts, is_query)
+
+    async def load(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._get_executor(), self.backend.load)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Эмбеддинги документов, батчами по EMBEDDING_BATCH_SIZE."""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(await self._run(texts[start:start + self.batch_size], is_query=False))
+        return vectors
+
+    async def embed_query(self, text: str) -> List[float]:
+        """
+        Эмбеддинг поискового запроса. Нормализованный текст — только ключ
+        кэша, в модель уходит исходный: регистр несёт смысл (аббревиатуры).
+        """
+        key = normalize_text(text)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        vector = (await self._run([text.strip()], is_query=True))[0]
+        self.query_cache.set(key, vector)
+        return vector
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Батчевый вариант embed_query: промахи кэша считаются одним вызовом модели."""
+        keys = [normalize_text(t) for t in texts]
+        vectors: List[Optional[List[float]]] = [self.query_cache.get(k) for k in keys]
+        # Первый встретившийся исходный текст для каждого ключа-промаха
+        missing: dict = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text.strip())
+        if missing:
+            computed = dict(zip(missing, await self._run(list(missing.values()), is_query=True)))
+            for key, vector in computed.items():
+                self.query_cache.set(key, vector)
+            vectors = [v if v is not None else computed[k] for k, v in zip(keys, vectors)]
+        return vectors
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "dimension": self.dimension,
+            "query_cache": self.query_cache.stats(),
+        }
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,171 @@
+# ============================================================
+# Извлечение текста из PDF / DOCX в пуле процессов
+# ============================================================
+# Разбор PDF и DOCX — чистый CPU и держит GIL: в потоке он тормозил бы
+# event loop, поэтому выполняется в ProcessPoolExecutor. Процессы
+# запускаются через spawn — fork процесса с потоками и открытыми
+# соединениями небезопасен. Результат кэшируется по sha256 содержимого:
+# повторная загрузка того же предписания не разбирается заново.
+# Зависший разбор не отменить внутри процесса: по таймауту пул целиком
+# пересоздаётся, а его процессы завершаются.
+# Пакеты pypdf и python-docx импортируются только в рабочем процессе.
+# ============================================================
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from ..config import settings
+from .cache import RedisCache, TTLCache
+from .coalescing import SingleFlight
+from .metrics import stage
+
+SUPPORTED_TYPES = ("pdf", "docx", "txt")
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedDocument(Exception):
+    """Формат не поддерживается или в документе нет текстового слоя."""
+
+
+# --- Функции рабочего процесса (должны импортироваться по имени) ---
+
+def _extract_pdf(path: str) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_docx(path: str) -> str:
+    import docx
+
+    document = docx.Document(path)
+    paragraphs = [p.text for p in document.paragraphs]
+    # Таблицы в предписаниях — частый формат перечня нарушений
+    for table in document.tables:
+        for row in table.rows:
+            paragraphs.append(" | ".join(cell.text.strip() for cell in row.cells))
+    return "\n".join(paragraphs)
+
+
+def _extract_txt(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8", errors="replace")
+
+
+_EXTRACTORS = {"pdf": _extract_pdf, "docx": _extract_docx, "txt": _extract_txt}
+
+
+def extract_text(path: str, file_type: str) -> str:
+    return _EXTRACTORS[file_type](path).strip()
+
+
+class TextExtractor:
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.cache = TTLCache(settings.SUPERVISION_TEXT_CACHE_SIZE, settings.SUPERVISION_TEXT_CACHE_TTL_SECONDS)
+        self.shared = (
+            RedisCache(settings.REDIS_URL, prefix="supervision:text:")
+            if settings.SUPERVISION_TEXT_CACHE_REDIS_ENABLED
+            else None
+        )
+        # Одновременные загрузки одного файла разбираются один раз
+        self.flight = SingleFlight("extract_text", settings.COALESCING_ENABLED)
+        self.extracted = 0
+        self.recycled = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.SUPERVISION_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def extract(self, path: str, file_type: str, sha256: str) -> str:
+        """Текст документа: из кэша по sha256 или разбором в пуле процессов."""
+        if file_type not in SUPPORTED_TYPES:
+            raise UnsupportedDocument(f"Формат {file_type or 'без расширения'} не поддерживается")
+        text = self.cache.get(sha256)
+        if text is None and self.shared is not None:
+            text = await self.shared.get(sha256)
+        if text is not None:
+            return text
+        return await self.flight.do(sha256, lambda: self._extract(path, file_type, sha256))
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Останавливает пул с зависшим разбором: wait_for отменяет только
+        ожидание, процесс остался бы занят навсегда. Следующий вызов
+        создаст новый пул. Публичного доступа к процессам у пула нет —
+        берём их через getattr.
+        """
+        if self._executor is not executor:
+            return  # пул уже пересоздан другим таймаутом
+        self._executor = None
+        self.recycled += 1
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+
+    async def _run(self, path: str, file_type: str) -> str:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, extract_text, path, file_type),
+                timeout=settings.SUPERVISION_EXTRACT_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Разбор %s дольше %s с — пул процессов пересоздаётся",
+                path,
+                settings.SUPERVISION_EXTRACT_TIMEOUT_SECONDS,
+            )
+            self._recycle(executor)
+            raise
+        except BrokenProcessPool:
+            # Процесс пула упал (или пул остановлен) — дальше этот пул непригоден
+            self._recycle(executor)
+            raise
+
+    async def _extract(self, path: str, file_type: str, sha256: str) -> str:
+        with stage("extract_text"):
+            try:
+                text = await self._run(path, file_type)
+            except BrokenProcessPool:
+                # Пул остановлен из-за чужого зависшего разбора или падения процесса — повторяем в новом
+                text = await self._run(path, file_type)
+        self.extracted += 1
+        if not text:
+            # Скан без текстового слоя: OCR не выполняется
+            raise UnsupportedDocument("В документе нет текстового слоя (скан без распознавания)")
+        self.cache.set(sha256, text)
+        if self.shared is not None:
+            await self.shared.set(sha256, text, settings.SUPERVISION_TEXT_CACHE_TTL_SECONDS)
+        return text
+
+    async def aclose(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.shared is not None:
+            await self.shared.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "extracted": self.extracted,
+            "recycled": self.recycled,
+            "cache": self.cache.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+text_extractor = TextExtractor()
@@ -0,0 +1,377 @@
+# ============================================================
+# Загрузка документов в базу знаний (RAG)
+# ============================================================
+# Текст читается потоком, режется на фрагменты по статьям/абзацам
+# с перекрытием, эмбеддинги считаются батчами, а запись идёт
+# бинарным COPY в document_chunks (без поштучных INSERT через ORM).
+# Загрузка возобновляема: уже записанные chunk_index пропускаются.
+# Документ с тем же именем, но другим содержимым (sha256) или другой
+# областью (is_public) загружается заново — старые фрагменты удаляются.
+# При VECTOR_STORE=numpy фрагменты дописываются в файлы хранилища.
+# ============================================================
+
+import asyncio
+import codecs
+import hashlib
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import raw_dsn
+from ..models.models import Document, DocumentChunk
+from .embeddings import embedding_service
+from .rag import rag_service
+from .vector_store import StoredChunk
+
+_ARTICLE_RE = re.compile(r"^\s*Статья\s+(\d+(?:\.\d+)*)", re.IGNORECASE)
+_POINT_RE = re.compile(r"^\s*(\d+(?:\.\d+)*)\.\s+\S")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+_CHUNK_COLUMNS = ["id", "document_id", "organization_id", "chunk_index", "content", "embedding", "meta_info"]
+
+
+@dataclass
+class Chunk:
+    index: int
+    content: str
+    meta_info: str
+
+
+@dataclass
+class IngestionResult:
+    document_id: uuid.UUID
+    chunks_written: int
+    chunks_skipped: int
+    seconds: float
+
+
+class LegalChunker:
+    """
+    Потоковый нарезчик нормативного текста.
+    Статья («Статья 155.») всегда начинает новый фрагмент; внутри статьи
+    абзацы копятся до max_chars, при переполнении следующий фрагмент
+    начинается с хвоста предыдущего длиной overlap_chars.
+    Для постановлений без статей ссылка строится по номеру пункта.
+    """
+
+    def __init__(self, source_label: str = "", max_chars: Optional[int] = None, overlap_chars: Optional[int] = None):
+        self.source_label = source_label
+        self.max_chars = max_chars or settings.INGEST_CHUNK_CHARS
+        self.overlap_chars = settings.INGEST_CHUNK_OVERLAP if overlap_chars is None else overlap_chars
+        self._tail = ""
+        self._buffer: List[str] = []
+        self._buffer_len = 0
+        self._overlap_len = 0
+        self._article: Optional[str] = None
+        self._point: Optional[str] = None
+        self._chunk_meta = ""
+        self._next_index = 0
+
+    def feed(self, block: str) -> List[Chunk]:
+        """Принимает очередной блок текста, возвращает готовые фрагменты."""
+        chunks: List[Chunk] = []
+        lines = (self._tail + block).split("\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self._paragraph(line.strip(), chunks)
+        return chunks
+
+    def finish(self) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        self._paragraph(self._tail.strip(), chunks)
+        self._tail = ""
+        self._flush(chunks, keep_overlap=False)
+        return chunks
+
+    def _citation(self) -> str:
+        suffix = f" {self.source_label}" if self.source_label else ""
+        if self._article:
+            return f"ст. {self._article}{suffix}"
+        if self._point:
+            return f"п. {self._point}{suffix}"
+        return self.source_label
+
+    def _paragraph(self, text: str, chunks: List[Chunk]) -> None:
+        if not text:
+            return
+        article = _ARTICLE_RE.match(text)
+        if article:
+            self._flush(chunks, keep_overlap=False)
+            self._article = article.group(1)
+            self._point = None
+        elif self._article is None:
+            point = _POINT_RE.match(text)
+            if point:
+                self._point = point.group(1)
+
+        for piece in self._split_long(text):
+            has_new_text = self._buffer_len > self._overlap_len
+            if has_new_text and self._buffer_len + len(piece) + 1 > self.max_chars:
+                self._flush(chunks, keep_overlap=True)
+            if not self._buffer:
+                self._chunk_meta = self._citation()
+            self._buffer.append(piece)
+            self._buffer_len += len(piece) + 1
+
+    def _split_long(self, text: str) -> List[str]:
+        # Кусок вместе с перекрытием должен помещаться во фрагмент
+        limit = max(self.max_chars - self.overlap_chars, self.max_chars // 2)
+        if len(text) <= limit:
+            return [text]
+        pieces: List[str] = []
+        current = ""
+        for sentence in _SENTENCE_END_RE.split(text):
+            while len(sentence) > limit:
+                cut = sentence.rfind(" ", 0, limit)
+                cut = cut if cut > 0 else limit
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if current and len(current) + len(sentence) + 1 > limit:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _flush(self, chunks: List[Chunk], keep_overlap: bool) -> None:
+        if not self._buffer:
+            return
+        content = "\n".join(self._buffer)
+        chunks.append(Chunk(index=self._next_index, content=content, meta_info=self._chunk_meta))
+        self._next_index += 1
+        self._buffer = []
+        self._buffer_len = 0
+        self._overlap_len = 0
+        if keep_overlap and self.overlap_chars:
+            overlap = content[-self.overlap_chars:]
+            space = overlap.find(" ")
+            if 0 <= space < len(overlap) - 1:
+                overlap = overlap[space + 1:]
+            self._buffer = [overlap]
+            self._buffer_len = self._overlap_len = len(overlap) + 1
+
+
+# --- Источники текста ---
+
+async def iter_file(path: str, block_size: Optional[int] = None) -> AsyncIterator[str]:
+    """Читает файл блоками в пуле потоков, декодируя UTF-8 инкрементально."""
+    loop = asyncio.get_running_loop()
+    size = block_size or settings.INGEST_READ_BLOCK_BYTES
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            data = await loop.run_in_executor(None, f.read, size)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+async def iter_upload(upload, block_size: Optional[int] = None) -> AsyncIterator[str]:
+    """То же для fastapi.UploadFile."""
+    size = block_size or settings.INGEST_READ_BLOCK_BYTES
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = await upload.read(size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+def _sha256_file(f, block_size: int) -> str:
+    digest = hashlib.sha256()
+    f.seek(0)
+    for data in iter(lambda: f.read(block_size), b""):
+        digest.update(data)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+async def file_sha256(path: str) -> str:
+    """sha256 содержимого файла (в пуле потоков)."""
+    def run() -> str:
+        with open(path, "rb") as f:
+            return _sha256_file(f, settings.INGEST_READ_BLOCK_BYTES)
+
+    return await asyncio.to_thread(run)
+
+
+async def upload_sha256(upload) -> str:
+    """sha256 fastapi.UploadFile; файл перематывается в начало для iter_upload."""
+    return await asyncio.to_thread(_sha256_file, upload.file, settings.INGEST_READ_BLOCK_BYTES)
+
+
+class IngestionService:
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    async def get_or_create_document(
+        self,
+        db: AsyncSession,
+        organization_id: uuid.UUID,
+        filename: str,
+        file_type: Optional[str] = None,
+        file_size: Optional[float] = None,
+        storage_path: Optional[str] = None,
+        is_public: bool = False,
+        content_hash: Optional[str] = None,
+    ) -> Document:
+        """
+        Документ ищется по (organization_id, filename): повторный запуск
+        загрузки того же файла продолжает её, а не создаёт дубликат.
+        Если изменилось содержимое (content_hash) или is_public, строка
+        обновляется, а фрагменты удаляются — ingest загрузит файл заново.
+        is_public — документ общего нормативного корпуса (виден всем УК).
+        """
+        result = await db.execute(
+            select(Document).where(
+                Document.organization_id == organization_id,
+                Document.filename == filename,
+            )
+        )
+        document = result.scalars().first()
+        if document is None:
+            document = Document(
+                organization_id=organization_id,
+                filename=filename,
+                file_type=file_type or os.path.splitext(filename)[1].lstrip(".").lower() or None,
+                file_size=file_size,
+                storage_path=storage_path,
+                is_public=is_public,
+                content_hash=content_hash,
+            )
+            db.add(document)
+            await db.commit()
+        elif document.is_public != is_public or (content_hash and document.content_hash != content_hash):
+            await self._reset_chunks(db, document.id)
+            document.is_public = is_public
+            document.content_hash = content_hash or document.content_hash
+            document.file_size = file_size if file_size is not None else document.file_size
+            document.storage_path = storage_path or document.storage_path
+            await db.commit()
+        return document
+
+    async def _reset_chunks(self, db: AsyncSession, document_id: uuid.UUID) -> None:
+        """
+        Удаляет фрагменты документа перед повторной загрузкой: арендатор
+        фрагмента (NULL для общего корпуса) и текст берутся из документа.
+        """
+        store = rag_service.store
+        if store.uses_document_chunks:
+            await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+        else:
+            await store.delete_document(document_id)
+
+    async def ingest(
+        self,
+        document_id: uuid.UUID,
+        blocks: AsyncIterator[str],
+        source_label: str = "",
+    ) -> IngestionResult:
+        """
+        Нарезает поток текста, эмбеддит батчами и пишет фрагменты COPY.
+        Каждый батч — отдельная транзакция, поэтому после сбоя повторный
+        вызов продолжает с первого незаписанного фрагмента.
+        Эмбеддинг следующего батча идёт параллельно с записью предыдущего.
+        """
+        started = time.perf_counter()
+        pending_write: Optional[asyncio.Task] = None
+        store = rag_service.store
+        conn = await asyncpg.connect(raw_dsn())
+        try:
+            await register_vector(conn)
+            # Фрагменты наследуют арендатора документа; общий корпус — NULL
+            scope = await conn.fetchrow(
+                "SELECT organization_id, is_public, filename FROM documents WHERE id = $1", document_id
+            )
+            if scope is None:
+                raise ValueError(f"Документ {document_id} не найден")
+            chunk_organization_id = None if scope["is_public"] else scope["organization_id"]
+            if store.uses_document_chunks:
+                last_index = await conn.fetchval(
+                    "SELECT coalesce(max(chunk_index), -1) FROM document_chunks WHERE document_id = $1",
+                    document_id,
+                )
+            else:
+                last_index = await store.last_chunk_index(document_id)
+
+            chunker = LegalChunker(source_label=source_label)
+            written = skipped = 0
+            batch: List[Chunk] = []
+
+            async def flush(chunks: List[Chunk]) -> None:
+                nonlocal pending_write, written
+                embeddings = await embedding_service.embed_many([c.content for c in chunks])
+                if pending_write is not None:
+                    await pending_write
+                if store.uses_document_chunks:
+                    records = [
+                        (uuid.uuid4(), document_id, chunk_organization_id, c.index, c.content, e, c.meta_info)
+                        for c, e in zip(chunks, embeddings)
+                    ]
+                    write = conn.copy_records_to_table("document_chunks", records=records, columns=_CHUNK_COLUMNS)
+                else:
+                    write = store.add([
+                        StoredChunk(
+                            id=uuid.uuid4(),
+                            document_id=document_id,
+                            organization_id=chunk_organization_id,
+                            chunk_index=c.index,
+                            content=c.content,
+                            meta_info=c.meta_info,
+                            filename=scope["filename"],
+                            embedding=e,
+                        )
+                        for c, e in zip(chunks, embeddings)
+                    ])
+                pending_write = asyncio.create_task(write)
+                written += len(chunks)
+
+            async for block in blocks:
+                for chunk in chunker.feed(block):
+                    if chunk.index <= last_index:
+                        skipped += 1
+                        continue
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        await flush(batch)
+                        batch = []
+
+            for chunk in chunker.finish():
+                if chunk.index <= last_index:
+                    skipped += 1
+                    continue
+                batch.append(chunk)
+            if batch:
+                await flush(batch)
+            if pending_write is not None:
+                await pending_write
+        finally:
+            if pending_write is not None and not pending_write.done():
+                pending_write.cancel()
+            await conn.close()
+
+        return IngestionResult(
+            document_id=document_id,
+            chunks_written=written,
+            chunks_skipped=skipped,
+            seconds=time.perf_counter() - started,
+        )
+
+
+ingestion_service = IngestionService()
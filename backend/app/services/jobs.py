@@ -0,0 +1,405 @@
+# ============================================================
+# Фоновая генерация ответов — задания в таблице requests
+# ============================================================
+# Источник истины — строка Request: приём задания только сохраняет её
+# (status=queued) и кладёт id в очередь. Воркер атомарно забирает
+# задание (UPDATE ... WHERE status='queued'), поэтому дубликаты id в
+# очереди безопасны. Задания, зависшие в processing после падения
+# процесса, возвращаются в очередь при старте и периодически.
+# Очередь — asyncio.Queue процесса или общий список Redis (JOBS_BACKEND).
+# ============================================================
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session
+from ..models.models import Request
+from .dashboard import REQUESTS_CREATED, RESPONSES_GENERATED, dashboard_service
+from .llm import DEEPSEEK_ERROR_PREFIX, llm_service
+from .metrics import JOBS_QUEUE_DEPTH, JOBS_TOTAL
+from .pii import pii_engine
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("completed", "failed")
+_RECONNECT_SECONDS = 5
+_MAX_BACKOFF_SECONDS = 30
+
+
+class JobQueueFull(Exception):
+    """Локальная очередь переполнена — клиенту стоит повторить позже."""
+
+
+class LocalJobQueue:
+    """Очередь в памяти процесса; содержимое восстанавливается из БД."""
+
+    def __init__(self, maxsize: int):
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize)
+        self._pending: Set[str] = set()
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def free_slots(self) -> int:
+        return self._queue.maxsize - self._queue.qsize()
+
+    def contains(self, job_id: str) -> bool:
+        return job_id in self._pending
+
+    async def put(self, job_id: str) -> None:
+        if job_id in self._pending:
+            return
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+        self._pending.add(job_id)
+        JOBS_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def get(self) -> str:
+        job_id = await self._queue.get()
+        self._pending.discard(job_id)
+        JOBS_QUEUE_DEPTH.set(self._queue.qsize())
+        return job_id
+
+    async def aclose(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "local", "depth": self._queue.qsize(), "max": self._queue.maxsize}
+
+
+class RedisJobQueue:
+    """Общая очередь для всех воркеров uvicorn: LPUSH / BRPOP по REDIS_URL."""
+
+    key = "jobs:queue"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+
+    @property
+    def client(self):
+        return self._client
+
+    def full(self) -> bool:
+        return False
+
+    def free_slots(self) -> int:
+        return settings.JOBS_QUEUE_MAX
+
+    def contains(self, job_id: str) -> bool:
+        return False
+
+    async def put(self, job_id: str) -> None:
+        await self._client.lpush(self.key, job_id)
+
+    async def get(self) -> str:
+        while True:
+            item = await self._client.brpop([self.key], timeout=5)
+            if item is not None:
+                return item[1]
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+class JobService:
+    """Приём заданий, пул воркеров и ожидание результата."""
+
+    done_channel = "jobs:done"
+
+    def __init__(self):
+        self.queue = None
+        self._tasks: List[asyncio.Task] = []
+        # Отложенные повторы: ссылки держим, иначе задачу может собрать GC
+        self._requeues: Set[asyncio.Task] = set()
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        if settings.JOBS_BACKEND == "redis":
+            self.queue = RedisJobQueue(settings.REDIS_URL)
+            self._tasks.append(asyncio.create_task(self._listen_done()))
+        else:
+            self.queue = LocalJobQueue(settings.JOBS_QUEUE_MAX)
+        for _ in range(settings.JOBS_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._recovery_loop()))
+
+    async def stop(self) -> None:
+        tasks = [*self._tasks, *self._requeues]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._requeues.clear()
+        if self.queue is not None:
+            await self.queue.aclose()
+            self.queue = None
+
+    # --- Intake ---
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        organization_id: uuid.UUID,
+        user_id: uuid.UUID,
+        text: str,
+    ) -> Request:
+        """
+        Сохраняет обращение как задание и ставит его в очередь.
+        Если очередь процесса заполнена — JobQueueFull до записи в БД.
+        """
+        if self.queue is None:
+            raise RuntimeError("JobService не запущен")
+        if self.queue.full():
+            raise JobQueueFull()
+
+        request = Request(
+            organization_id=organization_id,
+            user_id=user_id,
+            original_text=text,
+            masked_text=pii_engine.mask(text).masked_text,
+            status="queued",
+        )
+        db.add(request)
+        await dashboard_service.record(db, organization_id, REQUESTS_CREATED)
+        # Коммит до постановки в очередь — иначе воркер может не найти строку
+        await db.commit()
+        try:
+            await self.queue.put(str(request.id))
+        except JobQueueFull:
+            # Строка уже сохранена: её подберёт периодическое восстановление
+            pass
+        JOBS_TOTAL.labels(outcome="submitted").inc()
+        return request
+
+    async def get(
+        self, job_id: uuid.UUID, wait: float = 0, organization_id: Optional[uuid.UUID] = None
+    ) -> Optional[Request]:
+        """
+        Текущее состояние задания. wait > 0 — long polling: ответ придёт
+        сразу после завершения задания или по истечении wait секунд.
+        Соединение с БД на время ожидания не удерживается.
+        organization_id — задание другой организации не отдаётся (None).
+        """
+        key = str(job_id)
+        event = asyncio.Event()
+        # Подписка до чтения строки — иначе завершение между ними потеряется
+        self._waiters.setdefault(key, set()).add(event)
+        try:
+            request = await self._load(job_id)
+            if request is not None and organization_id is not None and request.organization_id != organization_id:
+                return None
+            if request is None or request.status in FINAL_STATUSES or wait <= 0:
+                return request
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                return request
+            return await self._load(job_id)
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[key]
+
+    async def _load(self, job_id: uuid.UUID) -> Optional[Request]:
+        async with async_session() as db:
+            return await db.get(Request, job_id)
+
+    # --- Workers ---
+
+    async def _worker(self) -> None:
+        failures = 0
+        while True:
+            try:
+                job_id = await self.queue.get()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Очередь недоступна (Redis): воркер не должен умирать — ждём и пробуем снова
+                failures += 1
+                logger.exception("Очередь заданий недоступна")
+                await asyncio.sleep(min(2 ** failures, _MAX_BACKOFF_SECONDS))
+                continue
+            failures = 0
+            try:
+                await self._process(uuid.UUID(job_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обработки задания %s", job_id)
+
+    async def _process(self, job_id: uuid.UUID) -> None:
+        now = datetime.now(timezone.utc)
+        async with async_session() as db:
+            # Атомарный захват: повторный id из очереди просто не найдёт строку
+            claimed = (await db.execute(
+                update(Request)
+                .where(Request.id == job_id, Request.status == "queued")
+                .values(status="processing", started_at=now, attempts=Request.attempts + 1)
+                .returning(Request.organization_id, Request.original_text, Request.attempts)
+            )).first()
+            await db.commit()
+        if claimed is None:
+            return
+
+        content = await llm_service.generate_response(claimed.original_text)
+        failed = content.startswith(DEEPSEEK_ERROR_PREFIX)
+        retry = failed and claimed.attempts < settings.JOBS_MAX_ATTEMPTS
+
+        if retry:
+            values = {"status": "queued", "started_at": None}
+        else:
+            values = {
+                "status": "failed" if failed else "completed",
+                "response_text": content,
+                "completed_at": datetime.now(timezone.utc),
+            }
+        async with async_session() as db:
+            result = await db.execute(
+                update(Request)
+                .where(Request.id == job_id, Request.status == "processing")
+                .values(**values)
+            )
+            if result.rowcount and values["status"] == "completed":
+                await dashboard_service.record(db, claimed.organization_id, RESPONSES_GENERATED)
+            await db.commit()
+
+        if retry:
+            JOBS_TOTAL.labels(outcome="retried").inc()
+            task = asyncio.create_task(self._requeue_later(str(job_id), claimed.attempts))
+            self._requeues.add(task)
+            task.add_done_callback(self._requeues.discard)
+        else:
+            JOBS_TOTAL.labels(outcome=values["status"]).inc()
+            await self._notify_done(str(job_id))
+
+    async def _requeue_later(self, job_id: str, attempt: int) -> None:
+        await asyncio.sleep(min(2 ** attempt, _MAX_BACKOFF_SECONDS))
+        try:
+            await self.queue.put(job_id)
+        except JobQueueFull:
+            pass
+
+    # --- Notifications ---
+
+    async def _notify_done(self, job_id: str) -> None:
+        if isinstance(self.queue, RedisJobQueue):
+            # Ожидающий может быть подключён к другому воркеру uvicorn
+            await self.queue.client.publish(self.done_channel, job_id)
+        else:
+            self._wake(job_id)
+
+    def _wake(self, job_id: str) -> None:
+        for event in self._waiters.pop(job_id, ()):
+            event.set()
+
+    async def _listen_done(self) -> None:
+        while True:
+            pubsub = self.queue.client.pubsub()
+            try:
+                await pubsub.subscribe(self.done_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._wake(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Пропущенные уведомления не теряют результат: long polling дождётся таймаута
+                logger.warning("Задания: подписка на %s потеряна: %s", self.done_channel, e)
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(_RECONNECT_SECONDS)
+
+    # --- Crash recovery ---
+
+    async def recover(self) -> int:
+        """
+        Возвращает в очередь задания, зависшие в processing дольше
+        JOBS_LEASE_SECONDS (процесс упал), и задания queued, которых нет
+        в очереди (рестарт, переполнение, потеря Redis). Зависшее задание,
+        исчерпавшее JOBS_MAX_ATTEMPTS, завершается с ошибкой — иначе
+        файл или текст, роняющий воркер, повторялся бы бесконечно.
+        """
+        now = datetime.now(timezone.utc)
+        lease = now - timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+        async with async_session() as db:
+            stale = (Request.status == "processing", Request.started_at < lease)
+            failed = await db.execute(
+                update(Request)
+                .where(*stale, Request.attempts >= settings.JOBS_MAX_ATTEMPTS)
+                .values(
+                    status="failed",
+                    response_text=f"Ошибка: обработка задания прерывалась {settings.JOBS_MAX_ATTEMPTS} раз",
+                    completed_at=now,
+                )
+                .returning(Request.id)
+            )
+            failed_ids = [str(job_id) for job_id in failed.scalars()]
+            await db.execute(
+                update(Request)
+                .where(*stale, Request.attempts < settings.JOBS_MAX_ATTEMPTS)
+                .values(status="queued", started_at=None)
+            )
+            stmt = select(Request.id).where(Request.status == "queued")
+            if isinstance(self.queue, RedisJobQueue):
+                # Свежие задания и так лежат в общей очереди
+                stmt = stmt.where(Request.created_at < lease)
+            rows = await db.execute(stmt.order_by(Request.created_at).limit(max(self.queue.free_slots(), 0)))
+            job_ids = [str(job_id) for job_id in rows.scalars()]
+            await db.commit()
+
+        if failed_ids:
+            JOBS_TOTAL.labels(outcome="failed").inc(len(failed_ids))
+            for job_id in failed_ids:
+                await self._notify_done(job_id)
+
+        requeued = 0
+        for job_id in job_ids:
+            if self.queue.contains(job_id):
+                continue
+            try:
+                await self.queue.put(job_id)
+            except JobQueueFull:
+                break
+            requeued += 1
+        if requeued:
+            JOBS_TOTAL.labels(outcome="recovered").inc(requeued)
+        return requeued
+
+    async def _recovery_loop(self) -> None:
+        while True:
+            try:
+                await self.recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка восстановления заданий")
+            await asyncio.sleep(settings.JOBS_RECOVERY_INTERVAL_SECONDS)
+
+    def stats(self) -> dict:
+        stats = self.queue.stats() if self.queue is not None else {"backend": None}
+        stats["workers"] = settings.JOBS_WORKERS
+        stats["waiters"] = len(self._waiters)
+        return stats
+
+
+job_service = JobService()
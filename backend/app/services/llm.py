@@ -1,7 +1,41 @@
-import httpx
+import asyncio
+import json
 import re
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional
 from ..config import settings
+from ..schemas.schemas import LLMSettingsSchema
+from .cache import llm_response_cache
+from .coalescing import llm_flight, llm_stream_fanout
+from .deepseek_client import deepseek_client
+from .metrics import record_deepseek_usage, record_stage, stage
+from .pii import MaskResult, pii_engine
+from .rate_limit import OVERLOAD_STATUSES, parse_retry_after
+
+# Ответы с этим префиксом — ошибки, их нельзя кэшировать
+DEEPSEEK_ERROR_PREFIX = "[DeepSeek] Ошибка"
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _generation_params(llm_settings: Optional[LLMSettingsSchema]) -> dict:
+    """Параметры генерации для DeepSeek (по умолчанию — значения схемы)."""
+    llm_settings = llm_settings or LLMSettingsSchema()
+    return {"temperature": llm_settings.temperature, "max_tokens": llm_settings.max_tokens}
+
+
+def _flight_key(masked_prompt: str, ds_key: Optional[str], params: dict) -> tuple:
+    """
+    Ключ объединения одновременных запросов: маскированный промпт (ПДн
+    заменены метками, поэтому вопросы разных жильцов совпадают), модель,
+    параметры генерации и API-ключ — запросы с разными ключами не объединяются.
+    """
+    return (
+        settings.DEEPSEEK_MODEL,
+        _SPACE_RE.sub(" ", masked_prompt).strip(),
+        tuple(sorted(params.items())),
+        ds_key,
+    )
 
 class LLMService:
     def __init__(
@@ -14,37 +48,113 @@ class LLMService:
         self, 
         prompt: str, 
         provider: str = "deepseek",
-        deepseek_key: Optional[str] = None
+        deepseek_key: Optional[str] = None,
+        use_cache: bool = True,
+        llm_settings: Optional[LLMSettingsSchema] = None
     ) -> str:
         """
         Универсальный метод генерации ответа. Использует DeepSeek как основной движок.
+        Повторные запросы с тем же маскированным промптом отдаются из кэша.
+        llm_settings — temperature и max_tokens для DeepSeek.
         """
         # 1. Маскируем данные перед отправкой
-        masked_prompt = self._mask_pii(prompt)
-        
+        with stage("pii_mask"):
+            masked = self.mask_pii(prompt)
+        return await self.generate_from_masked(
+            masked, provider=provider, deepseek_key=deepseek_key, use_cache=use_cache, llm_settings=llm_settings
+        )
+
+    async def generate_from_masked(
+        self,
+        masked: MaskResult,
+        provider: str = "deepseek",
+        deepseek_key: Optional[str] = None,
+        use_cache: bool = True,
+        llm_settings: Optional[LLMSettingsSchema] = None
+    ) -> str:
+        """
+        Генерация по уже маскированному промпту — когда один проход
+        маскирования разделяют несколько запросов к модели (варианты ответа).
+        """
         # 2. Выбираем ключ
         ds_key = deepseek_key or self.deepseek_key
 
         if provider == "deepseek":
-            return await self._call_deepseek(masked_prompt, ds_key)
+            params = _generation_params(llm_settings)
+            content = await self._generate_masked(masked.masked_text, ds_key, use_cache, params)
+            # 3. Демаскирование: возвращаем пользователю исходные ФИО/данные
+            with stage("pii_unmask"):
+                return pii_engine.unmask(content, masked.mappings)
         else:
             return f"Ошибка: неизвестный провайдер {provider}. В данной версии поддерживается только DeepSeek."
 
-    def _mask_pii(self, text: str) -> str:
+    async def _generate_masked(
+        self, masked_prompt: str, ds_key: Optional[str], use_cache: bool, params: dict
+    ) -> str:
+        flight_key = _flight_key(masked_prompt, ds_key, params)
+        if not (use_cache and llm_response_cache.enabled):
+            llm_response_cache.bypassed += 1
+            # Без кэша, но одновременный одинаковый запрос в полёте — тоже свежий ответ
+            return await llm_flight.do(flight_key, lambda: self._call_deepseek(masked_prompt, ds_key, params))
+
+        # В кэше хранится маскированный ответ — ПДн туда не попадают
+        cache_key = llm_response_cache.make_key("deepseek", settings.DEEPSEEK_MODEL, masked_prompt, params)
+        with stage("llm_cache"):
+            cached = await llm_response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        async def call() -> str:
+            content = await self._call_deepseek(masked_prompt, ds_key, params)
+            if not content.startswith(DEEPSEEK_ERROR_PREFIX):
+                await llm_response_cache.set(cache_key, content)
+            return content
+
+        # Одинаковые запросы, пришедшие до заполнения кэша, ждут ответ ведущего
+        return await llm_flight.do(flight_key, call)
+
+    async def stream_response(
+        self,
+        prompt: str,
+        provider: str = "deepseek",
+        deepseek_key: Optional[str] = None,
+        llm_settings: Optional[LLMSettingsSchema] = None
+    ) -> AsyncIterator[str]:
         """
-        Простейшее маскирование (заглушка для демонстрации).
+        Потоковая генерация: отдаёт фрагменты ответа по мере поступления от модели.
         """
-        # Маскируем телефоны
-        text = re.sub(r'(\+7|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}', '[PHONE_HIDDEN]', text)
-        # Маскируем email
-        text = re.sub(r'[\w\.-]+@[\w\.-]+\.\w+', '[EMAIL_HIDDEN]', text)
-        return text
+        with stage("pii_mask"):
+            masked = self.mask_pii(prompt)
+        ds_key = deepseek_key or self.deepseek_key
 
-    async def _call_deepseek(self, prompt: str, key: Optional[str]) -> str:
-        if not key:
-            return "[DeepSeek] Ошибка: API ключ не задан."
-        
-        url = f"{settings.DEEPSEEK_API_BASE}/chat/completions"
+        if provider == "deepseek":
+            unmasker = pii_engine.stream_unmasker(masked.mappings)
+            params = _generation_params(llm_settings)
+            # Один поток DeepSeek на одинаковые одновременные запросы;
+            # демаскирование — у каждого подписчика со своими ПДн
+            tokens = llm_stream_fanout.subscribe(
+                _flight_key(masked.masked_text, ds_key, params),
+                lambda: self._stream_deepseek(masked.masked_text, ds_key, params),
+            )
+            async for token in tokens:
+                text = unmasker.feed(token)
+                if text:
+                    yield text
+            tail = unmasker.finish()
+            if tail:
+                yield tail
+        else:
+            yield f"Ошибка: неизвестный провайдер {provider}. В данной версии поддерживается только DeepSeek."
+
+    def mask_pii(self, text: str) -> MaskResult:
+        """
+        Маскирование ПДн перед отправкой во внешнюю LLM (см. services/pii.py).
+        """
+        if not settings.PII_MASKING_ENABLED:
+            return MaskResult(masked_text=text)
+        return pii_engine.mask(text)
+
+    def _build_request(self, prompt: str, key: str, stream: bool, params: dict) -> tuple[dict, dict]:
         headers = {
             "Authorization": f"Bearer {key}",
             "Content-Type": "application/json"
@@ -59,21 +169,97 @@ class LLMService:
                 },
                 {"role": "user", "content": prompt}
             ],
-            "stream": False
+            "stream": stream,
+            **params,
         }
+        if stream:
+            # Последний чанк потока содержит usage — для учёта токенов
+            payload["stream_options"] = {"include_usage": True}
+        return headers, payload
+
+    async def _call_deepseek(self, prompt: str, key: Optional[str], params: dict) -> str:
+        if not key:
+            return "[DeepSeek] Ошибка: API ключ не задан."
+
+        headers, payload = self._build_request(prompt, key, stream=False, params=params)
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, headers=headers, json=payload)
-                if response.status_code != 200:
-                    return f"[DeepSeek] Ошибка API ({response.status_code}): {response.text}"
-                
-                result = response.json()
-                content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                if not content:
-                    return "[DeepSeek] Ошибка: Пустой ответ от модели."
-                return content
+            for attempt in range(settings.DEEPSEEK_MAX_RETRIES + 1):
+                with stage("deepseek"):
+                    response = await deepseek_client.post("/chat/completions", headers=headers, json=payload)
+                delay = self._retry_delay(response, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+            if response.status_code != 200:
+                return f"[DeepSeek] Ошибка API ({response.status_code}): {response.text}"
+            
+            result = response.json()
+            record_deepseek_usage(result.get("usage"))
+            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+            if not content:
+                return "[DeepSeek] Ошибка: Пустой ответ от модели."
+            return content
         except Exception as e:
             return f"[DeepSeek] Ошибка соединения: {str(e)}"
 
+    def _retry_delay(self, response, attempt: int) -> Optional[float]:
+        """
+        Пауза перед повтором на 429/5xx или None, если повторять не нужно.
+        Retry-After выдерживает общий AIMD-лимит клиента (новые запросы
+        ждут его сами), без заголовка — экспоненциальная пауза.
+        """
+        if attempt >= settings.DEEPSEEK_MAX_RETRIES or response.status_code not in OVERLOAD_STATUSES:
+            return None
+        retry_after = parse_retry_after(response.headers.get("retry-after"))
+        if retry_after is None:
+            return 0.5 * 2 ** attempt
+        if retry_after > settings.DEEPSEEK_RETRY_AFTER_MAX_SECONDS:
+            return None
+        return 0.0
+
+    async def _stream_deepseek(self, prompt: str, key: Optional[str], params: dict) -> AsyncIterator[str]:
+        if not key:
+            yield "[DeepSeek] Ошибка: API ключ не задан."
+            return
+
+        headers, payload = self._build_request(prompt, key, stream=True, params=params)
+
+        started = time.perf_counter()
+        first_token = True
+        try:
+            for attempt in range(settings.DEEPSEEK_MAX_RETRIES + 1):
+                async with deepseek_client.stream("POST", "/chat/completions", headers=headers, json=payload) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        # Повтор возможен, пока клиенту ничего не отправлено
+                        delay = self._retry_delay(response, attempt)
+                        if delay is None:
+                            yield f"[DeepSeek] Ошибка API ({response.status_code}): {body}"
+                            return
+                    else:
+                        # Формат DeepSeek/OpenAI: строки "data: {...}", завершение "data: [DONE]"
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            record_deepseek_usage(chunk.get("usage"))
+                            choices = chunk.get("choices") or [{}]
+                            token = choices[0].get("delta", {}).get("content")
+                            if token:
+                                if first_token:
+                                    record_stage("deepseek_first_token", time.perf_counter() - started)
+                                    first_token = False
+                                yield token
+                        return
+                # Слот лимита уже освобождён — пауза его не занимает
+                await asyncio.sleep(delay)
+        except Exception as e:
+            yield f"[DeepSeek] Ошибка соединения: {str(e)}"
+        finally:
+            record_stage("deepseek_stream", time.perf_counter() - started)
+
 llm_service = LLMService()
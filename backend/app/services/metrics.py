@@ -0,0 +1,103 @@
+# ============================================================
+# Метрики Prometheus и замеры этапов конвейера
+# ============================================================
+# stage("имя") замеряет этап (маскирование, эмбеддинг, pgvector,
+# DeepSeek ...): длительность уходит в гистограмму и в заголовок
+# Server-Timing текущего запроса (см. middleware/timing.py).
+# ============================================================
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "zhkh_stage_duration_seconds",
+    "Длительность этапов конвейера обработки запроса",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "zhkh_http_request_duration_seconds",
+    "Длительность HTTP-запросов (до отправки заголовков ответа)",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "zhkh_db_pool_checkout_seconds",
+    "Ожидание соединения из пула SQLAlchemy",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "zhkh_db_pool_connections",
+    "Соединения пула SQLAlchemy",
+    ["state"],
+)
+DEEPSEEK_RESPONSES = Counter(
+    "zhkh_deepseek_responses_total",
+    "Ответы DeepSeek API по коду статуса",
+    ["status"],
+)
+DEEPSEEK_TOKENS = Counter(
+    "zhkh_deepseek_tokens_total",
+    "Токены DeepSeek по данным поля usage",
+    ["kind"],
+)
+JOBS_TOTAL = Counter(
+    "zhkh_jobs_total",
+    "Фоновые задания генерации по результату",
+    ["outcome"],
+)
+JOBS_QUEUE_DEPTH = Gauge(
+    "zhkh_jobs_queue_depth",
+    "Заданий в локальной очереди процесса",
+)
+COALESCED_TOTAL = Counter(
+    "zhkh_coalesced_requests_total",
+    "Одинаковые одновременные запросы: ведущие и присоединившиеся к ним",
+    ["kind", "role"],
+)
+
+# Замеры текущего запроса для Server-Timing: (имя, миллисекунды)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds * 1000))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_deepseek_usage(usage: Optional[dict]) -> None:
+    if not usage:
+        return
+    DEEPSEEK_TOKENS.labels(kind="prompt").inc(usage.get("prompt_tokens", 0))
+    DEEPSEEK_TOKENS.labels(kind="completion").inc(usage.get("completion_tokens", 0))
+
+
+def update_pool_gauges(pool) -> None:
+    """Снимок состояния QueuePool перед отдачей /metrics."""
+    DB_POOL_CONNECTIONS.labels(state="checked_out").set(pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(state="checked_in").set(pool.checkedin())
+    DB_POOL_CONNECTIONS.labels(state="overflow").set(max(pool.overflow(), 0))
+    DB_POOL_CONNECTIONS.labels(state="size").set(pool.size())
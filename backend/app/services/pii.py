@@ -0,0 +1,150 @@
+# ============================================================
+# Маскирование персональных данных (ФЗ-152)
+# ============================================================
+# Все детекторы собраны в одно регулярное выражение и компилируются
+# один раз при импорте; текст сканируется за один проход.
+# Каждое найденное значение заменяется стабильным токеном вида
+# [PHONE_1] (одно и то же значение — один и тот же токен), а
+# соответствие токен → оригинал возвращается для демаскирования
+# ответа LLM.
+# ============================================================
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Порядок важен: при совпадении в одной позиции побеждает первый детектор.
+# Группа <KIND_v>, если есть, задаёт маскируемую часть (без ключевого слова).
+# Второй элемент — lookahead по первому символу: позволяет движку сразу
+# отбросить детектор, не пробуя весь шаблон.
+_DETECTORS: List[Tuple[str, str, str]] = [
+    ("EMAIL", r"(?=[\w.+-]+@)", r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+    ("SNILS", r"(?=\d)", r"\d{3}-\d{3}-\d{3}[\s-]\d{2}\b"),
+    ("INN", r"(?=[Ии])", r"(?i:ИНН)\s*:?\s*(?P<INN_v>\d{12}|\d{10})\b"),
+    (
+        "ACCOUNT",
+        r"(?=[Лл])",
+        r"(?i:л/сч?|лицев\w*\s+сч[её]т\w*)\s*:?\s*(?:№\s*)?(?P<ACCOUNT_v>\d{6,20})\b",
+    ),
+    (
+        "PASSPORT",
+        r"(?=[Пп\d])",
+        r"(?i:паспорт\w*)\s*(?i:сери[яи]\s*)?(?P<PASSPORT_v>\d{2}\s?\d{2}\s*(?:(?i:номер|№)\s*)?\d{6})\b"
+        r"|\d{2}\s\d{2}\s\d{6}\b",
+    ),
+    ("PHONE", r"(?=[+8])", r"(?:\+7|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}\b"),
+    (
+        "ADDRESS",
+        r"(?=[УуПпБбШшНн])",
+        r"(?i:ул\.|улица|пр-т|просп\.|проспект|пер\.|переулок|бульвар|б-р|шоссе|наб\.|набережная|пл\.|площадь)"
+        r"\s*[А-ЯЁA-Z0-9][\w.\- ]{0,60}?,?\s*(?i:д\.|дом)\s*\d+[а-яА-Я]?(?:/\d+)?"
+        r"(?:\s*,?\s*(?i:корп\.|корпус|стр\.)\s*\d+)?"
+        r"(?:\s*,?\s*(?i:кв\.|квартира)\s*\d+)?",
+    ),
+    (
+        "FIO",
+        r"(?=[А-ЯЁ])",
+        r"[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:вич|вна|ична|инична)\b"
+        r"|[А-ЯЁ][а-яё]+\s+[А-ЯЁ]\.\s?[А-ЯЁ]\."
+        r"|[А-ЯЁ]\.\s?[А-ЯЁ]\.\s?[А-ЯЁ][а-яё]+",
+    ),
+]
+
+PII_KINDS = tuple(kind for kind, _, _ in _DETECTORS)
+
+# Все детекторы начинаются с начала слова: (?<!\w) отсекает позиции
+# внутри слов одной проверкой, не перебирая альтернативы.
+_PATTERN = re.compile(
+    r"(?<!\w)(?:%s)" % "|".join(f"{guard}(?P<{kind}>{regex})" for kind, guard, regex in _DETECTORS)
+)
+_VALUE_GROUPS = {kind: f"{kind}_v" for kind in PII_KINDS if f"{kind}_v" in _PATTERN.groupindex}
+_TOKEN_PATTERN = re.compile(r"\[(?:%s)_\d+\]" % "|".join(PII_KINDS))
+# Максимальная длина токена — для буферизации при потоковом демаскировании
+_MAX_TOKEN_LEN = max(len(k) for k in PII_KINDS) + 8
+
+
+@dataclass
+class MaskResult:
+    masked_text: str
+    # токен → исходное значение, в порядке появления
+    mappings: Dict[str, str] = field(default_factory=dict)
+
+    def as_pairs(self) -> List[Tuple[str, str]]:
+        """Пары (original, masked) — формат PIIMapping."""
+        return [(original, token) for token, original in self.mappings.items()]
+
+
+class PIIEngine:
+    def mask(self, text: str, mappings: Optional[Dict[str, str]] = None) -> MaskResult:
+        """
+        Заменяет ПДн токенами за один проход.
+        Переданный mappings продолжает нумерацию — так несколько текстов
+        одного обращения получают согласованные токены.
+        """
+        token_by_value: Dict[Tuple[str, str], str] = {}
+        counters: Dict[str, int] = {}
+        result = MaskResult(masked_text="", mappings=dict(mappings or {}))
+        for token, original in result.mappings.items():
+            kind, number = token[1:-1].rsplit("_", 1)
+            token_by_value[(kind, original)] = token
+            counters[kind] = max(counters.get(kind, 0), int(number))
+
+        def replace(match: re.Match) -> str:
+            kind = match.lastgroup
+            value_group = _VALUE_GROUPS.get(kind)
+            if value_group and match.group(value_group) is not None:
+                start, end = match.span(value_group)
+            else:
+                start, end = match.span(kind)
+            original = match.string[start:end]
+
+            token = token_by_value.get((kind, original))
+            if token is None:
+                counters[kind] = counters.get(kind, 0) + 1
+                token = f"[{kind}_{counters[kind]}]"
+                token_by_value[(kind, original)] = token
+                result.mappings[token] = original
+
+            whole_start, whole_end = match.span()
+            return match.string[whole_start:start] + token + match.string[end:whole_end]
+
+        result.masked_text = _PATTERN.sub(replace, text)
+        return result
+
+    def unmask(self, text: str, mappings: Dict[str, str]) -> str:
+        """Возвращает исходные значения вместо токенов (демаскирование ответа LLM)."""
+        if not mappings:
+            return text
+        return _TOKEN_PATTERN.sub(lambda m: mappings.get(m.group(0), m.group(0)), text)
+
+    def stream_unmasker(self, mappings: Dict[str, str]) -> "StreamUnmasker":
+        return StreamUnmasker(self, mappings)
+
+
+class StreamUnmasker:
+    """
+    Демаскирование потока токенов LLM: токен вида [FIO_1] может прийти
+    по частям, поэтому незакрытый хвост после «[» придерживается до
+    следующего фрагмента.
+    """
+
+    def __init__(self, engine: PIIEngine, mappings: Dict[str, str]):
+        self.engine = engine
+        self.mappings = mappings
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        self._pending = ""
+        if self.mappings:
+            bracket = text.rfind("[")
+            if bracket != -1 and "]" not in text[bracket:] and len(text) - bracket < _MAX_TOKEN_LEN:
+                text, self._pending = text[:bracket], text[bracket:]
+        return self.engine.unmask(text, self.mappings)
+
+    def finish(self) -> str:
+        text, self._pending = self._pending, ""
+        return self.engine.unmask(text, self.mappings)
+
+
+pii_engine = PIIEngine()
@@ -0,0 +1,91 @@
+# ============================================================
+# Компактные ANN-индексы: halfvec и бинарная квантизация
+# ============================================================
+# В HNSW-индексе хранится копия каждого вектора: vector(1536) — 6 КБ,
+# halfvec — 3 КБ (2 байта на измерение), bit — 192 байта (1 бит).
+# Компактный индекс строится по выражению над embedding, а не по
+# отдельной колонке: в таблице остаётся полный вектор, по нему
+# кандидаты с компактного индекса пересчитываются точным косинусным
+# расстоянием (limit * RAG_*_OVERSAMPLE кандидатов → limit лучших).
+# Выражение в запросе должно совпадать с выражением индекса — иначе
+# планировщик индекс не возьмёт. Нужен pgvector ≥ 0.7.
+# ============================================================
+
+from typing import Optional
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import cast, func
+
+from ..config import settings
+from ..models.models import DocumentChunk
+
+QUANTIZATIONS = ("none", "halfvec", "bit")
+
+_PUBLIC_INDEX_NAMES = {
+    "none": "ix_document_chunks_embedding_public",
+    "halfvec": "ix_document_chunks_embedding_half_public",
+    "bit": "ix_document_chunks_embedding_bit_public",
+}
+
+
+def _mode(quantization: Optional[str]) -> str:
+    mode = quantization or settings.VECTOR_QUANTIZATION
+    if mode not in QUANTIZATIONS:
+        raise ValueError(f"Неизвестный VECTOR_QUANTIZATION: {mode} (ожидается {', '.join(QUANTIZATIONS)})")
+    return mode
+
+
+def oversample(quantization: Optional[str] = None) -> int:
+    """Во сколько раз больше кандидатов берётся с компактного индекса до точного пересчёта."""
+    mode = _mode(quantization)
+    if mode == "halfvec":
+        return max(1, settings.RAG_HALFVEC_OVERSAMPLE)
+    if mode == "bit":
+        return max(1, settings.RAG_BIT_OVERSAMPLE)
+    return 1
+
+
+def search_distance(query, quantization: Optional[str] = None):
+    """
+    Расстояние, по которому идёт поиск по индексу. query — список чисел
+    или SQL-выражение типа vector. Без квантизации — точное косинусное.
+    """
+    mode = _mode(quantization)
+    dim = settings.EMBEDDING_DIM
+    if mode == "halfvec":
+        return cast(DocumentChunk.embedding, HALFVEC(dim)).cosine_distance(cast(query, HALFVEC(dim)))
+    if mode == "bit":
+        # Расстояние Хэмминга между знаками компонент
+        return cast(func.binary_quantize(DocumentChunk.embedding), BIT(dim)).hamming_distance(
+            func.binary_quantize(cast(query, Vector(dim)))
+        )
+    return DocumentChunk.embedding.cosine_distance(query)
+
+
+def public_index_name(quantization: Optional[str] = None) -> str:
+    return _PUBLIC_INDEX_NAMES[_mode(quantization)]
+
+
+def index_method(quantization: Optional[str] = None) -> str:
+    """USING-часть CREATE INDEX: метод, выражение с классом операторов и параметры."""
+    mode = _mode(quantization)
+    dim = int(settings.EMBEDDING_DIM)
+    if mode == "halfvec":
+        target = f"(embedding::halfvec({dim})) halfvec_cosine_ops"
+    elif mode == "bit":
+        target = f"(binary_quantize(embedding)::bit({dim})) bit_hamming_ops"
+    else:
+        target = "embedding vector_cosine_ops"
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        return f"ivfflat ({target}) WITH (lists = {int(settings.VECTOR_IVFFLAT_LISTS)})"
+    return (
+        f"hnsw ({target}) "
+        f"WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+    )
+
+
+def create_index_statement(name: str, where: str, quantization: Optional[str] = None) -> str:
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON document_chunks USING {index_method(quantization)} WHERE {where}"
+    )
@@ -1,41 +1,402 @@
-import httpx
+import re
+import uuid
 from typing import List, Optional
-from sqlalchemy import select, text
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Integer, bindparam, cast, func, literal, or_, select, text, true, union_all
+from sqlalchemy.dialects.postgresql import REGCONFIG, UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..models.models import DocumentChunk
+from ..models.models import Document, DocumentChunk
 from ..config import settings
+from .coalescing import retrieval_flight
+from .embeddings import embedding_service, normalize_text
+from .metrics import stage
+from .quantization import oversample, search_distance
+from .retrieval_cache import retrieval_cache
+from .vector_store import NumpyVectorStore, RetrievedChunk, VectorStore
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# "ст. 161", "ч. 2 ст. 155", "п. 31" — ссылки на нормы в вопросах пользователей
+_CITATION_RE = re.compile(r"\b(ст|статья|ч|часть|п|пункт)\.?\s*(\d+(?:\.\d+)*)", re.IGNORECASE)
+_ABBREVIATIONS = {"ст": "статья", "ч": "часть", "п": "пункт"}
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Строка для to_tsquery('russian', ...): слова запроса через OR
+    плюс фразы «статья <-> 161» для явных ссылок на статьи, чтобы
+    заголовок нужной статьи получал максимальный ранг.
+    """
+    terms: List[str] = []
+    for match in _CITATION_RE.finditer(query):
+        kind = _ABBREVIATIONS.get(match.group(1).lower(), match.group(1).lower())
+        if kind == "статья":
+            terms.append(f"(статья <-> {match.group(2).split('.')[0]})")
+    for token in _TOKEN_RE.findall(query.lower()):
+        token = _ABBREVIATIONS.get(token, token)
+        if token not in terms:
+            terms.append(token)
+    return " | ".join(terms)
+
+
+def _projection(distance):
+    """Колонки результата: только то, что нужно для промпта и ссылок."""
+    return (
+        DocumentChunk.id,
+        DocumentChunk.document_id,
+        DocumentChunk.content,
+        DocumentChunk.meta_info,
+        Document.filename,
+        distance.label("distance"),
+    )
+
+
+def _tenant_filter(organization_id: uuid.UUID):
+    """
+    organization_id подставляется в SQL литералом: тогда планировщик может
+    взять частичный ANN-индекс этой УК (scripts/tenant_ann_index.py) —
+    с параметром общий план не знает значения и индекс не подходит.
+    """
+    tenant = bindparam("tenant_id", organization_id, type_=UUID(as_uuid=True), literal_execute=True)
+    return DocumentChunk.organization_id == tenant
+
+
+def _scope_filter(organization_id: Optional[uuid.UUID]):
+    """Общий корпус плюс (если задана) собственные документы организации."""
+    public = DocumentChunk.organization_id.is_(None)
+    if organization_id is None:
+        return public
+    return or_(public, _tenant_filter(organization_id))
+
+
+def _scoped_nearest(columns, query, organization_id: Optional[uuid.UUID], limit: int, correlate=None):
+    """
+    top-`limit` по расстоянию в пределах арендатора. OR в одном запросе
+    не использует частичные индексы, поэтому срезы ищутся отдельно и
+    сливаются: общий корпус — по частичному ANN-индексу, срез УК — по
+    btree organization_id (или её частичному ANN-индексу).
+    columns должны содержать точное расстояние с меткой "distance".
+    При VECTOR_QUANTIZATION срезы ищутся по компактному индексу с
+    запасом (oversample), итоговый порядок — по точному расстоянию.
+    correlate — внешняя таблица для LATERAL (остальные не коррелируются).
+    """
+    distance = search_distance(query)
+    candidates = limit * oversample()
+
+    def branch(condition):
+        stmt = select(*columns).where(condition).order_by(distance).limit(candidates)
+        return stmt.correlate(correlate) if correlate is not None else stmt
+
+    public = branch(DocumentChunk.organization_id.is_(None))
+    if organization_id is None and candidates == limit:
+        return public
+    if organization_id is None:
+        merged = public.subquery("scoped")
+    else:
+        merged = union_all(public, branch(_tenant_filter(organization_id))).subquery("scoped")
+    return select(merged).order_by(merged.c.distance).limit(limit)
+
+
+def _to_chunk(row) -> RetrievedChunk:
+    return RetrievedChunk(
+        id=row.id,
+        document_id=row.document_id,
+        content=row.content,
+        meta_info=row.meta_info,
+        filename=row.filename,
+        distance=float(row.distance),
+    )
+
+
+async def apply_search_params(
+    db: AsyncSession,
+    limit: int,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None
+) -> None:
+    """
+    Настройка точности ANN-индекса на текущую транзакцию (SET LOCAL).
+    ef_search не может быть меньше limit — иначе HNSW вернёт меньше строк.
+    """
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        value = probes or settings.RAG_IVFFLAT_PROBES
+        await db.execute(
+            text("SELECT set_config('ivfflat.probes', :value, true)"), {"value": str(value)}
+        )
+    else:
+        value = max(ef_search or settings.RAG_HNSW_EF_SEARCH, limit)
+        await db.execute(
+            text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(value)}
+        )
+
+
+class PgVectorStore(VectorStore):
+    """document_chunks в PostgreSQL: ANN-индекс pgvector, область поиска — _scoped_nearest."""
+
+    name = "pgvector"
+    uses_document_chunks = True
+
+    async def search(
+        self,
+        db: AsyncSession,
+        vectors: List[List[float]],
+        limit: int,
+        organization_id: Optional[uuid.UUID] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Один вектор — простой запрос; несколько — за один round trip:
+        векторы передаются как строки подзапроса, top-k для каждого
+        считается в LATERAL-подзапросе (использует ANN-индекс).
+        """
+        if not vectors:
+            return []
+        await apply_search_params(db, limit * oversample(), ef_search=ef_search, probes=probes)
+        if len(vectors) == 1:
+            # SQL-запрос с использованием оператора <=> (cosine distance) из pgvector
+            distance = DocumentChunk.embedding.cosine_distance(vectors[0])
+            nearest = _scoped_nearest(
+                [DocumentChunk.id, distance.label("distance")], vectors[0], organization_id, limit
+            ).subquery("nearest")
+            stmt = (
+                select(*_projection(distance))
+                .join(nearest, DocumentChunk.id == nearest.c.id)
+                .join(Document, DocumentChunk.document_id == Document.id)
+                .order_by(nearest.c.distance)
+            )
+            result = await db.execute(stmt)
+            return [[_to_chunk(row) for row in result]]
+
+        vector_type = Vector(settings.EMBEDDING_DIM)
+        batch = union_all(*[
+            select(
+                literal(i, Integer).label("ord"),
+                cast(bindparam(f"query_vector_{i}", vector, type_=vector_type), vector_type).label("embedding"),
+            )
+            for i, vector in enumerate(vectors)
+        ]).subquery("batch")
+
+        distance = DocumentChunk.embedding.cosine_distance(batch.c.embedding)
+        nearest = _scoped_nearest(
+            [DocumentChunk.id, distance.label("distance")], batch.c.embedding, organization_id, limit, correlate=batch
+        ).lateral("nearest")
+        stmt = (
+            select(batch.c.ord, *_projection(nearest.c.distance))
+            .select_from(batch)
+            .join(nearest, true())
+            .join(DocumentChunk, DocumentChunk.id == nearest.c.id)
+            .join(Document, DocumentChunk.document_id == Document.id)
+            .order_by(batch.c.ord, nearest.c.distance)
+        )
+
+        results: List[List[RetrievedChunk]] = [[] for _ in vectors]
+        for row in await db.execute(stmt):
+            results[row.ord].append(_to_chunk(row))
+        return results
+
+
+def create_vector_store() -> VectorStore:
+    if settings.VECTOR_STORE == "pgvector":
+        return PgVectorStore()
+    if settings.VECTOR_STORE == "numpy":
+        return NumpyVectorStore(settings.VECTOR_STORE_DIR, settings.EMBEDDING_DIM, settings.VECTOR_STORE_DTYPE)
+    raise ValueError(f"Неизвестный VECTOR_STORE: {settings.VECTOR_STORE}")
+
 
 class RAGService:
+    def __init__(self, store: Optional[VectorStore] = None):
+        self._store = store
+
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            self._store = create_vector_store()
+        return self._store
+
     async def get_embeddings(self, text: str) -> List[float]:
         """
-        Генерация эмбеддингов для текста.
-        Пока используем заглушку или API (OpenAI/Yandex).
+        Эмбеддинг поискового запроса (кэшируется по нормализованному тексту).
         """
-        # В реальном проекте здесь будет запрос к API
-        # Например, Yandex Embeddings или OpenAI
-        # Для демонстрации возвращаем вектор из нулей нужной размерности
-        return [0.0] * 1536
+        return await embedding_service.embed_query(text)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Батчевая генерация эмбеддингов для фрагментов документов.
+        """
+        return await embedding_service.embed_many(texts)
 
     async def find_relevant_chunks(
-        self, 
-        db: AsyncSession, 
-        query: str, 
-        limit: int = 3
-    ) -> List[DocumentChunk]:
-        """
-        Поиск наиболее релевантных кусков текста в векторной БД.
-        """
-        query_vector = await self.get_embeddings(query)
-        
-        # SQL-запрос с использованием оператора <=> (cosine distance) из pgvector
-        # Мы используем строковый запрос, так как pgvector операторы специфичны для Postgres
-        stmt = (
-            select(DocumentChunk)
-            .order_by(DocumentChunk.embedding.cosine_distance(query_vector))
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        mode: Optional[str] = None,
+        organization_id: Optional[uuid.UUID] = None
+    ) -> List[RetrievedChunk]:
+        """
+        Поиск наиболее релевантных кусков текста в хранилище VECTOR_STORE.
+        pgvector — один SQL-запрос: фрагмент, имя документа (JOIN) и косинусное расстояние.
+        ef_search / probes переопределяют точность ANN-индекса для этого запроса.
+        mode: "vector" — только косинусная близость, "hybrid" — вектор +
+        полнотекстовый поиск, объединённые reciprocal rank fusion
+        (только pgvector; numpy-хранилище ищет по вектору).
+        Ищется общий нормативный корпус и документы organization_id
+        (без неё — только общий корпус).
+        Одинаковые одновременные запросы выполняются один раз: ожидающие
+        получают результат ведущего (их сессия db не используется).
+        """
+        mode = mode or settings.RAG_SEARCH_MODE
+        key = (normalize_text(query), limit, ef_search, probes, mode, organization_id)
+        chunks = await retrieval_flight.do(
+            key,
+            lambda: self._find_relevant_chunks(db, query, limit, ef_search, probes, mode, organization_id),
+        )
+        # Список у каждого вызывающего свой — результат ведущего общий
+        return list(chunks)
+
+    async def _find_relevant_chunks(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        mode: str,
+        organization_id: Optional[uuid.UUID]
+    ) -> List[RetrievedChunk]:
+        with stage("embed_query"):
+            query_vector = await self.get_embeddings(query)
+        # Полнотекстовая часть гибридного поиска есть только в document_chunks
+        fts_query = build_fts_query(query) if mode == "hybrid" and self.store.uses_document_chunks else ""
+
+        cache_key = retrieval_cache.make_key(
+            query_vector, organization_id, **self._cache_params(limit, ef_search, probes), fts=fts_query
+        )
+        if cache_key is not None:
+            with stage("retrieval_cache"):
+                cached = await retrieval_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if not fts_query:
+            with stage("retrieval"):
+                chunks = (await self.store.search(db, [query_vector], limit, organization_id, ef_search, probes))[0]
+        else:
+            candidates = max(settings.RAG_HYBRID_CANDIDATES, limit)
+            await apply_search_params(db, candidates * oversample(), ef_search=ef_search, probes=probes)
+            stmt = self._hybrid_statement(query_vector, fts_query, limit, candidates, organization_id)
+            with stage("retrieval"):
+                chunks = [_to_chunk(row) for row in await db.execute(stmt)]
+
+        if cache_key is not None:
+            await retrieval_cache.set(cache_key, chunks)
+        return chunks
+
+    @staticmethod
+    def _cache_params(limit: int, ef_search: Optional[int], probes: Optional[int]) -> dict:
+        """Параметры, от которых зависит результат поиска (для ключа кэша)."""
+        return {
+            "limit": limit,
+            "ef_search": ef_search,
+            "probes": probes,
+            "quantization": settings.VECTOR_QUANTIZATION,
+        }
+
+    async def find_relevant_chunks_batch(
+        self,
+        db: AsyncSession,
+        queries: List[str],
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        organization_id: Optional[uuid.UUID] = None
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Векторный поиск сразу для нескольких запросов: эмбеддинги считаются
+        одним вызовом модели, поиск — одним обращением к хранилищу
+        (pgvector — один round trip с LATERAL, numpy — одно умножение матриц).
+        Область поиска — как в find_relevant_chunks.
+        Результаты возвращаются в порядке queries.
+        """
+        if not queries:
+            return []
+        with stage("embed_query"):
+            vectors = await embedding_service.embed_queries(queries)
+
+        params = self._cache_params(limit, ef_search, probes)
+        keys = [retrieval_cache.make_key(vector, organization_id, **params, fts="") for vector in vectors]
+        results: List[Optional[List[RetrievedChunk]]] = [None] * len(vectors)
+        with stage("retrieval_cache"):
+            for i, key in enumerate(keys):
+                if key is not None:
+                    results[i] = await retrieval_cache.get(key)
+
+        # В хранилище — только промахи кэша, одним обращением
+        missing = [i for i, chunks in enumerate(results) if chunks is None]
+        if missing:
+            with stage("retrieval"):
+                found = await self.store.search(
+                    db, [vectors[i] for i in missing], limit, organization_id, ef_search, probes
+                )
+            for i, chunks in zip(missing, found):
+                results[i] = chunks
+                if keys[i] is not None:
+                    await retrieval_cache.set(keys[i], chunks)
+        return results
+
+    def _hybrid_statement(
+        self,
+        query_vector: List[float],
+        fts_query: str,
+        limit: int,
+        candidates: int,
+        organization_id: Optional[uuid.UUID] = None
+    ):
+        """
+        Один запрос: top-N по вектору (HNSW) и top-N по ts_rank_cd (GIN),
+        ранги сливаются как sum(1 / (k + rank)).
+        Ранги считаются во внешних подзапросах — иначе оконная функция
+        заставила бы Postgres отсортировать всю таблицу мимо индекса.
+        Расстояние для итоговых строк считается только по `limit` строкам.
+        """
+        distance = DocumentChunk.embedding.cosine_distance(query_vector)
+        nearest = _scoped_nearest(
+            [DocumentChunk.id, distance.label("distance")], query_vector, organization_id, candidates
+        ).subquery("nearest")
+        vector_ranks = select(
+            nearest.c.id,
+            func.row_number().over(order_by=nearest.c.distance).label("rank"),
+        )
+
+        ts_query = func.to_tsquery(cast("russian", REGCONFIG), fts_query)
+        ts_rank = func.ts_rank_cd(DocumentChunk.content_tsv, ts_query)
+        matched = (
+            select(DocumentChunk.id, ts_rank.label("ts_rank"))
+            .where(DocumentChunk.content_tsv.op("@@")(ts_query), _scope_filter(organization_id))
+            .order_by(ts_rank.desc())
+            .limit(candidates)
+            .subquery("matched")
+        )
+        text_ranks = select(
+            matched.c.id,
+            func.row_number().over(order_by=matched.c.ts_rank.desc()).label("rank"),
+        )
+
+        ranks = union_all(vector_ranks, text_ranks).subquery("ranks")
+        fused = (
+            select(ranks.c.id, func.sum(1.0 / (settings.RAG_RRF_K + ranks.c.rank)).label("score"))
+            .group_by(ranks.c.id)
+            .order_by(func.sum(1.0 / (settings.RAG_RRF_K + ranks.c.rank)).desc())
             .limit(limit)
+            .subquery("fused")
+        )
+        return (
+            select(*_projection(distance))
+            .join(fused, DocumentChunk.id == fused.c.id)
+            .join(Document, DocumentChunk.document_id == Document.id)
+            .order_by(fused.c.score.desc())
         )
-        
-        result = await db.execute(stmt)
-        return list(result.scalars().all())
 
 rag_service = RAGService()
@@ -0,0 +1,230 @@
+# ============================================================
+# Контроль нагрузки: входящий rate limit и адаптивный лимит к DeepSeek
+# ============================================================
+# SlidingWindowLimiter — скользящее окно в минуту на ключ (пользователь,
+# организация): счётчики текущего и прошлого окна, прошлое учитывается
+# пропорционально оставшейся доле. RedisSlidingWindowLimiter — тот же
+# алгоритм на общем Redis для всех воркеров uvicorn.
+# AIMDLimiter — число одновременных запросов к провайдеру: +1/limit за
+# успешный ответ, ×0.5 на 429/5xx, пауза до Retry-After для всех.
+# ============================================================
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from ..config import settings
+
+# Ответы провайдера, означающие перегрузку
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число или HTTP-дата."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # секунд до освобождения квоты (0, если разрешено)
+
+
+class SlidingWindowLimiter:
+    """
+    Лимит запросов в минуту на ключ в памяти процесса.
+    Число ключей ограничено — давно не активные вытесняются (LRU).
+    """
+
+    def __init__(self, window_seconds: float = 60.0, max_keys: int = 100_000):
+        self.window = window_seconds
+        self.max_keys = max_keys
+        # ключ → (номер текущего окна, счётчик текущего, счётчик прошлого)
+        self._windows: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int) -> RateLimitDecision:
+        now = time.time()
+        index = int(now // self.window)
+        start = index * self.window
+        item = self._windows.get(key)
+        if item is None or item[0] < index - 1:
+            current, previous = 0, 0
+        elif item[0] == index:
+            current, previous = item[1], item[2]
+        else:
+            current, previous = 0, item[1]
+        used = previous * (1.0 - (now - start) / self.window) + current
+        if used + 1 > limit:
+            return RateLimitDecision(False, limit, 0, self._retry_after(now, start, current, previous, limit))
+        self._windows[key] = (index, current + 1, previous)
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return RateLimitDecision(True, limit, max(int(limit - used - 1), 0), 0.0)
+
+    def _retry_after(self, now: float, start: float, current: int, previous: int, limit: int) -> float:
+        """Через сколько секунд вклад прошлого окна упадёт достаточно для ещё одного запроса."""
+        if current + 1 > limit or not previous:
+            return start + self.window - now
+        # previous * (1 - t/window) + current + 1 <= limit
+        t = self.window * (1 - (limit - current - 1) / previous)
+        return max(start + t - now, 0.0)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RedisSlidingWindowLimiter(SlidingWindowLimiter):
+    """
+    Скользящее окно на Redis: INCR счётчика текущего окна и чтение прошлого
+    за один round trip. При недоступном Redis запросы пропускаются (fail open).
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:", window_seconds: float = 60.0):
+        super().__init__(window_seconds)
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self.errors = 0
+
+    def _get_client(self):
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def hit(self, key: str, limit: int) -> RateLimitDecision:
+        now = time.time()
+        index = int(now // self.window)
+        start = index * self.window
+        current_key = f"{self.prefix}{key}:{index}"
+        previous_key = f"{self.prefix}{key}:{index - 1}"
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            pipe.incr(current_key)
+            pipe.expire(current_key, int(self.window * 2))
+            pipe.get(previous_key)
+            current, _, previous = await pipe.execute()
+        except Exception:
+            self.errors += 1
+            return RateLimitDecision(True, limit, limit, 0.0)
+
+        previous = int(previous or 0)
+        # INCR уже учёл этот запрос; отклонённые тоже расходуют квоту окна,
+        # что только ужесточает лимит для клиента, игнорирующего 429
+        used = previous * (1.0 - (now - start) / self.window) + current
+        if used > limit:
+            retry_after = self._retry_after(now, start, current - 1, previous, limit)
+            return RateLimitDecision(False, limit, 0, retry_after)
+        return RateLimitDecision(True, limit, max(int(limit - used), 0), 0.0)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AIMDLimiter:
+    """
+    Адаптивное ограничение одновременных запросов к внешнему API
+    (additive increase / multiplicative decrease). Уменьшение — не чаще
+    раза в cooldown секунд, чтобы пачка 429 от одного всплеска не
+    обрушила лимит до минимума.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 1.0,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.decreases = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: List[asyncio.Future] = []
+
+    async def acquire(self) -> None:
+        self.waiting += 1
+        try:
+            while True:
+                delay = self._blocked_until - time.monotonic()
+                if delay > 0:
+                    # Провайдер попросил подождать (Retry-After)
+                    await asyncio.sleep(delay)
+                    continue
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        finally:
+            self.waiting -= 1
+
+    def release(self, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        """
+        status — код ответа (None — сетевая ошибка), retry_after — из заголовка.
+        Синхронный: вызывается из finally и не должен прерываться отменой.
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if status in OVERLOAD_STATUSES:
+            if now - self._last_decrease >= self.cooldown_seconds:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                self._last_decrease = now
+                self.decreases += 1
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+        elif status is not None and status < 400:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        # Будим всех: каждый заново проверит лимит и паузу
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "decreases": self.decreases,
+            "blocked_for": round(max(self._blocked_until - time.monotonic(), 0.0), 3),
+        }
+
+
+def create_rate_limiter() -> SlidingWindowLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisSlidingWindowLimiter(settings.REDIS_URL)
+    return SlidingWindowLimiter()
+
+
+rate_limiter = create_rate_limiter()
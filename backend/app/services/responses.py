@@ -0,0 +1,212 @@
+# ============================================================
+# Варианты ответа на обращение жителя
+# ============================================================
+# Обращение маскируется и ищется в базе знаний один раз, после чего
+# варианты (разный тон и уровень риска) генерируются параллельно —
+# не больше RESPONSE_VARIANTS_CONCURRENCY одновременно на запрос,
+# общий предел к DeepSeek держит AIMD-лимит клиента. Время ответа —
+# время самого медленного варианта, а не сумма.
+# ============================================================
+
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..schemas.schemas import LLMSettingsSchema, PIIMapping, RAGResult, ResponseVariant
+from .context import context_builder
+from .llm import DEEPSEEK_ERROR_PREFIX, llm_service
+from .metrics import stage
+from .pii import MaskResult, pii_engine
+from .rag import rag_service
+
+
+@dataclass(frozen=True)
+class VariantStyle:
+    id: str
+    title: str
+    tone: str
+    risk_level: str
+    instruction: str
+
+
+VARIANT_STYLES: List[VariantStyle] = [
+    VariantStyle(
+        id="short",
+        title="Краткий вариант",
+        tone="нейтральный",
+        risk_level="low",
+        instruction="Ответ краткий, 3–5 предложений: что сделано или будет сделано и в какой срок.",
+    ),
+    VariantStyle(
+        id="official",
+        title="Официальный вариант",
+        tone="строгий",
+        risk_level="medium",
+        instruction=(
+            "Официально-деловой стиль со ссылками на нормы из контекста (пункты и статьи). "
+            "Не признавай требования обоснованными, если это не следует из обращения."
+        ),
+    ),
+    VariantStyle(
+        id="empathetic",
+        title="Развёрнутый вариант",
+        tone="доброжелательный",
+        risk_level="low",
+        instruction=(
+            "Доброжелательный тон: признай неудобства жителя, подробно опиши план действий "
+            "и порядок перерасчёта платы, если он применим."
+        ),
+    ),
+]
+
+
+@dataclass
+class PreparedRequest:
+    """Результат общего прохода: маскирование, поиск и контекст — один раз на все варианты."""
+    masked: MaskResult
+    context: str  # маскированный: фрагменты документов тоже содержат ПДн
+    rag_results: List[RAGResult]
+    # Токены обращения и контекста — для демаскирования ответа
+    prompt_mappings: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def pii_mappings(self) -> List[PIIMapping]:
+        return [PIIMapping(original=original, masked=token) for original, token in self.masked.as_pairs()]
+
+
+class VariantGenerationFailed(Exception):
+    """Не удалось сгенерировать ни одного варианта."""
+
+
+def select_styles(tone: Optional[str], max_variants: Optional[int]) -> List[VariantStyle]:
+    """Стиль с запрошенным тоном — первым; max_variants ограничивает число вариантов."""
+    styles = sorted(VARIANT_STYLES, key=lambda s: s.tone != tone) if tone else list(VARIANT_STYLES)
+    return styles[: max_variants or settings.RESPONSE_VARIANTS_DEFAULT]
+
+
+class ResponseService:
+    async def prepare(
+        self, db: AsyncSession, text: str, organization_id: Optional[uuid.UUID] = None
+    ) -> PreparedRequest:
+        with stage("pii_mask"):
+            masked = llm_service.mask_pii(text)
+        # Поиск по маскированному тексту: ПДн не попадают в кэши эмбеддингов и поиска
+        chunks = await rag_service.find_relevant_chunks(
+            db, masked.masked_text, limit=settings.RAG_CONTEXT_CANDIDATES, organization_id=organization_id
+        )
+        sources = [
+            {
+                "id": i + 1,
+                "title": chunk.filename,
+                "citation": str(chunk.meta_info) if chunk.meta_info else "Не указано",
+                "content": chunk.content,
+                "relevance": round(chunk.similarity, 4),
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+        items = context_builder.pack(sources)
+        context = context_builder.render(items)
+        mappings = masked.mappings
+        if settings.PII_MASKING_ENABLED and context:
+            # Нумерация продолжает токены обращения: одно значение — один токен
+            with stage("pii_mask"):
+                masked_context = pii_engine.mask(context, mappings=masked.mappings)
+            context, mappings = masked_context.masked_text, masked_context.mappings
+        return PreparedRequest(
+            masked=masked,
+            context=context,
+            prompt_mappings=mappings,
+            rag_results=[
+                RAGResult(
+                    id=i + 1,
+                    title=item.source["title"],
+                    similarity=item.source["relevance"],
+                    source=item.source["citation"],
+                )
+                for i, item in enumerate(items)
+            ],
+        )
+
+    @staticmethod
+    def _prompt(prepared: PreparedRequest, style: VariantStyle) -> MaskResult:
+        parts = [f"Обращение жителя:\n{prepared.masked.masked_text}"]
+        if prepared.context:
+            parts.append(f"Нормативная база:\n{prepared.context}")
+        parts.append(
+            "Составь ответ управляющей компании на это обращение. "
+            f"{style.instruction} Метки вида [FIO_1] оставь без изменений."
+        )
+        # Метки обращения и контекста согласованы — демаскирование общее
+        return MaskResult(masked_text="\n\n".join(parts), mappings=prepared.prompt_mappings)
+
+    async def _generate_one(
+        self,
+        prepared: PreparedRequest,
+        style: VariantStyle,
+        limit: asyncio.Semaphore,
+        llm_settings: Optional[LLMSettingsSchema],
+    ) -> Optional[ResponseVariant]:
+        async with limit:
+            content = await llm_service.generate_from_masked(
+                self._prompt(prepared, style), llm_settings=llm_settings
+            )
+        if content.startswith(DEEPSEEK_ERROR_PREFIX):
+            return None
+        return ResponseVariant(
+            id=style.id, title=style.title, content=content, tone=style.tone, risk_level=style.risk_level
+        )
+
+    def _start(
+        self,
+        prepared: PreparedRequest,
+        styles: List[VariantStyle],
+        llm_settings: Optional[LLMSettingsSchema],
+    ) -> List[asyncio.Task]:
+        limit = asyncio.Semaphore(settings.RESPONSE_VARIANTS_CONCURRENCY)
+        return [asyncio.create_task(self._generate_one(prepared, style, limit, llm_settings)) for style in styles]
+
+    async def generate(
+        self,
+        prepared: PreparedRequest,
+        styles: List[VariantStyle],
+        llm_settings: Optional[LLMSettingsSchema] = None,
+    ) -> List[ResponseVariant]:
+        """Все варианты в порядке styles; неудавшиеся пропускаются."""
+        tasks = self._start(prepared, styles, llm_settings)
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        variants = [v for v in results if v is not None]
+        if not variants:
+            raise VariantGenerationFailed("DeepSeek не вернул ни одного варианта ответа")
+        return variants
+
+    async def iter_generate(
+        self,
+        prepared: PreparedRequest,
+        styles: List[VariantStyle],
+        llm_settings: Optional[LLMSettingsSchema] = None,
+    ) -> AsyncIterator[ResponseVariant]:
+        """Варианты по мере готовности; при отключении клиента остальные отменяются."""
+        tasks = self._start(prepared, styles, llm_settings)
+        produced = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                variant = await next_done
+                if variant is not None:
+                    produced += 1
+                    yield variant
+        finally:
+            for task in tasks:
+                task.cancel()
+        if not produced:
+            raise VariantGenerationFailed("DeepSeek не вернул ни одного варианта ответа")
+
+
+response_service = ResponseService()
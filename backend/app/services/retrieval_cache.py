@@ -0,0 +1,177 @@
+# ============================================================
+# Кэш результатов поиска с версиями областей поиска
+# ============================================================
+# Одинаковые вопросы дают тот же эмбеддинг и тот же top-k pgvector —
+# результат кэшируется по хэшу эмбеддинга и параметров поиска
+# (limit, режим, арендатор, точность индекса). В ключ входят версии
+# областей поиска — общего корпуса и организации — из retrieval_versions:
+# триггеры document_chunks (миграция 0008) и documents (0009 — область
+# и имя документа) увеличивают версию при любом изменении и рассылают
+# её pg_notify. Каждый процесс слушает канал на отдельном соединении:
+# загрузка документов, в том числе из scripts/ingest.py, сразу делает
+# старые записи недостижимыми, а на каждый поиск обращения к БД за
+# версией нет. Пока подписки нет
+# (старт, обрыв соединения), кэш не используется — результат не
+# бывает устаревшим. Уровни: LRU в памяти процесса и опционально Redis.
+# ============================================================
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from array import array
+from dataclasses import asdict, replace
+from typing import Dict, List, Optional
+
+import asyncpg
+
+from ..config import settings
+from ..database import raw_dsn
+from .cache import RedisCache, TTLCache
+from .vector_store import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_SCOPE = uuid.UUID(int=0)  # область общего корпуса в retrieval_versions
+_CHANNEL = "retrieval_versions"
+_RECONNECT_SECONDS = 5.0
+_HEARTBEAT_SECONDS = 30.0  # молчащий обрыв сети обнаруживается пробным запросом
+
+
+class RetrievalCache:
+    def __init__(self):
+        # Версии ведёт триггер document_chunks — кэшируется только поиск pgvector
+        self.enabled = settings.RETRIEVAL_CACHE_ENABLED and settings.VECTOR_STORE == "pgvector"
+        self.ttl_seconds = settings.RETRIEVAL_CACHE_TTL_SECONDS
+        self.local = TTLCache(settings.RETRIEVAL_CACHE_MAX_ENTRIES, self.ttl_seconds)
+        self.shared = (
+            RedisCache(settings.REDIS_URL, prefix="retrieval:result:")
+            if settings.RETRIEVAL_CACHE_REDIS_ENABLED
+            else None
+        )
+        self.versions: Dict[uuid.UUID, int] = {}
+        self.listening = False
+        self.invalidations = 0
+        self.bypassed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.shared is not None:
+            await self.shared.aclose()
+
+    # --- Версии ---
+
+    def _advance(self, scope: uuid.UUID, version: int) -> None:
+        # Уведомление и начальное чтение могут прийти в любом порядке — версия только растёт
+        if version > self.versions.get(scope, 0):
+            self.versions[scope] = version
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        scope, _, version = payload.rpartition(":")
+        self._advance(uuid.UUID(scope), int(version))
+        self.invalidations += 1
+
+    async def _listen(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(raw_dsn())
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                # Сначала подписка, потом чтение: изменение между ними не теряется
+                await conn.add_listener(_CHANNEL, self._on_notify)
+                for row in await conn.fetch("SELECT scope, version FROM retrieval_versions"):
+                    self._advance(row["scope"], row["version"])
+                self.listening = True
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1", timeout=_HEARTBEAT_SECONDS)
+                logger.warning("Кэш поиска: соединение LISTEN потеряно")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Кэш поиска: подписка на версии недоступна: %s", e)
+            finally:
+                # Без подписки изменения не видны — до переподключения кэш не используется
+                self.listening = False
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(_RECONNECT_SECONDS)
+
+    # --- Записи ---
+
+    def make_key(self, vector: List[float], organization_id: Optional[uuid.UUID], **params) -> Optional[str]:
+        """
+        Ключ результата поиска; None — кэш сейчас не используется.
+        params — всё, что влияет на результат, кроме эмбеддинга и арендатора.
+        """
+        if not self.enabled:
+            return None
+        if not self.listening:
+            self.bypassed += 1
+            return None
+        scopes = [PUBLIC_SCOPE] if organization_id is None else [PUBLIC_SCOPE, organization_id]
+        header = json.dumps(
+            {
+                "params": params,
+                "organization_id": str(organization_id) if organization_id else None,
+                "versions": [self.versions.get(scope, 0) for scope in scopes],
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        digest = hashlib.sha256(header.encode("utf-8"))
+        digest.update(array("d", vector).tobytes())
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[List[RetrievedChunk]]:
+        """Копия записи: вызывающий может менять список и фрагменты, не портя кэш."""
+        chunks = self.local.get(key)
+        if chunks is not None or self.shared is None:
+            return _copy(chunks) if chunks is not None else None
+        raw = await self.shared.get(key)
+        if raw is None:
+            return None
+        chunks = [
+            RetrievedChunk(
+                **{**item, "id": uuid.UUID(item["id"]), "document_id": uuid.UUID(item["document_id"])}
+            )
+            for item in json.loads(raw)
+        ]
+        self.local.set(key, chunks)
+        return _copy(chunks)
+
+    async def set(self, key: str, chunks: List[RetrievedChunk]) -> None:
+        self.local.set(key, _copy(chunks))
+        if self.shared is not None:
+            raw = json.dumps([asdict(chunk) for chunk in chunks], ensure_ascii=False, default=str)
+            await self.shared.set(key, raw, self.ttl_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "listening": self.listening,
+            "scopes": len(self.versions),
+            "invalidations": self.invalidations,
+            "bypassed": self.bypassed,
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+def _copy(chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+    return [replace(chunk) for chunk in chunks]
+
+
+retrieval_cache = RetrievalCache()
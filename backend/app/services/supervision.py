@@ -0,0 +1,142 @@
+# ============================================================
+# Анализ предписаний надзорных органов
+# ============================================================
+# Файл принимается потоком (services/uploads.py) и сохраняется под
+# именем sha256 содержимого — повторная загрузка не занимает места.
+# Текст извлекается в пуле процессов и кэшируется по тому же хэшу
+# (services/extraction.py), требования выделяет DeepSeek (ПДн
+# маскируются в LLMService, одинаковый текст — попадание в кэш ответов).
+# ============================================================
+
+import asyncio
+import json
+import os
+import re
+import uuid
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.models import Document
+from ..schemas.schemas import (
+    AuditCheck,
+    DocumentRequirement,
+    LLMSettingsSchema,
+    SupervisionAnalysisResponse,
+    SupervisionDocumentInfo,
+)
+from .context import trim_to_sentences
+from .dashboard import SUPERVISION_RESPONSES, dashboard_service
+from .extraction import SUPPORTED_TYPES, UnsupportedDocument, text_extractor
+from .llm import DEEPSEEK_ERROR_PREFIX, llm_service
+from .uploads import StoredUpload
+
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Разбор документа — детерминированная задача
+_ANALYSIS_LLM_SETTINGS = LLMSettingsSchema(temperature=0.0, max_tokens=2048)
+
+_ANALYSIS_PROMPT = """Ниже текст предписания надзорного органа (ГЖИ, Роспотребнадзор и т.п.) управляющей компании.
+Выдели из него данные и верни только JSON без пояснений:
+{{
+  "document_info": {{"sender": "орган", "number": "номер", "date": "дата", "deadline": "срок исполнения"}},
+  "requirements": [
+    {{"requirement": "что требуется сделать", "legal_basis": "норма (статья, пункт)", "documents": ["документы для подтверждения"]}}
+  ]
+}}
+Неизвестные поля оставь пустыми строками.
+
+Текст предписания:
+{text}"""
+
+
+class AnalysisFailed(Exception):
+    """Модель не вернула разбираемый результат."""
+
+
+def _file_type(filename: str) -> str:
+    return os.path.splitext(filename)[1].lstrip(".").lower()
+
+
+def _audit_checks(info: SupervisionDocumentInfo, requirements: List[DocumentRequirement]) -> List[AuditCheck]:
+    """Формальные проверки предписания — без обращения к модели."""
+    with_basis = sum(1 for r in requirements if r.legal_basis)
+    return [
+        AuditCheck(id=1, check="Указаны номер и дата предписания", status="passed" if info.number and info.date else "warning"),
+        AuditCheck(id=2, check="Указан срок исполнения", status="passed" if info.deadline else "failed"),
+        AuditCheck(
+            id=3,
+            check="Требования содержат ссылки на нормы",
+            status="passed" if requirements and with_basis == len(requirements) else "warning",
+        ),
+    ]
+
+
+class SupervisionService:
+    def store(self, upload: StoredUpload) -> str:
+        """Переносит временный файл в хранилище под именем sha256; дубликат удаляется."""
+        path = os.path.join(settings.UPLOAD_DIR, f"{upload.sha256}.{_file_type(upload.filename) or 'bin'}")
+        if os.path.exists(path):
+            upload.discard()
+        else:
+            os.replace(upload.path, path)
+        return path
+
+    async def _analyze_text(self, text: str) -> tuple[SupervisionDocumentInfo, List[DocumentRequirement]]:
+        prompt = _ANALYSIS_PROMPT.format(text=trim_to_sentences(text, settings.SUPERVISION_PROMPT_MAX_TOKENS))
+        content = await llm_service.generate_response(prompt, llm_settings=_ANALYSIS_LLM_SETTINGS)
+        if content.startswith(DEEPSEEK_ERROR_PREFIX):
+            raise AnalysisFailed(content)
+        match = _JSON_RE.search(content)
+        try:
+            data = json.loads(match.group(0)) if match else {}
+            info = SupervisionDocumentInfo(**(data.get("document_info") or {}))
+            requirements = [
+                DocumentRequirement(**{**item, "id": str(i + 1)})
+                for i, item in enumerate(data.get("requirements") or [])
+            ]
+        except (AttributeError, TypeError, ValueError, ValidationError) as e:
+            raise AnalysisFailed(f"Не удалось разобрать ответ модели: {e}")
+        return info, requirements
+
+    async def analyze(
+        self, db: AsyncSession, upload: StoredUpload, organization_id: Optional[uuid.UUID] = None
+    ) -> SupervisionAnalysisResponse:
+        """
+        Анализ загруженного предписания. С organization_id документ и
+        результат сохраняются в documents, analysis_id — его id;
+        без неё analysis_id — sha256 файла.
+        """
+        file_type = _file_type(upload.filename)
+        if file_type not in SUPPORTED_TYPES:
+            await asyncio.to_thread(upload.discard)
+            raise UnsupportedDocument(f"Формат {file_type or 'без расширения'} не поддерживается (PDF, DOCX, TXT)")
+        path = await asyncio.to_thread(self.store, upload)
+        text = await text_extractor.extract(path, file_type, upload.sha256)
+        info, requirements = await self._analyze_text(text)
+        result = SupervisionAnalysisResponse(
+            analysis_id=upload.sha256,
+            requirements=requirements,
+            audit_checks=_audit_checks(info, requirements),
+            document_info=info,
+        )
+        if organization_id:
+            document = Document(
+                organization_id=organization_id,
+                filename=upload.filename,
+                file_type=file_type or None,
+                file_size=upload.size,
+                storage_path=path,
+            )
+            db.add(document)
+            await db.flush()
+            result.analysis_id = str(document.id)
+            document.analysis_result = result.model_dump_json()
+            await dashboard_service.record(db, organization_id, SUPERVISION_RESPONSES)
+            await db.commit()
+        return result
+
+
+supervision_service = SupervisionService()
@@ -0,0 +1,166 @@
+# ============================================================
+# Потоковый приём файлов multipart/form-data
+# ============================================================
+# UploadFile Starlette сначала целиком разбирает тело запроса (во
+# временный файл) и только потом отдаёт его обработчику — лимит размера
+# срабатывает после приёма всего тела. Здесь тело читается из
+# request.stream() блоками: файл сразу пишется в хранилище, попутно
+# считается sha256, а превышение MAX_UPLOAD_SIZE_MB обрывает приём.
+# ============================================================
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+# Текстовые поля формы (organization_id и т.п.) — короткие
+_FIELD_MAX_BYTES = 4096
+# Заголовки частей и границы сверх самого файла
+_ENVELOPE_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Файл больше лимита — приём прерван."""
+
+
+class InvalidUpload(Exception):
+    """Тело запроса не multipart/form-data или в нём нет файла."""
+
+
+@dataclass
+class StoredUpload:
+    path: str  # временный файл в каталоге загрузок
+    filename: str
+    size: int
+    sha256: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _FormReceiver:
+    """Колбэки MultipartParser: синхронные, данные файла копятся до записи на диск."""
+
+    def __init__(self, file_field: str):
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.file_done = False
+        self.pending: List[bytes] = []
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[bytes, bytes] = {}
+        self._name: Optional[str] = None
+        self._is_file = False
+        self._value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.extend(data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._is_file = False
+        self._value = bytearray()
+
+    def on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        # Берётся первый файл с нужным именем поля, остальные игнорируются
+        self._is_file = self._name == self.file_field and filename is not None and self.filename is None
+        if self._is_file:
+            self.filename = os.path.basename(filename.decode("utf-8", errors="replace")) or "document"
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        if self._is_file:
+            self.size += len(chunk)
+            self.digest.update(chunk)
+            self.pending.append(chunk)
+        elif self._name and len(self._value) + len(chunk) <= _FIELD_MAX_BYTES:
+            self._value.extend(chunk)
+
+    def on_part_end(self) -> None:
+        if self._is_file:
+            self.file_done = True
+        elif self._name:
+            self.fields[self._name] = self._value.decode("utf-8", errors="replace")
+
+
+async def receive_upload(request: Request, directory: str, max_bytes: int, file_field: str = "file") -> StoredUpload:
+    """
+    Принимает multipart-запрос с одним файлом в directory (временное имя).
+    UploadTooLarge — файл больше max_bytes; временный файл уже удалён.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Ожидается multipart/form-data")
+    # Заявленная длина заведомо больше лимита — отказ до чтения тела
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + _ENVELOPE_BYTES:
+        raise UploadTooLarge()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.part")
+    receiver = _FormReceiver(file_field)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    received = 0
+    handle = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for block in request.stream():
+            received += len(block)
+            parser.write(block)
+            if receiver.size > max_bytes or received > max_bytes + _ENVELOPE_BYTES:
+                raise UploadTooLarge()
+            if receiver.pending:
+                data = b"".join(receiver.pending)
+                receiver.pending.clear()
+                await asyncio.to_thread(handle.write, data)
+        parser.finalize()
+        if not receiver.file_done:
+            raise InvalidUpload(f"В запросе нет файла в поле «{file_field}»")
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(_remove, path)
+        raise
+    await asyncio.to_thread(handle.close)
+    return StoredUpload(
+        path=path,
+        filename=receiver.filename or "document",
+        size=receiver.size,
+        sha256=receiver.digest.hexdigest(),
+        fields=receiver.fields,
+    )
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
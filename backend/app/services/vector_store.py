@@ -0,0 +1,567 @@
+# ============================================================
+# Хранилища векторов фрагментов — подключаемые бэкенды поиска
+# ============================================================
+# Бэкенд выбирается через VECTOR_STORE:
+#   pgvector — document_chunks в PostgreSQL (rag.PgVectorStore): ANN-индекс,
+#              гибридный поиск с полнотекстовым;
+#   numpy    — матрица эмбеддингов в файле, отображённом в память
+#              (np.memmap), поиск — умножение на запрос и argpartition
+#              в процессе, без обращения к БД (пакет numpy).
+# numpy-хранилище рассчитано на небольшие инсталляции ТСЖ и тесты:
+# на каждый запрос просматривается вся матрица (точный поиск).
+# Файлы только дописываются: удаление — флаг в deleted.bin, место
+# возвращает compact(). Другие процессы (воркеры uvicorn) подхватывают
+# дописанные строки по размеру chunks.jsonl, удаления — через общий mmap.
+# compact() пишет новое поколение файлов в отдельный каталог и
+# переключается на него одной атомарной заменой файла CURRENT.
+# ============================================================
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional
+
+_PUBLIC = -1  # код организации для общего корпуса
+_BLOCK_ROWS = 65536  # строк матрицы на одно умножение: ограничивает временную память для float16
+_DTYPES = ("float32", "float16")
+_DATA_FILES = ("embeddings.bin", "deleted.bin", "chunks.jsonl")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetrievedChunk:
+    """Лёгкая строка результата поиска — без ORM-объектов и ленивых связей."""
+    id: uuid.UUID
+    document_id: uuid.UUID
+    content: str
+    meta_info: Optional[str]
+    filename: str
+    distance: float  # косинусное расстояние (pgvector <=>)
+
+    @property
+    def similarity(self) -> float:
+        return 1.0 - self.distance
+
+
+@dataclass
+class StoredChunk:
+    """Фрагмент для записи в хранилище (поля document_chunks плюс имя документа)."""
+    id: uuid.UUID
+    document_id: uuid.UUID
+    organization_id: Optional[uuid.UUID]  # None — общий корпус
+    chunk_index: int
+    content: str
+    meta_info: Optional[str]
+    filename: str
+    embedding: List[float]
+
+
+class VectorStore(ABC):
+    """Базовый класс хранилища. db — сессия запроса; бэкендам вне БД не нужна."""
+
+    name: str
+    # Фрагменты лежат в document_chunks: их пишет ingestion (COPY), доступен гибридный поиск
+    uses_document_chunks: bool = False
+
+    @abstractmethod
+    async def search(
+        self,
+        db,
+        vectors: List[List[float]],
+        limit: int,
+        organization_id: Optional[uuid.UUID] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """top-limit для каждого вектора (в порядке vectors): общий корпус плюс фрагменты организации."""
+
+    def stats(self) -> dict:
+        """Вызывается из /health на event loop — без ввода-вывода и блокировок."""
+        return {"backend": self.name}
+
+
+class WritableVectorStore(VectorStore):
+    """
+    Хранилище со своими файлами фрагментов (uses_document_chunks = False):
+    ingestion пишет в него через add, а не в document_chunks.
+    """
+
+    @abstractmethod
+    async def add(self, chunks: List[StoredChunk]) -> int:
+        """Записывает фрагменты; возвращает их число."""
+
+    @abstractmethod
+    async def delete_document(self, document_id: uuid.UUID) -> int:
+        """Удаляет фрагменты документа; возвращает их число."""
+
+    @abstractmethod
+    async def last_chunk_index(self, document_id: uuid.UUID) -> int:
+        """Наибольший записанный chunk_index документа (-1 — нет) для возобновления загрузки."""
+
+
+class _Row(NamedTuple):
+    id: uuid.UUID
+    document_id: uuid.UUID
+    organization_id: Optional[uuid.UUID]
+    chunk_index: int
+    content: str
+    meta_info: Optional[str]
+    filename: str
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Согласованное состояние для поиска: count строк матрицы, флагов и кодов организаций."""
+    count: int
+    matrix: object  # np.memmap (count, dim)
+    deleted: object  # np.memmap (count,) uint8, общий с другими процессами
+    org_codes: object  # np.ndarray (count,) int32
+
+
+class NumpyVectorStore(WritableVectorStore):
+    """
+    Файлы каталога:
+      meta.json     — размерность и тип матрицы;
+      CURRENT       — имя каталога текущего поколения (gen-NNNNNN); без него
+                      файлы данных лежат в самом каталоге (до первого compact);
+    Файлы поколения:
+      embeddings.bin — строки float32/float16, L2-нормированные (косинус = скалярное произведение);
+      deleted.bin   — байт-флаг удаления на строку;
+      chunks.jsonl  — метаданные строк; пишется последним и задаёт число строк.
+    """
+
+    name = "numpy"
+
+    def __init__(self, directory: str, dimension: int, dtype: str = "float32"):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Неизвестный VECTOR_STORE_DTYPE: {dtype} ({' | '.join(_DTYPES)})")
+        self.directory = directory
+        self.dimension = dimension
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._opened = False
+        self._generation: Optional[str] = None  # "" — файлы в корне каталога
+        self._offset = 0  # прочитано байт chunks.jsonl
+        self._loaded = 0  # строк chunks.jsonl на момент построения _snapshot
+        self._rows: List[_Row] = []
+        self._codes: List[int] = []
+        self._organizations: Dict[uuid.UUID, int] = {}
+        self._snapshot: Optional[_Snapshot] = None
+        # Удалённые строки на момент последней синхронизации — для stats()
+        self._deleted_rows = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _data_path(self, name: str) -> str:
+        """Файл данных текущего поколения."""
+        return os.path.join(self.directory, self._generation or "", name)
+
+    def _current_generation(self) -> str:
+        try:
+            with open(self._path("CURRENT"), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dimension * (4 if self.dtype == "float32" else 2)
+
+    def _open(self) -> None:
+        if self._opened:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path("meta.json")
+        expected = {"dimension": self.dimension, "dtype": self.dtype}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta != expected:
+                raise ValueError(
+                    f"Хранилище {self.directory} создано для {meta}, настройки — {expected}: "
+                    "пересоздайте его (scripts/vector_store.py export)"
+                )
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(expected, f)
+        self._opened = True
+
+    @contextmanager
+    def _file_lock(self):
+        """Межпроцессная блокировка записи (flock)."""
+        import fcntl
+
+        self._open()
+        with open(self._path(".lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _code(self, organization_id: Optional[uuid.UUID]) -> int:
+        if organization_id is None:
+            return _PUBLIC
+        return self._organizations.setdefault(organization_id, len(self._organizations))
+
+    def _sync(self) -> None:
+        """Подхватывает строки, дописанные этим или другим процессом (вызывается под _lock)."""
+        import numpy as np
+
+        self._open()
+        generation = self._current_generation()
+        if generation != self._generation:
+            # Другое поколение (compact) — перечитываем целиком
+            self._generation = generation
+            self._reset()
+        try:
+            size = os.path.getsize(self._data_path("chunks.jsonl"))
+        except FileNotFoundError:
+            size = 0
+        if size < self._offset:
+            # chunks.jsonl укорочен (_repair) — перечитываем целиком
+            self._reset()
+        if size > self._offset:
+            with open(self._data_path("chunks.jsonl"), "rb") as f:
+                f.seek(self._offset)
+                data = f.read(size - self._offset)
+            # Незаконченная строка (запись идёт прямо сейчас) дочитается в следующий раз
+            data = data[: data.rfind(b"\n") + 1]
+            for line in data.splitlines():
+                item = json.loads(line)
+                organization_id = uuid.UUID(item["organization_id"]) if item["organization_id"] else None
+                self._rows.append(
+                    _Row(
+                        id=uuid.UUID(item["id"]),
+                        document_id=uuid.UUID(item["document_id"]),
+                        organization_id=organization_id,
+                        chunk_index=item["chunk_index"],
+                        content=item["content"],
+                        meta_info=item["meta_info"],
+                        filename=item["filename"],
+                    )
+                )
+                self._codes.append(self._code(organization_id))
+            self._offset += len(data)
+
+        count = len(self._rows)
+        if self._snapshot is not None and self._loaded == count:
+            return
+        self._loaded = count
+        backed = self._backed_rows()
+        if backed < count:
+            # Метаданные без векторов (сбой или ручная правка): такие строки не
+            # показываются, а ближайшая запись их отбрасывает (_repair)
+            logger.warning(
+                "Хранилище %s: строк в chunks.jsonl %d, векторов %d — лишние строки пропущены",
+                self.directory, count, backed,
+            )
+            count = backed
+        if count:
+            matrix = np.memmap(self._data_path("embeddings.bin"), dtype=self.dtype, mode="r", shape=(count, self.dimension))
+            deleted = np.memmap(self._data_path("deleted.bin"), dtype=np.uint8, mode="r+", shape=(count,))
+        else:
+            matrix = np.empty((0, self.dimension), dtype=self.dtype)
+            deleted = np.empty(0, dtype=np.uint8)
+        self._snapshot = _Snapshot(count, matrix, deleted, np.asarray(self._codes[:count], dtype=np.int32))
+        self._deleted_rows = int(np.count_nonzero(deleted))
+
+    def _reset(self) -> None:
+        self._offset = 0
+        self._rows, self._codes = [], []
+        self._snapshot = None
+
+    def _backed_rows(self) -> int:
+        """Сколько строк целиком есть и в embeddings.bin, и в deleted.bin."""
+        try:
+            return min(
+                os.path.getsize(self._data_path("embeddings.bin")) // self._row_bytes,
+                os.path.getsize(self._data_path("deleted.bin")),
+            )
+        except FileNotFoundError:
+            return 0
+
+    def _repair(self) -> None:
+        """
+        Отбрасывает строки chunks.jsonl без векторов (вызывается под _lock и
+        flock после _sync): иначе следующие добавления сдвинули бы соответствие
+        строк метаданных и матрицы.
+        """
+        count = self._snapshot.count
+        if count == len(self._rows):
+            return
+        with open(self._data_path("chunks.jsonl"), "rb") as f:
+            size = sum(len(line) for _, line in zip(range(count), f))
+        _truncate(self._data_path("chunks.jsonl"), size)
+        self._sync()
+
+    # --- Поиск ---
+
+    def _scores(self, matrix, queries):
+        """Косинусная близость (count, len(queries)) поблочно: float16 не копируется целиком."""
+        import numpy as np
+
+        scores = np.empty((matrix.shape[0], queries.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ queries.T
+        return scores
+
+    def _search_sync(
+        self, vectors: List[List[float]], limit: int, organization_id: Optional[uuid.UUID]
+    ) -> List[List[RetrievedChunk]]:
+        import numpy as np
+
+        with self._lock:
+            self._sync()
+            snapshot = self._snapshot
+            rows = self._rows
+            code = self._organizations.get(organization_id) if organization_id is not None else None
+        results: List[List[RetrievedChunk]] = [[] for _ in vectors]
+        if not snapshot.count or limit <= 0:
+            return results
+
+        live = np.asarray(snapshot.deleted) == 0
+        # Флаги общие с другими процессами — заодно обновляем счётчик для stats()
+        self._deleted_rows = snapshot.count - int(live.sum())
+        allowed = snapshot.org_codes == _PUBLIC
+        if code is not None:
+            allowed |= snapshot.org_codes == code
+        allowed &= live
+        k = min(limit, int(allowed.sum()))
+        if not k:
+            return results
+
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        scores = self._scores(snapshot.matrix, queries)
+        scores[~allowed] = -np.inf
+        # argpartition — O(n) отбор top-k без полной сортировки; сортируются только k строк
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        for j in range(len(vectors)):
+            column = top[:, j]
+            for i in column[np.argsort(-scores[column, j], kind="stable")]:
+                row = rows[i]
+                results[j].append(
+                    RetrievedChunk(
+                        id=row.id,
+                        document_id=row.document_id,
+                        content=row.content,
+                        meta_info=row.meta_info,
+                        filename=row.filename,
+                        distance=1.0 - float(scores[i, j]),
+                    )
+                )
+        return results
+
+    async def search(
+        self,
+        db,
+        vectors: List[List[float]],
+        limit: int,
+        organization_id: Optional[uuid.UUID] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """Точный поиск; ef_search / probes не применяются."""
+        if not vectors:
+            return []
+        return await asyncio.to_thread(self._search_sync, vectors, limit, organization_id)
+
+    # --- Запись ---
+
+    def _add_sync(self, chunks: List[StoredChunk]) -> int:
+        import numpy as np
+
+        matrix = np.asarray([c.embedding for c in chunks], dtype=np.float32)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Размерность эмбеддингов {matrix.shape[1]} не совпадает с хранилищем ({self.dimension})")
+        lines = "".join(
+            json.dumps(
+                {
+                    "id": str(c.id),
+                    "document_id": str(c.document_id),
+                    "organization_id": str(c.organization_id) if c.organization_id else None,
+                    "chunk_index": c.chunk_index,
+                    "content": c.content,
+                    "meta_info": c.meta_info,
+                    "filename": c.filename,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+            for c in chunks
+        )
+        with self._lock, self._file_lock():
+            self._sync()
+            self._repair()
+            count = len(self._rows)
+            # Хвост матрицы без строки метаданных (сбой посреди записи) отбрасывается
+            if self._generation:
+                os.makedirs(self._path(self._generation), exist_ok=True)
+            _truncate(self._data_path("embeddings.bin"), count * self._row_bytes)
+            _truncate(self._data_path("deleted.bin"), count)
+            with open(self._data_path("embeddings.bin"), "ab") as f:
+                f.write(_normalize(matrix).astype(self.dtype).tobytes())
+            with open(self._data_path("deleted.bin"), "ab") as f:
+                f.write(bytes(len(chunks)))
+            # Метаданные — последними: по ним читатели считают строки
+            with open(self._data_path("chunks.jsonl"), "ab") as f:
+                f.write(lines.encode("utf-8"))
+            self._sync()
+        return len(chunks)
+
+    async def add(self, chunks: List[StoredChunk]) -> int:
+        """Дописывает фрагменты в конец файлов; существующие строки не переписываются."""
+        if not chunks:
+            return 0
+        return await asyncio.to_thread(self._add_sync, chunks)
+
+    def _delete_sync(self, document_id: uuid.UUID) -> int:
+        with self._lock, self._file_lock():
+            self._sync()
+            deleted = self._snapshot.deleted
+            rows = [
+                i for i, row in enumerate(self._rows[:self._snapshot.count])
+                if row.document_id == document_id and not deleted[i]
+            ]
+            if rows:
+                deleted[rows] = 1
+                deleted.flush()
+                self._deleted_rows += len(rows)
+        return len(rows)
+
+    async def delete_document(self, document_id: uuid.UUID) -> int:
+        """Помечает фрагменты документа удалёнными (флаг в deleted.bin, без перезаписи матрицы)."""
+        return await asyncio.to_thread(self._delete_sync, document_id)
+
+    def _last_chunk_index_sync(self, document_id: uuid.UUID) -> int:
+        with self._lock:
+            self._sync()
+            deleted = self._snapshot.deleted
+            return max(
+                (
+                    row.chunk_index for i, row in enumerate(self._rows[:self._snapshot.count])
+                    if row.document_id == document_id and not deleted[i]
+                ),
+                default=-1,
+            )
+
+    async def last_chunk_index(self, document_id: uuid.UUID) -> int:
+        return await asyncio.to_thread(self._last_chunk_index_sync, document_id)
+
+    def _compact_sync(self) -> int:
+        import numpy as np
+
+        with self._lock, self._file_lock():
+            self._sync()
+            snapshot = self._snapshot
+            keep = np.flatnonzero(np.asarray(snapshot.deleted) == 0)
+            removed = snapshot.count - len(keep)
+            if not removed:
+                return 0
+            previous = self._generation
+            number = int(previous.rsplit("-", 1)[1]) + 1 if previous else 1
+            generation = f"gen-{number:06d}"
+            target = self._path(generation)
+            # Остаток прерванного compact с тем же номером
+            shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(target)
+            with open(self._data_path("chunks.jsonl"), "rb") as f:
+                lines = f.read(self._offset).splitlines(keepends=True)
+            with open(os.path.join(target, "embeddings.bin"), "wb") as f:
+                for start in range(0, len(keep), _BLOCK_ROWS):
+                    f.write(np.asarray(snapshot.matrix[keep[start:start + _BLOCK_ROWS]]).tobytes())
+                _fsync(f)
+            with open(os.path.join(target, "deleted.bin"), "wb") as f:
+                f.write(bytes(len(keep)))
+                _fsync(f)
+            with open(os.path.join(target, "chunks.jsonl"), "wb") as f:
+                f.writelines(lines[i] for i in keep)
+                _fsync(f)
+            # Переключение — одна атомарная замена CURRENT: после сбоя читатели
+            # видят либо старое поколение целиком, либо новое
+            with open(self._path("CURRENT.tmp"), "w", encoding="utf-8") as f:
+                f.write(generation)
+                _fsync(f)
+            os.replace(self._path("CURRENT.tmp"), self._path("CURRENT"))
+            _fsync_directory(self.directory)
+            self._sync()
+            self._remove_generations(keep={generation, previous})
+        return removed
+
+    def _remove_generations(self, keep: set) -> None:
+        """
+        Удаляет старые поколения. Предыдущее остаётся: процесс, прочитавший
+        CURRENT до переключения, ещё может открывать его файлы.
+        """
+        for entry in os.listdir(self.directory):
+            if entry.startswith("gen-") and entry not in keep:
+                shutil.rmtree(self._path(entry), ignore_errors=True)
+        if "" not in keep:
+            for name in _DATA_FILES:
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+    async def compact(self) -> int:
+        """Переписывает файлы без удалённых строк; возвращает число удалённых."""
+        return await asyncio.to_thread(self._compact_sync)
+
+    def _refresh_sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    async def refresh(self) -> None:
+        """Подхватывает изменения на диске (для скриптов перед stats)."""
+        await asyncio.to_thread(self._refresh_sync)
+
+    def stats(self) -> dict:
+        """
+        Счётчики на момент последней синхронизации (поиск, запись): без
+        чтения файлов и без _lock, который запись держит, ожидая flock.
+        """
+        snapshot = self._snapshot
+        rows = snapshot.count if snapshot is not None else 0
+        return {
+            "backend": self.name,
+            "dtype": self.dtype,
+            "rows": rows,
+            "deleted": self._deleted_rows if rows else 0,
+            "bytes": rows * self._row_bytes,
+        }
+
+
+def _normalize(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _fsync(handle) -> None:
+    handle.flush()
+    os.fsync(handle.fileno())
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _truncate(path: str, size: int) -> None:
+    with open(path, "ab") as f:
+        if f.tell() > size:
+            f.truncate(size)
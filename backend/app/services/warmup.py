@@ -0,0 +1,139 @@
+# ============================================================
+# Прогрев при старте и готовность к трафику (/ready)
+# ============================================================
+# Первые запросы после деплоя или масштабирования платили бы за
+# подключение к БД, TLS-рукопожатие с DeepSeek, загрузку модели
+# эмбеддингов и первый план pgvector-запроса. Прогрев делает это заранее
+# в фоновой задаче lifespan: /health (liveness) отвечает сразу, а /ready
+# становится 200 только после успешного прогрева. Обязательные шаги
+# (БД, эмбеддинги, ПДн, пробный поиск) повторяются до успеха; DeepSeek —
+# необязательный: его недоступность не держит реплику вне балансировки.
+# ============================================================
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from ..config import settings
+from ..database import async_session, engine
+from .deepseek_client import deepseek_client
+from .embeddings import embedding_service
+from .pii import pii_engine
+from .rag import rag_service
+
+logger = logging.getLogger(__name__)
+
+_PROBE_QUERY = "Порядок перерасчёта платы за отопление, ИНН 7701234567, тел. +7 916 123-45-67"
+
+
+class WarmupService:
+    def __init__(self):
+        self.ready = not settings.WARMUP_ENABLED
+        self.attempts = 0
+        self.steps: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if settings.WARMUP_ENABLED and self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self.attempts += 1
+            if await self.warmup():
+                self.ready = True
+                self.seconds = round(time.monotonic() - self.started_at, 3)
+                logger.info("Прогрев завершён за %.2f с", self.seconds)
+                return
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+    async def _step(self, name: str, fn: Callable[[], Awaitable[object]]) -> bool:
+        started = time.perf_counter()
+        try:
+            detail = await fn()
+        except Exception as e:
+            logger.warning("Прогрев: шаг %s не выполнен: %s", name, e)
+            self.steps[name] = {"ok": False, "error": str(e)}
+            return False
+        self.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - started, 3)}
+        if detail is not None:
+            self.steps[name]["detail"] = detail
+        return True
+
+    async def warmup(self) -> bool:
+        """Один проход прогрева; True — все обязательные шаги выполнены."""
+        # Независимые шаги — параллельно: общее время — самый долгий из них
+        db_ok, embeddings_ok, pii_ok, _ = await asyncio.gather(
+            self._step("db_pool", self._warm_db_pool),
+            self._step("embeddings", self._warm_embeddings),
+            self._step("pii", self._warm_pii),
+            self._step("deepseek", self._warm_deepseek),
+        )
+        if not (db_ok and embeddings_ok and pii_ok):
+            return False
+        # Пробный поиск — после БД и модели: план pgvector-запроса и кэш страниц индекса
+        return await self._step("retrieval", self._warm_retrieval)
+
+    async def _warm_db_pool(self) -> int:
+        """WARMUP_DB_CONNECTIONS соединений открываются одновременно и остаются в пуле."""
+        count = min(settings.WARMUP_DB_CONNECTIONS, engine.pool.size())
+        opened = 0
+        hold = asyncio.Event()
+
+        async def open_one() -> None:
+            nonlocal opened
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                opened += 1
+                # Удерживаем, пока не откроются все, — иначе пул отдал бы одно и то же соединение
+                await hold.wait()
+
+        tasks = [asyncio.create_task(open_one()) for _ in range(count)]
+        try:
+            while opened < count and not any(t.done() for t in tasks):
+                await asyncio.sleep(0.01)
+        finally:
+            hold.set()
+            await asyncio.gather(*tasks)
+        return engine.pool.checkedin()
+
+    async def _warm_embeddings(self) -> int:
+        await embedding_service.load()
+        return len(await embedding_service.embed_queries([_PROBE_QUERY]))
+
+    async def _warm_pii(self) -> int:
+        return len(pii_engine.mask(_PROBE_QUERY).mappings)
+
+    async def _warm_deepseek(self) -> Optional[int]:
+        if not settings.DEEPSEEK_API_KEY:
+            return None
+        return await deepseek_client.warmup(settings.DEEPSEEK_API_KEY)
+
+    async def _warm_retrieval(self) -> int:
+        async with async_session() as db:
+            chunks = await rag_service.find_relevant_chunks(db, _PROBE_QUERY, limit=1)
+        return len(chunks)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.WARMUP_ENABLED,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "seconds": self.seconds,
+            "steps": self.steps,
+        }
+
+
+warmup_service = WarmupService()
@@ -0,0 +1,122 @@
+"""
+Бенчмарк ANN-индекса document_chunks: recall@k относительно точного поиска
+и задержки p50/p99 для разных значений hnsw.ef_search (ivfflat.probes).
+--quantization сравнивает представления векторов в индексе: поиск по
+компактному индексу с запасом кандидатов и точный пересчёт, как в
+RAGService (индексы режимов строит scripts/vector_quantization.py).
+
+Пример:
+    python scripts/bench_ann.py --queries 200 --k 5 --params 10,20,40,80,160
+    python scripts/bench_ann.py --k 5 --params 40,80 --quantization none,halfvec,bit
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import func, select, text
+
+from app.config import settings
+from app.database import async_session, engine
+from app.models.models import DocumentChunk
+from app.services.quantization import QUANTIZATIONS, oversample, public_index_name, search_distance
+from app.services.rag import apply_search_params, rag_service
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def top_k_ids(
+    query_vector: List[float], k: int, exact: bool, param: int = 0, quantization: str = "none"
+) -> List:
+    public = DocumentChunk.organization_id.is_(None)  # общий корпус — частичный ANN-индекс
+    distance = DocumentChunk.embedding.cosine_distance(query_vector)
+    async with async_session() as db:
+        if exact:
+            # Отключаем индекс — последовательное сканирование даёт точный ответ
+            await db.execute(text("SET LOCAL enable_indexscan = off"))
+            stmt = select(DocumentChunk.id).where(public).order_by(distance).limit(k)
+        else:
+            candidates = k * oversample(quantization)
+            await apply_search_params(db, candidates, ef_search=param, probes=param)
+            nearest = (
+                select(DocumentChunk.id, distance.label("distance"))
+                .where(public)
+                .order_by(search_distance(query_vector, quantization))
+                .limit(candidates)
+                .subquery("nearest")
+            )
+            # Точный пересчёт кандидатов компактного индекса
+            stmt = select(nearest.c.id).order_by(nearest.c.distance).limit(k)
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="recall@k и задержки ANN-индекса")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--params", default="10,20,40,80,160", help="значения ef_search (или probes для ivfflat)")
+    parser.add_argument("--quantization", default=settings.VECTOR_QUANTIZATION, help="режимы через запятую: none,halfvec,bit")
+    args = parser.parse_args()
+    params = [int(p) for p in args.params.split(",")]
+    modes = args.quantization.split(",")
+    unknown = [m for m in modes if m not in QUANTIZATIONS]
+    if unknown:
+        parser.error(f"неизвестные режимы: {', '.join(unknown)}")
+
+    try:
+        async with async_session() as db:
+            public = DocumentChunk.organization_id.is_(None)
+            total = await db.scalar(select(func.count()).select_from(DocumentChunk).where(public))
+            sample = await db.execute(
+                select(DocumentChunk.content).where(public).order_by(func.random()).limit(args.queries)
+            )
+            # Запросы — начала случайных фрагментов корпуса
+            queries = [content[:200] for content in sample.scalars().all()]
+
+        vectors = [await rag_service.get_embeddings(q) for q in queries]
+        print(f"Фрагментов: {total}, запросов: {len(vectors)}, k={args.k}, индекс: {settings.VECTOR_INDEX_TYPE}")
+
+        exact_ids, exact_times = [], []
+        for vector in vectors:
+            started = time.perf_counter()
+            exact_ids.append(set(await top_k_ids(vector, args.k, exact=True)))
+            exact_times.append((time.perf_counter() - started) * 1000)
+        print(f"{'exact':>10} recall=1.000 p50={percentile(exact_times, 0.5):.1f}ms p99={percentile(exact_times, 0.99):.1f}ms")
+
+        name = "probes" if settings.VECTOR_INDEX_TYPE == "ivfflat" else "ef_search"
+        for mode in modes:
+            async with engine.connect() as conn:
+                size = await conn.scalar(
+                    text("SELECT pg_size_pretty(pg_relation_size(to_regclass(:name)))"),
+                    {"name": public_index_name(mode)},
+                )
+            if size is None:
+                print(f"{mode}: индекс {public_index_name(mode)} не найден, поиск без него был бы полным перебором")
+                continue
+            print(f"{mode}: индекс {size}, кандидатов на запрос {args.k * oversample(mode)}")
+            for param in params:
+                recalls, times = [], []
+                for vector, expected in zip(vectors, exact_ids):
+                    started = time.perf_counter()
+                    found = await top_k_ids(vector, args.k, exact=False, param=param, quantization=mode)
+                    times.append((time.perf_counter() - started) * 1000)
+                    recalls.append(len(expected & set(found)) / max(len(expected), 1))
+                print(
+                    f"{mode:>8} {name}={param:<4} recall={sum(recalls) / len(recalls):.3f} "
+                    f"p50={percentile(times, 0.5):.1f}ms p99={percentile(times, 0.99):.1f}ms"
+                )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
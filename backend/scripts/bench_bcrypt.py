@@ -0,0 +1,79 @@
+"""
+Задержка event loop во время «шторма входов»: N одновременных проверок
+пароля bcrypt синхронным verify_password (как в async-обработчике без
+выноса в пул) против verify_password_async.
+
+Пока идут проверки, фоновая задача каждые --tick-ms просыпается и меряет
+опоздание — столько же ждали бы все остальные запросы воркера.
+
+Пример:
+    python scripts/bench_bcrypt.py --logins 32 --rounds 12
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def measure(name, login, logins, tick):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - started - tick) * 1000)
+
+    probe = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+
+    print(
+        f"{name:<8} logins={logins:<4} total={elapsed:6.2f}s  logins/s={logins / elapsed:6.1f}  "
+        f"loop lag p50={percentile(lags, 0.5):7.1f}ms p99={percentile(lags, 0.99):7.1f}ms "
+        f"max={max(lags or [0]):7.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержка event loop при проверке паролей bcrypt")
+    parser.add_argument("--logins", type=int, default=32, help="одновременных входов")
+    parser.add_argument("--rounds", type=int, default=12, help="PASSWORD_BCRYPT_ROUNDS")
+    parser.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    os.environ["PASSWORD_BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    from app.security import hash_password, verify_password, verify_password_async
+
+    hashed = hash_password("Correct-Horse-1")
+    tick = args.tick_ms / 1000
+
+    async def sync_login():
+        # Так выглядит вызов синхронной функции из async def
+        verify_password("Correct-Horse-1", hashed)
+
+    async def async_login():
+        await verify_password_async("Correct-Horse-1", hashed)
+
+    await measure("sync", sync_login, args.logins, tick)
+    await measure("async", async_login, args.logins, tick)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
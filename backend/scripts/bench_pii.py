@@ -0,0 +1,63 @@
+"""
+Микробенчмарк маскирования ПДн: однопроходный PIIEngine (8 детекторов)
+против прежней реализации (два re.sub — только телефоны и email).
+
+Пример:
+    python scripts/bench_pii.py --chars 50000 --repeat 200
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.pii import pii_engine
+
+SAMPLE = (
+    "Здравствуйте, я Иванов Иван Иванович, проживаю по адресу ул. Ленина, д. 5, кв. 12. "
+    "Прошу сделать перерасчёт за отопление по лицевому счёту № 00123456. "
+    "Телефон +7 (912) 345-67-89, почта ivanov@mail.ru. СНИЛС 123-456-789 01. "
+    "Согласно ст. 157 ЖК РФ и п. 42 Правил № 354 плата рассчитывается по показаниям прибора учёта. "
+)
+
+
+def legacy_mask(text: str) -> str:
+    text = re.sub(r'(\+7|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}', '[PHONE_HIDDEN]', text)
+    text = re.sub(r'[\w\.-]+@[\w\.-]+\.\w+', '[EMAIL_HIDDEN]', text)
+    return text
+
+
+def bench(name: str, fn, text: str, repeat: int) -> None:
+    fn(text)  # прогрев
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    mb_per_s = len(text.encode("utf-8")) / (sum(timings) / len(timings)) / 1e6
+    print(f"{name:<22} p50={p50:7.3f}ms p99={p99:7.3f}ms {mb_per_s:6.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк маскирования ПДн")
+    parser.add_argument("--chars", type=int, default=50000, help="длина текста (лимит схемы — 50 000)")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    text = (SAMPLE * (args.chars // len(SAMPLE) + 1))[:args.chars]
+    result = pii_engine.mask(text)
+    print(f"Текст: {len(text)} символов, найдено значений ПДн: {len(result.mappings)}")
+
+    bench("legacy (2x re.sub)", legacy_mask, text, args.repeat)
+    bench("PIIEngine.mask", pii_engine.mask, text, args.repeat)
+    bench("PIIEngine.unmask", lambda t: pii_engine.unmask(t, result.mappings), result.masked_text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
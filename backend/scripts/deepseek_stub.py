@@ -0,0 +1,152 @@
+"""
+Локальная заглушка DeepSeek/OpenAI API для нагрузочного тестирования.
+
+Поддерживает POST /chat/completions (обычный и stream=True ответ),
+настраиваемую задержку, скорость выдачи токенов и доли ошибок 429/5xx.
+
+Пример:
+    python scripts/deepseek_stub.py --port 9100 --latency-ms 800 --tokens 200 --tokens-per-second 50 --error-rate-429 0.02
+    RATE_LIMIT_ENABLED=false DEEPSEEK_API_BASE=http://127.0.0.1:9100 DEEPSEEK_API_KEY=stub uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKEN_TEXT = "Согласно статье 155 Жилищного кодекса плата вносится ежемесячно до десятого числа. "
+
+
+class StubConfig:
+    latency_ms: float = 500.0
+    jitter_ms: float = 100.0
+    tokens: int = 100
+    tokens_per_second: float = 0.0  # 0 — без ограничения скорости
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    retry_after: int = 1
+
+
+config = StubConfig()
+app = FastAPI(title="DeepSeek stub")
+
+
+def _tokens(count: int) -> list:
+    words = TOKEN_TEXT.split(" ")
+    return [words[i % len(words)] + " " for i in range(count)]
+
+
+def _injected_error():
+    roll = random.random()
+    if roll < config.error_rate_429:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after)},
+        )
+    if roll < config.error_rate_429 + config.error_rate_5xx:
+        return JSONResponse(
+            {"error": {"message": "Service unavailable", "type": "server_error"}},
+            status_code=random.choice([500, 502, 503]),
+        )
+    return None
+
+
+def _usage(prompt: str) -> dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": config.tokens,
+        "total_tokens": prompt_tokens + config.tokens,
+    }
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    latency = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(latency)
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "deepseek-chat")
+    prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+    max_tokens = body.get("max_tokens")
+    tokens = _tokens(min(config.tokens, max_tokens) if max_tokens else config.tokens)
+
+    if not body.get("stream"):
+        if config.tokens_per_second:
+            await asyncio.sleep(len(tokens) / config.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}
+            ],
+            "usage": _usage(prompt),
+        }
+
+    async def events():
+        delay = 1 / config.tokens_per_second if config.tokens_per_second else 0
+        for token in tokens:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if delay:
+                await asyncio.sleep(delay)
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": _usage(prompt),
+        }
+        yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заглушка DeepSeek API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="задержка до первого токена")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--tokens", type=int, default=config.tokens, help="токенов в ответе")
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    parser.add_argument("--error-rate-429", type=float, default=config.error_rate_429)
+    parser.add_argument("--error-rate-5xx", type=float, default=config.error_rate_5xx)
+    parser.add_argument("--retry-after", type=int, default=config.retry_after)
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.tokens = args.tokens
+    config.tokens_per_second = args.tokens_per_second
+    config.error_rate_429 = args.error_rate_429
+    config.error_rate_5xx = args.error_rate_5xx
+    config.retry_after = args.retry_after
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Загрузка нормативных документов в базу знаний RAG.
+
+Пример:
+    python scripts/ingest.py data/zhk_rf.txt --organization-id 550e8400-e29b-41d4-a716-446655440000 --label "ЖК РФ" --public
+
+Повторный запуск с тем же файлом продолжает загрузку с места остановки;
+изменённый файл загружается заново.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.database import async_session, engine
+from app.services.ingestion import file_sha256, ingestion_service, iter_file
+
+
+async def ingest_path(path: str, organization_id: uuid.UUID, label: str, is_public: bool) -> None:
+    async with async_session() as db:
+        document = await ingestion_service.get_or_create_document(
+            db,
+            organization_id=organization_id,
+            filename=os.path.basename(path),
+            file_size=os.path.getsize(path),
+            storage_path=os.path.abspath(path),
+            is_public=is_public,
+            content_hash=await file_sha256(path),
+        )
+    result = await ingestion_service.ingest(document.id, iter_file(path), source_label=label)
+    rate = result.chunks_written / result.seconds if result.seconds else 0.0
+    print(
+        f"{path}: документ {result.document_id}, записано {result.chunks_written}, "
+        f"пропущено {result.chunks_skipped} за {result.seconds:.1f} с ({rate:.0f} фрагм./с)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Загрузка документов в document_chunks")
+    parser.add_argument("paths", nargs="+", help="текстовые файлы (UTF-8)")
+    parser.add_argument("--organization-id", type=uuid.UUID, required=True)
+    parser.add_argument("--label", default="", help='источник для ссылок, например "ЖК РФ"')
+    parser.add_argument("--public", action="store_true", help="общий нормативный корпус (виден всем УК)")
+    args = parser.parse_args()
+
+    try:
+        for path in args.paths:
+            await ingest_path(path, args.organization_id, args.label, args.public)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,230 @@
+"""
+Нагрузочный тест бэкенда: сценарии /health, /api/v1/llm/generate и
+/api/v1/legal/ask на фиксированных уровнях конкурентности.
+Отчёт — RPS, p50/p95/p99 задержки и доля ошибок по каждому сценарию.
+
+Внешний DeepSeek не нужен: поднимите scripts/deepseek_stub.py и
+запустите бэкенд с DEEPSEEK_API_BASE, указывающим на заглушку.
+
+Все запросы теста идут с одного IP без токена, а лимит по IP —
+RATE_LIMIT_PER_MINUTE (100 в минуту): на время прогона запустите бэкенд
+с RATE_LIMIT_ENABLED=false (или поднимите RATE_LIMIT_PER_MINUTE), иначе
+отчёт будет в основном о 429. Ответы 429 выводятся отдельной колонкой.
+
+По умолчанию к каждому запросу добавляется уникальный номер — кэши
+ответов LLM и поиска не срабатывают, и замеряется полный путь запроса.
+--repeat-prompts отправляет тексты без изменений (замер попаданий в кэш).
+
+Пример:
+    RATE_LIMIT_ENABLED=false DEEPSEEK_API_BASE=http://127.0.0.1:9100 DEEPSEEK_API_KEY=stub uvicorn app.main:app
+    python scripts/loadtest.py --base-url http://127.0.0.1:8000 --scenarios health,generate,legal --concurrency 1,8,32 --duration 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List
+
+import httpx
+
+QUESTIONS = [
+    "До какого числа вносится плата за жилое помещение и коммунальные услуги?",
+    "Как выбрать способ управления многоквартирным домом по ст. 161 ЖК РФ?",
+    "Как рассчитывается плата за отопление при отсутствии прибора учёта?",
+    "Какие сроки устранения аварии на внутридомовой системе водоснабжения?",
+    "Обязана ли УК делать перерасчёт при временном отсутствии потребителя?",
+]
+
+COMPLAINTS = [
+    "Здравствуйте, я Иванов Иван Иванович, ул. Ленина, д. 5, кв. 12. Третий день нет горячей воды, телефон +7 (912) 345-67-89.",
+    "Прошу сделать перерасчёт за отопление по лицевому счёту № 00123456, батареи холодные.",
+    "В подъезде не работает лифт уже неделю, жалоба от Петровой А.С.",
+]
+
+
+_sequence = itertools.count(1)
+
+
+def _text(samples: List[str], vary: bool) -> str:
+    """Случайный текст; с vary — с уникальным номером, чтобы не попадать в кэши."""
+    text = random.choice(samples)
+    return f"{text} (обращение {next(_sequence)})" if vary else text
+
+
+def _health(client: httpx.AsyncClient, bypass_cache: bool, vary: bool):
+    return client.get("/health")
+
+
+def _generate(client: httpx.AsyncClient, bypass_cache: bool, vary: bool):
+    return client.post(
+        "/api/v1/llm/generate", json={"prompt": _text(COMPLAINTS, vary), "bypass_cache": bypass_cache}
+    )
+
+
+def _legal(client: httpx.AsyncClient, bypass_cache: bool, vary: bool):
+    return client.post(
+        "/api/v1/legal/ask", json={"query": _text(QUESTIONS, vary), "bypass_cache": bypass_cache}
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "health": _health,
+    "generate": _generate,
+    "legal": _legal,
+}
+
+
+@dataclass
+class ScenarioReport:
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    status_codes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def rate_limited(self) -> int:
+        return self.status_codes.get("429", 0)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_scenario(
+    base_url: str,
+    name: str,
+    concurrency: int,
+    duration: float,
+    timeout: float,
+    bypass_cache: bool = False,
+    vary: bool = True,
+) -> ScenarioReport:
+    """Замкнутая модель: `concurrency` воркеров шлют запросы подряд в течение `duration` секунд."""
+    request = SCENARIOS[name]
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await request(client, bypass_cache, vary)
+                    code = str(response.status_code)
+                    # Ошибки DeepSeek бэкенд отдаёт текстом в 200 — считаем их тоже
+                    failed = response.status_code >= 400 or "[DeepSeek] Ошибка" in response.text
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                    failed = True
+                latencies.append((time.perf_counter() - started) * 1000)
+                status_codes[code] = status_codes.get(code, 0) + 1
+                if failed:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return ScenarioReport(
+        scenario=name,
+        concurrency=concurrency,
+        requests=len(latencies),
+        errors=errors,
+        rps=len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms=percentile(latencies, 0.50),
+        p95_ms=percentile(latencies, 0.95),
+        p99_ms=percentile(latencies, 0.99),
+        status_codes=status_codes,
+    )
+
+
+def print_report(reports: List[ScenarioReport]) -> None:
+    header = (
+        f"{'scenario':<10} {'conc':>5} {'reqs':>7} {'rps':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+        f"{'errors':>7} {'429':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(
+            f"{r.scenario:<10} {r.concurrency:>5} {r.requests:>7} {r.rps:>8.1f} "
+            f"{r.p50_ms:>8.1f} {r.p95_ms:>8.1f} {r.p99_ms:>8.1f} {r.error_rate:>6.1%} {r.rate_limited:>6}"
+        )
+    if any(r.rate_limited for r in reports):
+        print(
+            "\nВнимание: бэкенд отвечал 429 — задержки и RPS искажены rate limit. "
+            "Запустите его с RATE_LIMIT_ENABLED=false или большим RATE_LIMIT_PER_MINUTE."
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бэкенда")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="health,generate,legal")
+    parser.add_argument("--concurrency", default="1,8,32", help="уровни конкурентности через запятую")
+    parser.add_argument("--duration", type=float, default=20.0, help="секунд на каждый уровень")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--bypass-cache", action="store_true", help="не использовать кэш ответов LLM")
+    parser.add_argument(
+        "--repeat-prompts",
+        action="store_true",
+        help="слать тексты без уникального номера (замер попаданий в кэши)",
+    )
+    parser.add_argument("--json", dest="json_path", help="сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+    reports: List[ScenarioReport] = []
+    for name in scenarios:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            reports.append(
+                await run_scenario(
+                    args.base_url,
+                    name,
+                    concurrency,
+                    args.duration,
+                    args.timeout,
+                    bypass_cache=args.bypass_cache,
+                    vary=not args.repeat_prompts,
+                )
+            )
+
+    print_report(reports)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                [dict(asdict(r), error_rate=r.error_rate, rate_limited=r.rate_limited) for r in reports],
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
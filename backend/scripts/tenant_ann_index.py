@@ -0,0 +1,77 @@
+"""
+Частичный ANN-индекс для крупной УК: фрагменты её документов ищутся по
+индексу, а не точной сортировкой по btree organization_id. Имеет смысл,
+когда у организации десятки тысяч фрагментов. Индекс строится и удаляется
+CONCURRENTLY — без блокировки записи в document_chunks. Представление
+векторов в индексе — по VECTOR_QUANTIZATION (как у общего корпуса);
+--drop удаляет индексы организации во всех представлениях.
+
+Пример:
+    python scripts/tenant_ann_index.py 550e8400-e29b-41d4-a716-446655440000
+    python scripts/tenant_ann_index.py 550e8400-e29b-41d4-a716-446655440000 --drop
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from typing import Optional
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+from app.services.quantization import QUANTIZATIONS, create_index_statement
+
+# Имя длиннее 63 байт PostgreSQL усекает — одинаково при создании и удалении
+_PREFIXES = {
+    "none": "ix_document_chunks_embedding_org_",
+    "halfvec": "ix_chunks_half_org_",
+    "bit": "ix_chunks_bit_org_",
+}
+
+
+def index_name(organization_id: uuid.UUID, quantization: Optional[str] = None) -> str:
+    return f"{_PREFIXES[quantization or settings.VECTOR_QUANTIZATION]}{organization_id.hex}"
+
+
+def create_statement(organization_id: uuid.UUID) -> str:
+    # Условие совпадает с литералом из rag._tenant_filter — иначе планировщик индекс не возьмёт
+    return create_index_statement(index_name(organization_id), f"organization_id = '{organization_id}'")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Частичный ANN-индекс фрагментов одной организации")
+    parser.add_argument("organization_id", type=uuid.UUID)
+    parser.add_argument("--drop", action="store_true", help="удалить индекс")
+    args = parser.parse_args()
+
+    if args.drop:
+        statements = [
+            f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(args.organization_id, q)}" for q in QUANTIZATIONS
+        ]
+    else:
+        statements = [create_statement(args.organization_id)]
+
+    try:
+        # CONCURRENTLY не выполняется внутри транзакции
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if not args.drop:
+                count = await conn.scalar(
+                    text("SELECT count(*) FROM document_chunks WHERE organization_id = :org"),
+                    {"org": args.organization_id},
+                )
+                print(f"Фрагментов организации: {count}")
+            for statement in statements:
+                await conn.execute(text(statement))
+                print(statement)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
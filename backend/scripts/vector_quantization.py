@@ -0,0 +1,61 @@
+"""
+Переключение представления векторов в ANN-индексе общего корпуса
+(VECTOR_QUANTIZATION) на работающей базе. Порядок без простоя поиска:
+  1. построить индекс нового режима (старый остаётся);
+  2. перезапустить приложение с VECTOR_QUANTIZATION=<режим>;
+  3. удалить индексы остальных режимов (--drop-others).
+Индексы строятся и удаляются CONCURRENTLY. Частичные индексы крупных УК
+перестраиваются scripts/tenant_ann_index.py.
+
+Пример:
+    python scripts/vector_quantization.py halfvec
+    python scripts/vector_quantization.py halfvec --drop-others
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.services.quantization import QUANTIZATIONS, create_index_statement, public_index_name
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="ANN-индекс общего корпуса для режима квантизации")
+    parser.add_argument("quantization", choices=QUANTIZATIONS)
+    parser.add_argument("--drop-others", action="store_true", help="удалить индексы остальных режимов")
+    args = parser.parse_args()
+
+    statements = [create_index_statement(public_index_name(args.quantization), "organization_id IS NULL", args.quantization)]
+    if args.drop_others:
+        statements += [
+            f"DROP INDEX CONCURRENTLY IF EXISTS {public_index_name(q)}" for q in QUANTIZATIONS if q != args.quantization
+        ]
+
+    try:
+        # CONCURRENTLY не выполняется внутри транзакции
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for statement in statements:
+                await conn.execute(text(statement))
+                print(statement)
+            sizes = await conn.execute(
+                text(
+                    "SELECT indexrelid::regclass::text, pg_size_pretty(pg_relation_size(indexrelid)) "
+                    "FROM pg_index WHERE indrelid = 'document_chunks'::regclass "
+                    "AND indexrelid::regclass::text LIKE 'ix_document_chunks_embedding_%public'"
+                )
+            )
+            for name, size in sizes:
+                print(f"{name}: {size}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
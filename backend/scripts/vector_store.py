@@ -0,0 +1,79 @@
+"""
+Обслуживание numpy-хранилища векторов (VECTOR_STORE=numpy).
+
+    export           — перенести фрагменты из document_chunks (PostgreSQL) в хранилище;
+    delete DOCUMENT  — пометить фрагменты документа удалёнными;
+    compact          — переписать файлы без удалённых строк;
+    stats            — размер хранилища.
+
+Пример:
+    python scripts/vector_store.py export
+    python scripts/vector_store.py delete 550e8400-e29b-41d4-a716-446655440000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from app.config import settings
+from app.database import raw_dsn
+from app.services.vector_store import NumpyVectorStore, StoredChunk
+
+_EXPORT_BATCH = 1000
+
+
+async def export(store: NumpyVectorStore) -> None:
+    started = time.perf_counter()
+    conn = await asyncpg.connect(raw_dsn())
+    try:
+        await register_vector(conn)
+        written = 0
+        # Серверный курсор: таблица не загружается в память целиком
+        async with conn.transaction():
+            batch = []
+            async for row in conn.cursor(
+                "SELECT c.id, c.document_id, c.organization_id, c.chunk_index, c.content, c.meta_info, "
+                "d.filename, c.embedding FROM document_chunks AS c JOIN documents AS d ON d.id = c.document_id "
+                "WHERE c.embedding IS NOT NULL ORDER BY c.document_id, c.chunk_index"
+            ):
+                batch.append(StoredChunk(**dict(row)))
+                if len(batch) >= _EXPORT_BATCH:
+                    written += await store.add(batch)
+                    batch = []
+            written += await store.add(batch)
+    finally:
+        await conn.close()
+    print(f"Перенесено фрагментов: {written} за {time.perf_counter() - started:.1f} с")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание numpy-хранилища векторов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("export", help="перенести document_chunks в хранилище")
+    delete = commands.add_parser("delete", help="удалить фрагменты документа")
+    delete.add_argument("document_id", type=uuid.UUID)
+    commands.add_parser("compact", help="переписать файлы без удалённых строк")
+    commands.add_parser("stats", help="размер хранилища")
+    args = parser.parse_args()
+
+    store = NumpyVectorStore(settings.VECTOR_STORE_DIR, settings.EMBEDDING_DIM, settings.VECTOR_STORE_DTYPE)
+    if args.command == "export":
+        await export(store)
+    elif args.command == "delete":
+        print(f"Удалено фрагментов: {await store.delete_document(args.document_id)}")
+    elif args.command == "compact":
+        print(f"Освобождено строк: {await store.compact()}")
+    await store.refresh()
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())